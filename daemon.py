@@ -0,0 +1,368 @@
+"""
+Long-running worker that keeps authenticated clients, the image cache and the rate limiter warm between jobs
+example usage:
+python daemon.py --jobs 2
+python submit_job.py inputs/input1.json --slides 7
+
+Jobs come from submit_job.py over a local socket, or as job files dropped into
+the spool directory (<config.DAEMON_DIR>/spool, see helpers/job_queue.check_spec
+for the format). They are kept in <config.DAEMON_DIR>/jobs with their journal's
+run ID, so jobs that were queued or running when the daemon stopped run (and
+resume) when it starts again.
+"""
+
+import argparse
+import contextvars
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from helpers.clients import get_clients
+from helpers.slide_updater import PresentationUpdater
+from helpers.image_cache import ImageCache
+from helpers.run_manifest import RunManifest
+from helpers.rate_limiter import get_rate_limiter
+from helpers.instrumentation import Tracer, reset_tracer, set_tracer, use_tracer
+from helpers.run_journal import RunJournal
+from helpers.deck_loader import DeckValidationError, load_deck
+from helpers.slide_selector import SlideIndex
+from helpers.template_variables import TemplateVariables
+from helpers.job_queue import JobQueue, check_spec, socket_path, spool_dir
+from main import run_presentation
+from update_selected_slides import update_selected_slides
+from scripts.generate_all_slideshow_images import update_presentation_images
+import config
+
+DEFAULT_JOB_WORKERS = 2
+SPOOL_POLL_SECONDS = 1
+
+# Job whose output this context prints; helper threads get it through helpers.instrumentation.in_context
+_current_job = contextvars.ContextVar('job', default=None)
+
+
+class JobOutput(io.TextIOBase):
+    """
+    Stands in for sys.stdout so what a job prints goes to that job's log
+
+    Output is routed by context: the job's worker thread and the image workers
+    and Slides writer it starts print to the job's log; everything else goes to
+    the daemon's output.
+    """
+
+    def __init__(self, stream, queue):
+        self.stream = stream
+        self.queue = queue
+
+    def write(self, text):
+        job = _current_job.get()
+        if job is None:
+            return self.stream.write(text)
+        self.queue.log(job, text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class UpdateDaemon:
+    def __init__(self, queue, clients, image_handler, manifest, image_workers=None, job_workers=None,
+                 trace_file=None):
+        """
+        Args:
+            queue (JobQueue): Persistent job queue
+            clients (GoogleClients): Authenticated clients shared by every job
+            image_handler: ImageHandler (and its cache) shared by every job
+            manifest (RunManifest): Run manifest shared by every job
+            image_workers (int): Images generated concurrently per job
+            job_workers (int): Jobs run at the same time (default: config.DAEMON_JOBS or 2)
+            trace_file (str): Append every job's timing trace to this file (default: config.TRACE_FILE)
+        """
+        self.queue = queue
+        self.clients = clients
+        self.image_handler = image_handler
+        self.manifest = manifest
+        self.image_workers = image_workers
+        self.job_workers = job_workers or getattr(config, 'DAEMON_JOBS', DEFAULT_JOB_WORKERS)
+        self.trace_file = trace_file
+        self.stop = threading.Event()
+        self.output = None
+
+    def submit(self, spec):
+        """
+        Checks a job, including its input and slide selection, and queues it
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            ValueError: If the job or its input is invalid (DeckValidationError lists every problem)
+            OSError: If its input cannot be read
+        """
+        spec = check_spec(spec)
+        presentation_data = load_deck(spec['input'])
+        if spec['kind'] == 'slides' and not SlideIndex(presentation_data['slides']).select_numbers(spec['slides']):
+            raise ValueError(f"No slides match {' '.join(map(str, spec['slides']))}")
+        job = self.queue.submit(spec)
+        print(f"Queued job {job.id}: {spec['kind']} {spec['input']} -> {spec['presentation_id']}")
+        return job
+
+    def _journal(self, job):
+        """The job's journal, resumed if the job was interrupted."""
+        if job.run_id:
+            try:
+                return RunJournal(job.run_id)
+            except ValueError:
+                pass
+        journal = RunJournal()
+        job.run_id = journal.run_id
+        self.queue.update(job)
+        return journal
+
+    def run_job(self, job):
+        """
+        Runs one job on the warm clients
+
+        Returns:
+            dict: Summary of the job's updates
+        """
+        spec = job.spec
+        presentation_data = load_deck(spec['input'])
+        if spec['full']:
+            self.manifest.reset(job.presentation_id)
+        journal = self._journal(job)
+        try:
+            if spec['kind'] == 'deck':
+                updater = PresentationUpdater(
+                    self.clients.slides_service,
+                    self.image_handler,
+                    image_workers=self.image_workers,
+                    rate_limiter=get_rate_limiter(),
+                    manifest=self.manifest,
+                    journal=journal
+                )
+                return run_presentation(updater, job.presentation_id, presentation_data)
+            if spec['kind'] == 'slides':
+                return update_selected_slides(
+                    job.presentation_id,
+                    presentation_data['slides'],
+                    spec['slides'],
+                    self.clients.slides_service,
+                    self.image_handler,
+                    image_workers=self.image_workers,
+                    manifest=self.manifest,
+                    journal=journal,
+                    variables=TemplateVariables(presentation_data.get('variables'))
+                )
+            updated_count, skipped_count = update_presentation_images(
+                job.presentation_id,
+                presentation_data['slides'],
+                self.clients.slides_service,
+                self.image_handler,
+                image_workers=self.image_workers,
+                journal=journal
+            )
+            return {'updated': updated_count, 'skipped': skipped_count}
+        finally:
+            journal.close()
+
+    def work(self):
+        """Runs queued jobs until the daemon stops."""
+        while True:
+            job = self.queue.take(self.stop)
+            if job is None:
+                return
+            print(f"Running job {job.id}")
+            # Each job traces into its own tracer, so a long-running daemon keeps no events between jobs
+            tracer = Tracer(self.trace_file)
+            job_context = _current_job.set(job)
+            tracer_context = use_tracer(tracer)
+            try:
+                result = self.run_job(job)
+                error = None
+            except Exception as e:
+                print(traceback.format_exc(), end='')
+                result = None
+                error = str(e)
+            finally:
+                tracer.print_summary()
+                tracer.close()
+                reset_tracer(tracer_context)
+                _current_job.reset(job_context)
+            self.queue.finish(job, result=result, error=error)
+            print(f"Job {job.id} {'failed: ' + error if error else 'done'}")
+            if not self.queue.pending():
+                # Keep the image cache (and the bucket behind it) bounded while idle
+                self.image_handler.prune_cache()
+
+    def watch_spool(self, directory):
+        """Queues the job files dropped into a directory; rejected ones are renamed to .rejected."""
+        os.makedirs(directory, exist_ok=True)
+        while not self.stop.wait(SPOOL_POLL_SECONDS):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    with open(path, "r") as f:
+                        self.submit(json.load(f))
+                    os.remove(path)
+                except (OSError, ValueError) as e:
+                    print(f"Rejected job file {name}: {str(e)}")
+                    os.replace(path, f"{path}.rejected")
+
+    def start(self, spool=None):
+        """Starts the job workers and the spool watcher, routing job output to the job logs."""
+        self.output = JobOutput(sys.stdout, self.queue)
+        sys.stdout = self.output
+        for index in range(self.job_workers):
+            threading.Thread(target=self.work, name=f"job-worker-{index}", daemon=True).start()
+        threading.Thread(target=self.watch_spool, args=(spool or spool_dir(),), name="spool", daemon=True).start()
+        pending = len(self.queue.pending())
+        print(f"Daemon ready: {self.job_workers} job workers, {pending} jobs queued")
+
+    def shutdown(self):
+        """Stops taking jobs; jobs still running are resumed by the next daemon."""
+        self.stop.set()
+        self.queue.notify()
+        if self.output is not None and sys.stdout is self.output:
+            sys.stdout = self.output.stream
+
+
+class JobRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serves one client connection; requests and replies are JSON lines
+
+    Requests: {"action": "submit", "job": {...}, "follow": bool},
+    {"action": "follow", "job_id": ...} and {"action": "status"}.
+    """
+
+    def send(self, **reply):
+        self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+        self.wfile.flush()
+
+    def follow(self, job_id):
+        queue = self.server.update_daemon.queue
+        for text in queue.follow(job_id, self.server.update_daemon.stop):
+            self.send(event='log', text=text)
+        self.send(event='finished', job=queue.jobs[job_id].to_dict())
+
+    def handle(self):
+        update_daemon = self.server.update_daemon
+        action = None
+        try:
+            try:
+                request = json.loads(self.rfile.readline())
+            except ValueError:
+                self.send(event='error', message="request should be one line of JSON")
+                return
+            action = request.get('action')
+            if action == 'submit':
+                try:
+                    job = update_daemon.submit(request.get('job'))
+                except DeckValidationError as e:
+                    self.send(event='error', message=str(e), problems=e.problems)
+                    return
+                except (OSError, ValueError) as e:
+                    self.send(event='error', message=str(e))
+                    return
+                self.send(event='queued', job=job.to_dict(), ahead=len(update_daemon.queue.pending()) - 1)
+                if request.get('follow'):
+                    self.follow(job.id)
+            elif action == 'follow':
+                if request.get('job_id') not in update_daemon.queue.jobs:
+                    self.send(event='error', message=f"No job {request.get('job_id')}")
+                    return
+                self.follow(request['job_id'])
+            elif action == 'status':
+                jobs = sorted(update_daemon.queue.jobs.values(), key=lambda job: job.submitted)
+                self.send(event='status', jobs=[job.to_dict() for job in jobs])
+            else:
+                self.send(event='error', message=f"Unknown action {action}")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            pass
+        except Exception as e:
+            # Always answer, so the client does not mistake a dropped connection for success
+            traceback.print_exc()
+            try:
+                self.send(event='error', message=f"{action or 'request'} failed: {str(e)}")
+            except OSError:
+                pass
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, update_daemon):
+        if os.path.exists(path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(path) == 0:
+                    raise RuntimeError(f"A daemon is already listening on {path}")
+            # Left behind by a daemon that did not shut down cleanly
+            os.remove(path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        super().__init__(path, JobRequestHandler)
+        self.update_daemon = update_daemon
+
+
+def _stop_on_sigterm(signum, frame):
+    # Stop as on Ctrl-C
+    raise KeyboardInterrupt()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run update jobs from a local queue on warm clients')
+    parser.add_argument('--jobs', type=int,
+                      help='Jobs run at the same time (default: config.DAEMON_JOBS or 2)')
+    parser.add_argument('--workers', type=int,
+                      help='Number of images generated concurrently per job (default: config.IMAGE_WORKERS or 4)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always generate new images instead of reusing cached ones')
+    parser.add_argument('--variants', type=int,
+                      help='Images requested per Imagen call (1-4); placeholders sharing a prompt get '
+                           'distinct variants and unused ones are cached as spares')
+    parser.add_argument('--async-images', action='store_true',
+                      help='Generate images on one event loop; --workers then caps the generations in flight')
+    parser.add_argument('--socket', help='Local socket to listen on (default: .daemon/daemon.sock)')
+    parser.add_argument('--spool', help='Directory to take job files from (default: .daemon/spool)')
+    parser.add_argument('--trace', help='Append a JSON-lines timing trace to this file')
+    args = parser.parse_args()
+
+    tracer = set_tracer(Tracer(args.trace))
+
+    # Authenticate and build every client once, before the first job arrives
+    clients = get_clients()
+    clients.slides_service
+    clients.storage_client
+    image_handler = clients.image_handler(
+        cache=None if args.no_cache else ImageCache(),
+        seed=getattr(config, 'IMAGE_SEED', None),
+        asynchronous=args.async_images,
+        variants_per_call=args.variants
+    )
+
+    update_daemon = UpdateDaemon(JobQueue(), clients, image_handler, RunManifest(),
+                                 image_workers=args.workers, job_workers=args.jobs, trace_file=args.trace)
+    path = args.socket or socket_path()
+    server = JobServer(path, update_daemon)
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    update_daemon.start(args.spool)
+    print(f"Listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping; running jobs resume when the daemon starts again")
+    finally:
+        update_daemon.shutdown()
+        server.server_close()
+        os.remove(path)
+        tracer.print_summary()
+        tracer.close()
+
+if __name__ == "__main__":
+    main()
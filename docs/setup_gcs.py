@@ -4,17 +4,23 @@ Script to set up Google Cloud Storage bucket for slide images
 
 from google.cloud import storage
 import argparse
+from helpers.image_gc import install_lifecycle_rule
 import config
 
-def setup_storage(bucket_name=None, region=None):
+def setup_storage(bucket_name=None, region=None, lifecycle_days=None):
     """
     Creates and configures a GCS bucket for storing generated images.
+    
+    Args:
+        lifecycle_days (int): Delete generated images this many days old (default: once the
+                              image cache can no longer reuse them); 0 installs no rule
     """
     # Use config values if not provided
     bucket_name = bucket_name or config.GCS_BUCKET_NAME
     region = region or config.GCS_REGION
     
-    # Initialize the client
+    # Initialize the client with your own (application default) credentials: creating the
+    # bucket and changing its ACLs needs more than the service account's roles and scopes
     storage_client = storage.Client(project=config.PROJECT_ID)
     
     try:
@@ -40,6 +46,11 @@ def setup_storage(bucket_name=None, region=None):
         blob.make_public()
         print(f"Created {config.IMAGE_PREFIX} prefix in bucket")
         
+        # Let GCS expire generated images; scripts/collect_image_garbage.py removes unused ones sooner
+        if lifecycle_days != 0:
+            age = install_lifecycle_rule(bucket, age_days=lifecycle_days, prefix=config.IMAGE_PREFIX)
+            print(f"Images under {config.IMAGE_PREFIX} are deleted after {age} days")
+        
         print("\nBucket setup complete!")
         print(f"Base URL for objects: https://storage.googleapis.com/{bucket_name}/")
         
@@ -48,6 +59,7 @@ def setup_storage(bucket_name=None, region=None):
         print("1. roles/storage.objectViewer")
         print("2. roles/storage.objectCreator")
         print("3. roles/storage.legacyBucketWriter")
+        print("4. roles/storage.objectAdmin (only for scripts/collect_image_garbage.py)")
         
     except Exception as e:
         print(f"Error setting up bucket: {str(e)}")
@@ -57,9 +69,12 @@ def main():
     parser = argparse.ArgumentParser(description='Set up GCS bucket for slide images')
     parser.add_argument('--bucket', help=f'Name for the GCS bucket (default: {config.GCS_BUCKET_NAME})')
     parser.add_argument('--region', help=f'Region for the bucket (default: {config.GCS_REGION})')
+    parser.add_argument('--lifecycle-days', type=int,
+                        help='Delete generated images this many days old (default: image cache max age + 1, '
+                             '0 for no rule)')
     
     args = parser.parse_args()
-    setup_storage(args.bucket, args.region)
+    setup_storage(args.bucket, args.region, args.lifecycle_days)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
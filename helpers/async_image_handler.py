@@ -0,0 +1,136 @@
+"""
+Asyncio variant of ImageHandler: Imagen calls go through genai's aio client, so hundreds of
+generations can be in flight on one event loop instead of one thread each
+"""
+
+import asyncio
+from io import BytesIO
+from helpers.image_handler import ImageHandler
+from helpers.instrumentation import get_tracer
+
+
+class AsyncImageHandler(ImageHandler):
+    """
+    ImageHandler whose generate_and_store_image is a coroutine
+
+    Caching, encoding, naming and cleanup are inherited unchanged. The GCS
+    client has no async API, so uploads run in the loop's default thread pool;
+    only the slow part, the Imagen call, holds no thread while it waits.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_in_flight = {}
+
+    async def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        """
+        Generates an image from a prompt and stores it in GCS
+
+        Args:
+            prompt (str): Description for image generation
+            aspect_ratio (str): One of "1:1", "3:4", "4:3", "9:16", "16:9"
+            target_size (tuple): Rendered (width, height) in pixels of the placeholder;
+                                 larger images are downscaled to cover it
+            variant (int): Which of several distinct images for this prompt to return
+
+        Returns:
+            str: Public URL of the stored image
+
+        Raises:
+            ValueError: If invalid aspect_ratio is provided
+        """
+        if variant or self.variants_per_call > 1:
+            return (await self.generate_variants(prompt, aspect_ratio, [variant], target_size))[variant]
+
+        cache_key, cached_url, flight_key = self._lookup(prompt, aspect_ratio, target_size)
+        if cached_url:
+            return cached_url
+
+        # Identical requests on the same loop share one generation
+        loop = asyncio.get_running_loop()
+        pending = self._async_in_flight.get((loop, flight_key))
+        if pending is not None:
+            with self._in_flight_lock:
+                self.generations_shared += 1
+            return (await asyncio.shield(pending))[0]
+
+        pending = loop.create_task(self._generate_and_store_async(prompt, aspect_ratio, target_size, [cache_key]))
+        self._async_in_flight[(loop, flight_key)] = pending
+        try:
+            return (await asyncio.shield(pending))[0]
+        finally:
+            self._async_in_flight.pop((loop, flight_key), None)
+
+    async def generate_variants(self, prompt, aspect_ratio="1:1", variants=(0,), target_size=None):
+        """
+        Generates distinct images for one prompt; see ImageHandler.generate_variants
+
+        Returns:
+            dict: Variant number -> public URL (None on failure)
+        """
+        urls, calls = self._plan_variants(prompt, aspect_ratio, target_size, variants)
+        results = await asyncio.gather(*(
+            self._generate_and_store_async(prompt, aspect_ratio, target_size, [key for _, key in batch])
+            for batch in calls
+        ))
+        for batch, stored in zip(calls, results):
+            for (variant, _), url in zip(batch, stored):
+                if variant in urls:
+                    urls[variant] = url
+        return urls
+
+    async def _generate_and_store_async(self, prompt, aspect_ratio, target_size, cache_keys):
+        """
+        Generates len(cache_keys) images in one Imagen call without blocking the event loop
+
+        Returns:
+            list: Public URL per cache key, None where generation or upload failed
+        """
+        tracer = get_tracer()
+        urls = [None] * len(cache_keys)
+
+        async def generate():
+            with tracer.span('imagen.generate_images', images=len(cache_keys)):
+                return await self.client.aio.models.generate_images(
+                    model=self.model,
+                    prompt=prompt,
+                    config=self._image_config(aspect_ratio, len(cache_keys))
+                )
+
+        try:
+            response = await self.rate_limiter.call_async('imagen', generate)
+
+            if not response.generated_images:
+                raise Exception("No images were generated")
+        except Exception as e:
+            print(f"Error in generate_and_store_image: {str(e)}")
+            return urls
+
+        async def store(index, generated):
+            try:
+                # Re-encoding is CPU work, keep it off the loop
+                with tracer.span('image.encode'):
+                    image_bytes, content_type = await asyncio.to_thread(
+                        self._encode_image, generated.image.image_bytes, target_size)
+
+                blob, filename = self._new_blob(cache_keys[index])
+
+                async def upload():
+                    with tracer.span('gcs.upload', bytes=len(image_bytes)):
+                        return await asyncio.to_thread(
+                            blob.upload_from_file,
+                            BytesIO(image_bytes),
+                            size=len(image_bytes),
+                            content_type=content_type,
+                            rewind=True
+                        )
+
+                await self.rate_limiter.call_async('gcs', upload)
+                # Saving the cache index writes a file
+                urls[index] = await asyncio.to_thread(self._stored, cache_keys[index], filename)
+            except Exception as e:
+                print(f"Error in generate_and_store_image: {str(e)}")
+
+        await asyncio.gather(*(store(index, generated)
+                               for index, generated in enumerate(response.generated_images[:len(cache_keys)])))
+        return urls
@@ -0,0 +1,226 @@
+"""
+Builds the authenticated Google clients once per process so every script, deck and worker thread can share them
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import httplib2
+from requests.adapters import HTTPAdapter
+from google import genai
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud import storage
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.discovery_cache.base import Cache
+from helpers.image_handler import ImageHandler
+from helpers.async_image_handler import AsyncImageHandler
+import config
+
+SCOPES = [
+    'https://www.googleapis.com/auth/presentations',
+    # Needed to upload and delete generated images
+    'https://www.googleapis.com/auth/devstorage.read_write',
+]
+# Only the Drive client asks for Drive access; it copies templates (helpers/presentation_copier.py),
+# which drive.file cannot read unless the service account created them
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+
+# Connections kept open per host; enough for every image worker and deck at once
+DEFAULT_POOL_SIZE = 32
+DEFAULT_DISCOVERY_CACHE_DIR = '.discovery_cache'
+# Refresh the access token this long before it expires, so no request has to wait on a refresh
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+class PooledSession(AuthorizedSession):
+    """
+    AuthorizedSession with a sized keep-alive connection pool that refreshes its token ahead of expiry
+
+    requests sessions and urllib3 pools are thread-safe, so one session serves
+    every thread, unlike httplib2.Http.
+    """
+
+    def __init__(self, credentials, pool_size=None):
+        super().__init__(credentials)
+        pool_size = pool_size or getattr(config, 'HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self._refresh_lock = threading.Lock()
+        # Token refreshes use their own connection so they never wait for a pooled one
+        self._token_request = Request()
+
+    def _expiring(self):
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return True
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return expiry - now < REFRESH_MARGIN
+
+    def refresh_if_expiring(self):
+        """Refreshes the access token once, for every thread, if it expires soon."""
+        if not self._expiring():
+            return
+        with self._refresh_lock:
+            if self._expiring():
+                self.credentials.refresh(self._token_request)
+
+    def request(self, method, url, *args, **kwargs):
+        self.refresh_if_expiring()
+        return super().request(method, url, *args, **kwargs)
+
+
+class PooledHttp:
+    """
+    The part of httplib2.Http that googleapiclient uses, on top of a PooledSession
+
+    Lets the discovery-based Slides and Drive services share the pooled session.
+    """
+
+    def __init__(self, session, timeout=None):
+        self.session = session
+        self.timeout = timeout or getattr(config, 'HTTP_TIMEOUT', 120)
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout,
+                                        allow_redirects=redirections > 0)
+        info = {name.lower(): value for name, value in response.headers.items()}
+        info['status'] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+
+class DiscoveryCache(Cache):
+    """
+    Keeps discovery documents on disk so services are built without fetching them again
+
+    Only consulted when googleapiclient has no bundled (static) document for the service.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or getattr(config, 'DISCOVERY_CACHE_DIR', DEFAULT_DISCOVERY_CACHE_DIR)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, url, content):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(url)}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(url))
+        except OSError as e:
+            print(f"Could not cache discovery document: {str(e)}")
+
+
+class GoogleClients:
+    def __init__(self, credentials_file=None, scopes=SCOPES, pool_size=None):
+        """
+        Set up the clients; each one, and the credentials, are built on first use
+
+        The service account is only loaded once a Slides, Drive or GCS client is
+        needed, so the genai client alone works with just an API key.
+
+        Args:
+            credentials_file (str): Service account JSON (default: config.CREDENTIALS_FILE)
+            scopes (list): OAuth scopes for the service account
+            pool_size (int): Connections kept open per host (default: config.HTTP_POOL_SIZE or 32)
+        """
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.pool_size = pool_size
+        self.discovery_cache = DiscoveryCache()
+        self._clients = {}
+        # Reentrant: building a service builds the session and credentials it needs first
+        self._lock = threading.RLock()
+
+    def _client(self, name, factory):
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = factory()
+            return self._clients[name]
+
+    @property
+    def credentials(self):
+        return self._client('credentials', lambda: service_account.Credentials.from_service_account_file(
+            self.credentials_file or config.CREDENTIALS_FILE,
+            scopes=self.scopes
+        ))
+
+    @property
+    def session(self):
+        # One pooled session carries every Slides, Drive and GCS request
+        return self._client('session', lambda: PooledSession(self.credentials, self.pool_size))
+
+    @property
+    def http(self):
+        return self._client('http', lambda: PooledHttp(self.session))
+
+    def _service(self, name, version):
+        return build(name, version, http=self.http, cache_discovery=True, cache=self.discovery_cache)
+
+    @property
+    def slides_service(self):
+        return self._client('slides', lambda: self._service('slides', 'v1'))
+
+    @property
+    def drive_service(self):
+        # Built on its own session, so the Slides and GCS requests never carry the Drive scope
+        def build_drive():
+            credentials = self.credentials.with_scopes(list(self.scopes) + DRIVE_SCOPES)
+            http = PooledHttp(PooledSession(credentials, self.pool_size))
+            return build('drive', 'v3', http=http, cache_discovery=True, cache=self.discovery_cache)
+        return self._client('drive', build_drive)
+
+    @property
+    def genai_client(self):
+        # genai keeps its own pooled httpx client; it authenticates with the API key
+        return self._client('genai', lambda: genai.Client(api_key=config.GENAI_API_KEY))
+
+    @property
+    def storage_client(self):
+        return self._client('storage', lambda: storage.Client(
+            project=config.PROJECT_ID,
+            credentials=self.credentials,
+            _http=self.session
+        ))
+
+    def image_handler(self, asynchronous=False, **kwargs):
+        """
+        Builds an ImageHandler on the shared genai and GCS clients
+
+        Args:
+            asynchronous (bool): Build an AsyncImageHandler, which generates on an event loop
+            **kwargs: Passed on to ImageHandler (cache, seed, image_format, ...)
+        """
+        handler_class = AsyncImageHandler if asynchronous else ImageHandler
+        return handler_class(
+            genai_api_key=config.GENAI_API_KEY,
+            bucket_name=config.GCS_BUCKET_NAME,
+            project_id=config.PROJECT_ID,
+            client=self.genai_client,
+            storage_client=self.storage_client,
+            **kwargs
+        )
+
+
+_shared_clients = None
+_shared_lock = threading.Lock()
+
+
+def get_clients():
+    """Returns the process-wide GoogleClients every script and deck shares."""
+    global _shared_clients
+    with _shared_lock:
+        if _shared_clients is None:
+            _shared_clients = GoogleClients()
+        return _shared_clients
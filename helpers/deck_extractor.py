@@ -0,0 +1,217 @@
+"""
+Builds the input JSON from a presentation with one presentations.get call, applying the rules of docs/apps_script.gs
+"""
+
+import functools
+from helpers.presentation_index import EMU_PER_PT, dimension_pt
+from helpers.instrumentation import get_tracer
+
+# Same rules and thresholds as extractPresentationDataAsJson in docs/apps_script.gs
+MIN_IMAGE_SIZE = 25  # minimum points for both width and height
+SUPPORTED_RATIOS = {
+    "1:1": {'ratio': 1.0, 'tolerance': 0.1},
+    "3:4": {'ratio': 0.75, 'tolerance': 0.1},
+    "4:3": {'ratio': 1.33333, 'tolerance': 0.1},
+    "9:16": {'ratio': 0.5625, 'tolerance': 0.1},
+    "16:9": {'ratio': 1.77778, 'tolerance': 0.1},
+}
+# If two images' Y positions differ by <= this threshold, treat them as on the same "row"
+Y_POSITION_THRESHOLD = 10
+# Background image detection: near (0,0) and near 720x405
+BG_POSITION_THRESHOLD = 15
+BG_SIZE_THRESHOLD = 50
+BG_WIDTH = 720
+BG_HEIGHT = 405
+# Layout mapping for standard layouts; anything else is a custom layout and gets no 'layout'
+LAYOUT_MAPPING = {
+    'BLANK': 'BLANK',
+    'CAPTION_ONLY': 'CAPTION_ONLY',
+    'TITLE': 'TITLE',
+    'TITLE_AND_BODY': 'TITLE_AND_BODY',
+    'TITLE_AND_TWO_COLUMNS': 'TITLE_AND_TWO_COLUMNS',
+    'TITLE_ONLY': 'TITLE_ONLY',
+    'ONE_COLUMN_TEXT': 'ONE_COLUMN_TEXT',
+    'MAIN_POINT': 'MAIN_POINT',
+    'SECTION_HEADER': 'SECTION_HEADER',
+}
+
+TEXT_FIELDS = 'text(textElements(textRun(content),autoText(content)))'
+ELEMENT_FIELDS = f'objectId,size,transform,shape({TEXT_FIELDS}),image(contentUrl),elementGroup(children(objectId))'
+EXTRACT_FIELDS = (
+    'layouts(objectId,layoutProperties(name)),'
+    f'slides(objectId,pageElements({ELEMENT_FIELDS}),'
+    f'slideProperties(layoutObjectId,notesPage(notesProperties,pageElements(objectId,shape({TEXT_FIELDS})))))'
+)
+
+
+def determine_aspect_ratio(width, height):
+    """
+    Nearest supported aspect ratio within its tolerance
+
+    Returns:
+        str: One of SUPPORTED_RATIOS, "1:1" when nothing is close or the size is invalid
+    """
+    if not width or not height:
+        return "1:1"
+    image_ratio = width / height
+    closest_ratio = "1:1"
+    smallest_diff = float('inf')
+    for ratio, target in SUPPORTED_RATIOS.items():
+        diff = abs(image_ratio - target['ratio'])
+        if diff < target['tolerance'] and diff < smallest_diff:
+            smallest_diff = diff
+            closest_ratio = ratio
+    return closest_ratio
+
+
+def meets_minimum_size(width, height):
+    return width >= MIN_IMAGE_SIZE and height >= MIN_IMAGE_SIZE
+
+
+def is_background_image(left, top, width, height):
+    """True if the image is near (0,0) and near 720x405."""
+    return (abs(left) < BG_POSITION_THRESHOLD and abs(top) < BG_POSITION_THRESHOLD
+            and abs(width - BG_WIDTH) < BG_SIZE_THRESHOLD and abs(height - BG_HEIGHT) < BG_SIZE_THRESHOLD)
+
+
+def _compare_positions(a, b):
+    # Approximate Y first (rows), then X, exactly like the Apps Script comparator
+    diff_y = a['top'] - b['top']
+    if abs(diff_y) <= Y_POSITION_THRESHOLD:
+        diff_y = 0
+    if diff_y != 0:
+        return diff_y
+    return a['left'] - b['left']
+
+
+def _text(shape):
+    return ''.join(
+        element.get('textRun', element.get('autoText', {})).get('content', '')
+        for element in shape.get('text', {}).get('textElements', [])
+    ).strip()
+
+
+def _geometry(element):
+    """Rendered (left, top, width, height) of an element in points, as Apps Script reports them."""
+    transform = element.get('transform', {})
+    scale = EMU_PER_PT if transform.get('unit', 'EMU') == 'EMU' else 1
+    size = element.get('size', {})
+    return (
+        transform.get('translateX', 0) / scale,
+        transform.get('translateY', 0) / scale,
+        dimension_pt(size.get('width')) * abs(transform.get('scaleX', 1)),
+        dimension_pt(size.get('height')) * abs(transform.get('scaleY', 1)),
+    )
+
+
+def fetch_presentation(slides_service, presentation_id, rate_limiter=None):
+    """
+    Reads everything the extractor needs with a single field-masked presentations.get
+
+    Returns:
+        dict: The presentations.get response
+    """
+    request = slides_service.presentations().get(
+        presentationId=presentation_id,
+        fields=EXTRACT_FIELDS
+    )
+    execute = get_tracer().traced('slides.get', request.execute)
+    return rate_limiter.call('slides', execute) if rate_limiter else execute()
+
+
+def extract_slides(presentation, start_slide=None, end_slide=None, include_size=False, include_position=False):
+    """
+    Converts a presentations.get response into the input JSON main.py consumes
+
+    Args:
+        presentation (dict): Response with at least EXTRACT_FIELDS
+        start_slide (int): First slide number to export (default: 1)
+        end_slide (int): Last slide number to export (default: the last slide); a reversed
+                         range is swapped, and a range wholly past the last slide exports nothing
+        include_size (bool): Add each image's size in points
+        include_position (bool): Add each image's position, and order images by row then column
+
+    Returns:
+        dict: {'slides': [...]} in the schema of the Apps Script export
+    """
+    layout_names = {
+        layout['objectId']: layout.get('layoutProperties', {}).get('name')
+        for layout in presentation.get('layouts', [])
+    }
+    pages = presentation.get('slides', [])
+    # Swap a reversed range first, then clamp it to the deck, as extractPresentationDataAsJson does
+    first_slide = start_slide or 1
+    last_slide = end_slide or len(pages)
+    if first_slide > last_slide:
+        first_slide, last_slide = last_slide, first_slide
+    first_slide = max(1, first_slide)
+    last_slide = min(len(pages), last_slide)
+
+    data = {'slides': []}
+    for slide_index in range(first_slide - 1, last_slide):
+        page = pages[slide_index]
+        properties = page.get('slideProperties', {})
+        slide_data = {
+            'slideNumber': slide_index + 1,
+            'exists': True,
+            'notes': '',
+            'elements': {'TEXT': [], 'IMAGE': []},
+        }
+
+        layout = LAYOUT_MAPPING.get(layout_names.get(properties.get('layoutObjectId')))
+        if layout:
+            slide_data['layout'] = layout
+
+        notes_page = properties.get('notesPage', {})
+        notes_id = notes_page.get('notesProperties', {}).get('speakerNotesObjectId')
+        for element in notes_page.get('pageElements', []):
+            if element['objectId'] == notes_id:
+                slide_data['notes'] = _text(element.get('shape', {}))
+
+        images = []
+        for element in page.get('pageElements', []):
+            # Groups are skipped along with their children, as in Apps Script
+            if 'elementGroup' in element:
+                continue
+            if 'shape' in element:
+                text = _text(element['shape'])
+                if text:
+                    slide_data['elements']['TEXT'].append({'objectId': element['objectId'], 'text': text})
+            elif 'image' in element:
+                left, top, width, height = _geometry(element)
+                if not meets_minimum_size(width, height):
+                    continue
+                image_data = {
+                    'objectId': element['objectId'],
+                    'image_prompt': '',
+                    'isBackground': is_background_image(left, top, width, height),
+                    'aspect_ratio': determine_aspect_ratio(width, height),
+                }
+                if include_position:
+                    image_data['position'] = {'left': round(left, 2), 'top': round(top, 2)}
+                if include_size:
+                    image_data['size'] = {'width': round(width, 2), 'height': round(height, 2)}
+                images.append(image_data)
+
+        # Without positions every image compares equal and keeps its page order, as in Apps Script
+        images.sort(key=functools.cmp_to_key(lambda a, b: _compare_positions(
+            a.get('position', {'top': 0, 'left': 0}), b.get('position', {'top': 0, 'left': 0}))))
+        slide_data['elements']['IMAGE'] = images
+        data['slides'].append(slide_data)
+    return data
+
+
+def extract_deck(slides_service, presentation_id, rate_limiter=None, **options):
+    """
+    Exports a presentation to the input JSON schema
+
+    Args:
+        slides_service: Google Slides service instance
+        presentation_id (str): The ID of the presentation
+        rate_limiter (RateLimiter): Limits and retries the presentations.get call
+        **options: start_slide, end_slide, include_size, include_position (see extract_slides)
+
+    Returns:
+        dict: {'slides': [...]} ready to be written as the input JSON
+    """
+    return extract_slides(fetch_presentation(slides_service, presentation_id, rate_limiter), **options)
@@ -0,0 +1,408 @@
+"""
+Loads and validates input JSON into compact records before any API call is made
+
+The records behave like the dicts they replace (slide['slideNumber'],
+slide.get('elements', {}).get('TEXT', [])), so the update code works with either.
+Large files can be streamed slide by slide (or deck by deck) when ijson is installed.
+"""
+
+import json
+from collections.abc import Mapping
+
+try:
+    import ijson
+except ImportError:  # Optional: only needed for streaming
+    ijson = None
+
+VALID_ASPECT_RATIOS = {"1:1", "3:4", "4:3", "9:16", "16:9"}
+PREDEFINED_LAYOUTS = {
+    'BLANK', 'CAPTION_ONLY', 'TITLE', 'TITLE_AND_BODY', 'TITLE_AND_TWO_COLUMNS', 'TITLE_ONLY',
+    'SECTION_HEADER', 'SECTION_TITLE_AND_DESCRIPTION', 'ONE_COLUMN_TEXT', 'MAIN_POINT', 'BIG_NUMBER',
+}
+PLACEHOLDER_TYPES = {'TITLE', 'BODY'}
+
+# Problems listed in the error message; the exception carries all of them
+MAX_REPORTED_PROBLEMS = 20
+
+
+class DeckValidationError(ValueError):
+    def __init__(self, source, problems):
+        """
+        Args:
+            source (str): File the problems were found in
+            problems (list): Human readable problems, e.g. "slides[3].elements.IMAGE[0]: ..."
+        """
+        self.source = source
+        self.problems = problems
+        listed = '\n  '.join(problems[:MAX_REPORTED_PROBLEMS])
+        more = len(problems) - MAX_REPORTED_PROBLEMS
+        super().__init__(f"{source} has {len(problems)} problem(s):\n  {listed}"
+                         + (f"\n  ... and {more} more" if more > 0 else ""))
+
+
+class Record(Mapping):
+    """
+    Slotted record readable like the JSON object it was built from
+
+    Absent optional fields are None and behave like missing keys.
+    """
+
+    __slots__ = ()
+    # JSON key -> attribute name
+    FIELDS = {}
+
+    def __getitem__(self, name):
+        attribute = self.FIELDS.get(name)
+        value = getattr(self, attribute) if attribute else None
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        return (name for name, attribute in self.FIELDS.items() if getattr(self, attribute) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Converts the record back to plain JSON data."""
+        return {name: _plain(value) for name, value in self.items()}
+
+
+def _plain(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+
+class TextElement(Record):
+    __slots__ = ('object_id', 'text', 'placeholder')
+    FIELDS = {'objectId': 'object_id', 'text': 'text', 'placeholder': 'placeholder'}
+
+    def __init__(self, text, object_id=None, placeholder=None):
+        self.text = text
+        self.object_id = object_id
+        self.placeholder = placeholder
+
+
+class ImageElement(Record):
+    __slots__ = ('object_id', 'image_prompt', 'aspect_ratio', 'is_background', 'size', 'variant')
+    FIELDS = {'objectId': 'object_id', 'image_prompt': 'image_prompt', 'aspect_ratio': 'aspect_ratio',
+              'isBackground': 'is_background', 'size': 'size', 'variant': 'variant'}
+
+    def __init__(self, object_id=None, image_prompt=None, aspect_ratio=None, is_background=None,
+                 size=None, variant=None):
+        self.object_id = object_id
+        self.image_prompt = image_prompt
+        self.aspect_ratio = aspect_ratio
+        self.is_background = is_background
+        self.size = size
+        self.variant = variant
+
+
+class Elements(Record):
+    __slots__ = ('text', 'image')
+    FIELDS = {'TEXT': 'text', 'IMAGE': 'image'}
+
+    def __init__(self, text=None, image=None):
+        self.text = text
+        self.image = image
+
+
+class Slide(Record):
+    __slots__ = ('slide_number', 'exists', 'layout', 'notes', 'elements')
+    FIELDS = {'slideNumber': 'slide_number', 'exists': 'exists', 'layout': 'layout',
+              'notes': 'notes', 'elements': 'elements'}
+
+    def __init__(self, slide_number, exists=None, layout=None, notes=None, elements=None):
+        self.slide_number = slide_number
+        self.exists = exists
+        self.layout = layout
+        self.notes = notes
+        self.elements = elements
+
+
+class Variable(Record):
+    """Replacement for a template token, optionally limited to some slides."""
+
+    __slots__ = ('text', 'slides', 'page_object_ids', 'match_case')
+    FIELDS = {'text': 'text', 'slides': 'slides', 'pageObjectIds': 'page_object_ids', 'matchCase': 'match_case'}
+
+    def __init__(self, text, slides=None, page_object_ids=None, match_case=None):
+        self.text = text
+        self.slides = slides
+        self.page_object_ids = page_object_ids
+        self.match_case = match_case
+
+
+class Deck(Record):
+    __slots__ = ('slides', 'presentation_id', 'variables')
+    FIELDS = {'slides': 'slides', 'presentation_id': 'presentation_id', 'variables': 'variables'}
+
+    def __init__(self, slides, presentation_id=None, variables=None):
+        self.slides = slides
+        self.presentation_id = presentation_id
+        # Token -> Variable, e.g. '[campaign name]' -> Variable('Summer Splash')
+        self.variables = variables
+
+
+class _Checker:
+    """Builds records from parsed JSON, collecting every problem instead of stopping at the first."""
+
+    def __init__(self):
+        self.problems = []
+        self.slide_numbers = set()
+        self.object_ids = set()
+
+    def fail(self, path, message):
+        self.problems.append(f"{path}: {message}")
+
+    def typed(self, data, key, types, path, required=False):
+        value = data.get(key)
+        if value is None:
+            if required:
+                self.fail(path, f"missing '{key}'")
+            return None
+        # bool is an int subclass, so whole numbers must not accept it
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in _as_tuple(types)):
+            self.fail(path, f"'{key}' should be {_type_names(types)}, not {type(value).__name__}")
+            return None
+        return value
+
+    def object_id(self, data, path):
+        object_id = self.typed(data, 'objectId', str, path)
+        if object_id is not None:
+            if object_id in self.object_ids:
+                self.fail(path, f"objectId {object_id} is used more than once")
+            self.object_ids.add(object_id)
+        return object_id
+
+    def slide(self, data, path):
+        if not isinstance(data, dict):
+            self.fail(path, "slide should be an object")
+            return None
+        number = self.typed(data, 'slideNumber', int, path, required=True)
+        if number is not None:
+            if number < 1:
+                self.fail(path, f"slideNumber {number} should be 1 or more")
+            elif number in self.slide_numbers:
+                self.fail(path, f"slideNumber {number} is used more than once")
+            self.slide_numbers.add(number)
+        exists = self.typed(data, 'exists', bool, path)
+        layout = self.typed(data, 'layout', str, path)
+        if layout is not None and not exists and layout not in PREDEFINED_LAYOUTS:
+            self.fail(path, f"layout {layout} is not a predefined layout")
+
+        elements = None
+        raw_elements = self.typed(data, 'elements', dict, path)
+        if raw_elements is not None:
+            for kind in raw_elements:
+                if kind not in Elements.FIELDS:
+                    self.fail(f"{path}.elements", f"unknown element type {kind}")
+            text = self.typed(raw_elements, 'TEXT', list, f"{path}.elements")
+            image = self.typed(raw_elements, 'IMAGE', list, f"{path}.elements")
+            elements = Elements(
+                text=None if text is None else [
+                    record for index, item in enumerate(text)
+                    if (record := self.text(item, f"{path}.elements.TEXT[{index}]")) is not None
+                ],
+                image=None if image is None else [
+                    record for index, item in enumerate(image)
+                    if (record := self.image(item, f"{path}.elements.IMAGE[{index}]")) is not None
+                ],
+            )
+        return Slide(number, exists, layout, self.typed(data, 'notes', str, path), elements)
+
+    def text(self, data, path):
+        if not isinstance(data, dict):
+            self.fail(path, "element should be an object")
+            return None
+        placeholder = self.typed(data, 'placeholder', str, path)
+        if placeholder is not None and placeholder not in PLACEHOLDER_TYPES:
+            self.fail(path, f"placeholder should be one of {sorted(PLACEHOLDER_TYPES)}")
+        return TextElement(self.typed(data, 'text', str, path, required=True),
+                           self.object_id(data, path), placeholder)
+
+    def image(self, data, path):
+        if not isinstance(data, dict):
+            self.fail(path, "element should be an object")
+            return None
+        aspect_ratio = self.typed(data, 'aspect_ratio', str, path)
+        if aspect_ratio is not None and aspect_ratio not in VALID_ASPECT_RATIOS:
+            self.fail(path, f"aspect_ratio {aspect_ratio} should be one of {sorted(VALID_ASPECT_RATIOS)}")
+        size = self.typed(data, 'size', dict, path)
+        if size is not None:
+            width, height = size.get('width'), size.get('height')
+            if not all(isinstance(value, (int, float)) and value > 0 for value in (width, height)):
+                self.fail(path, "size should have positive 'width' and 'height' in points")
+                size = None
+            else:
+                size = {'width': width, 'height': height}
+        variant = self.typed(data, 'variant', int, path)
+        if variant is not None and variant < 0:
+            self.fail(path, "variant should be 0 or more")
+        return ImageElement(
+            self.object_id(data, path),
+            self.typed(data, 'image_prompt', str, path),
+            aspect_ratio,
+            self.typed(data, 'isBackground', bool, path),
+            size,
+            variant
+        )
+
+    def variables(self, data, path):
+        variables = self.typed(data, 'variables', dict, path)
+        if variables is None:
+            return None
+        records = {}
+        for token, value in variables.items():
+            item_path = f"{path}variables[{json.dumps(token)}]"
+            if not token:
+                self.fail(item_path, "token should not be empty")
+                continue
+            # A bare string replaces the token everywhere
+            if isinstance(value, str):
+                records[token] = Variable(value)
+                continue
+            if not isinstance(value, dict):
+                self.fail(item_path, f"should be a string or an object, not {type(value).__name__}")
+                continue
+            slides = self.typed(value, 'slides', list, item_path)
+            if slides is not None and not all(isinstance(number, int) and not isinstance(number, bool)
+                                               and number >= 1 for number in slides):
+                self.fail(item_path, "'slides' should list slide numbers")
+                slides = None
+            page_object_ids = self.typed(value, 'pageObjectIds', list, item_path)
+            if page_object_ids is not None and not all(isinstance(page_id, str) for page_id in page_object_ids):
+                self.fail(item_path, "'pageObjectIds' should list page objectIds")
+                page_object_ids = None
+            text = self.typed(value, 'text', str, item_path, required=True)
+            if text is not None:
+                records[token] = Variable(text, slides, page_object_ids, self.typed(value, 'matchCase', bool, item_path))
+        return records
+
+    def deck(self, data, path):
+        if not isinstance(data, dict):
+            self.fail(path, "deck should be an object")
+            return None
+        slides = self.typed(data, 'slides', list, path, required=True) or []
+        return Deck(
+            [record for index, item in enumerate(slides)
+             if (record := self.slide(item, f"{path}slides[{index}]")) is not None],
+            self.typed(data, 'presentation_id', str, path),
+            self.variables(data, path)
+        )
+
+
+def _as_tuple(types):
+    return types if isinstance(types, tuple) else (types,)
+
+
+def _type_names(types):
+    names = {int: 'an integer', str: 'a string', bool: 'true or false', list: 'a list',
+             dict: 'an object', float: 'a number'}
+    return ' or '.join(names.get(t, t.__name__) for t in _as_tuple(types))
+
+
+def _require_ijson():
+    if ijson is None:
+        raise ImportError("Streaming needs the ijson package (pip install ijson)")
+
+
+def load_deck(path, stream=False):
+    """
+    Reads and validates one deck (the JSON exported from Google Apps Script)
+
+    Args:
+        path (str): Input JSON file with a 'slides' list
+        stream (bool): Parse slide by slide with ijson instead of loading the whole
+                       file, so only the compact records are held in memory
+
+    Returns:
+        Deck: Validated records, readable like the original dict
+
+    Raises:
+        DeckValidationError: Listing every problem in the file
+    """
+    checker = _Checker()
+    if stream:
+        _require_ijson()
+        with open(path, "rb") as f:
+            slides = [
+                record for index, item in enumerate(ijson.items(f, 'slides.item', use_float=True))
+                if (record := checker.slide(item, f"slides[{index}]")) is not None
+            ]
+        # The small variables map is read in a second pass, wherever it is in the file
+        with open(path, "rb") as f:
+            variables = next(ijson.items(f, 'variables'), None)
+        deck = Deck(slides, variables=checker.variables({'variables': variables}, ''))
+    else:
+        with open(path, "r") as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise DeckValidationError(path, [f"not valid JSON: {str(e)}"])
+        deck = checker.deck(data, '')
+    if checker.problems:
+        raise DeckValidationError(path, checker.problems)
+    return deck
+
+
+def _raw_decks(path, stream):
+    if stream:
+        _require_ijson()
+        with open(path, "rb") as f:
+            yield from ijson.items(f, 'item', use_float=True)
+    else:
+        with open(path, "r") as f:
+            yield from json.load(f)
+
+
+def _check_deck(data, index):
+    checker = _Checker()
+    return checker.deck(data, f"[{index}]."), checker.problems
+
+
+def iter_decks(path, stream=True):
+    """
+    Yields the validated decks of a multi-deck file (a JSON list of decks) one at a time
+
+    Only the deck being processed is held in memory when streaming. Run
+    check_decks first so a bad deck late in the file fails before any work starts.
+
+    Raises:
+        DeckValidationError: At the first deck with problems
+    """
+    for index, data in enumerate(_raw_decks(path, stream)):
+        deck, problems = _check_deck(data, index)
+        if problems:
+            raise DeckValidationError(path, problems)
+        yield deck
+
+
+def check_decks(path, stream=True):
+    """
+    Validates every deck of a multi-deck file without keeping them
+
+    Returns:
+        list: Each deck's presentation_id (None where it has none), in file order
+
+    Raises:
+        DeckValidationError: Listing the problems of every bad deck
+    """
+    problems = []
+    presentation_ids = []
+    for index, data in enumerate(_raw_decks(path, stream)):
+        deck, deck_problems = _check_deck(data, index)
+        problems.extend(deck_problems)
+        presentation_ids.append(deck.presentation_id if deck is not None else None)
+    if problems:
+        raise DeckValidationError(path, problems)
+    return presentation_ids
@@ -0,0 +1,601 @@
+"""
+In-process stand-ins for the Slides, Drive, Imagen and GCS clients, for offline runs and benchmarks
+
+Each fake exposes the subset of its client's interface that PresentationUpdater and
+ImageHandler use, and can simulate latency, random server errors and a per-minute quota.
+"""
+
+import asyncio
+import copy
+import hashlib
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+# Sizes (in points) of the image placeholders the fake presentation is seeded with
+PLACEHOLDER_SIZES = {
+    '1:1': (300, 300),
+    '3:4': (225, 300),
+    '4:3': (300, 225),
+    '9:16': (169, 300),
+    '16:9': (300, 169),
+}
+BACKGROUND_SIZE = (720, 405)
+EMU_PER_PT = 12700
+
+# Pixel dimensions Imagen returns for each aspect ratio
+IMAGEN_DIMENSIONS = {
+    '1:1': (1024, 1024),
+    '3:4': (896, 1280),
+    '4:3': (1280, 896),
+    '9:16': (768, 1408),
+    '16:9': (1408, 768),
+}
+
+
+class FakeHttpError(Exception):
+    """Mimics googleapiclient's HttpError (resp.status) and genai's APIError (code)."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.code = status
+        self.resp = _FakeResponse(status)
+        if retry_after is not None:
+            self.resp['retry-after'] = str(retry_after)
+
+
+class _FakeResponse(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+
+
+class FakeBackend:
+    def __init__(self, latency=0.0, error_rate=0.0, quota_per_minute=None, seed=None):
+        """
+        Initialize the simulated service behaviour
+
+        Args:
+            latency (float): Seconds every call takes
+            error_rate (float): Probability of a call failing with a 503
+            quota_per_minute (int): Calls allowed in any 60s window; more get a 429
+            seed (int): Seed for the error randomness
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.calls = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def call_count(self):
+        return sum(self.calls.values())
+
+    def _call(self, name):
+        """Accounts for one API call and applies quota, errors and latency."""
+        failed = self._account(name)
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise FakeHttpError(503, "Service unavailable")
+
+    async def _call_async(self, name):
+        """Like _call, but waits out the latency on the event loop."""
+        failed = self._account(name)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if failed:
+            raise FakeHttpError(503, "Service unavailable")
+
+    def _account(self, name):
+        """Counts the call and enforces the quota; returns whether it should fail."""
+        with self._lock:
+            now = time.monotonic()
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.quota_per_minute:
+                while self._window and now - self._window[0] >= 60:
+                    self._window.popleft()
+                if len(self._window) >= self.quota_per_minute:
+                    self.throttled += 1
+                    retry_after = round(60 - (now - self._window[0]), 3)
+                    raise FakeHttpError(429, "Quota exceeded", retry_after=retry_after)
+                self._window.append(now)
+            return self._random.random() < self.error_rate
+
+
+class _Request:
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self):
+        return self._func()
+
+
+# ---------------------------------------------------------------- Slides
+
+class FakeSlidesService(FakeBackend):
+    """
+    Fake of build('slides', 'v1') holding presentations in memory
+
+    batchUpdate is applied atomically like the real API: an unknown objectId or a
+    duplicate ID rejects the whole batch with a 400. Text indexes count UTF-16
+    code units, as in the real API, so an emoji takes up two.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.decks = {}
+
+    def presentations(self):
+        return self
+
+    def add_presentation(self, presentation_id, slides_data=()):
+        """
+        Seeds a presentation with the existing slides of an input JSON
+
+        Args:
+            presentation_id (str): ID the fake presentation is stored under
+            slides_data (list): 'slides' of an input JSON; only slides with
+                                'exists' are created, as in a real template
+        """
+        deck = {'slides': [], 'objects': {}}
+        for slide in slides_data:
+            if not slide.get('exists'):
+                continue
+            page_id = f"p{slide['slideNumber']}_{presentation_id[:8]}"
+            deck['slides'].append({
+                'objectId': page_id,
+                'layout': slide.get('layout'),
+                'notes': slide.get('notes', ''),
+            })
+            for text_elem in slide.get('elements', {}).get('TEXT', []):
+                if text_elem.get('objectId'):
+                    deck['objects'][text_elem['objectId']] = {
+                        'kind': 'shape', 'page': page_id, 'text': text_elem.get('text', ''),
+                        'size': (300, 100), 'position': (50, 50), 'placeholder': None,
+                    }
+            for image_elem in slide.get('elements', {}).get('IMAGE', []):
+                if image_elem.get('objectId'):
+                    if image_elem.get('isBackground'):
+                        size, position = BACKGROUND_SIZE, (0, 0)
+                    else:
+                        size = PLACEHOLDER_SIZES.get(image_elem.get('aspect_ratio', '1:1'), (300, 300))
+                        position = (360, 50)
+                    deck['objects'][image_elem['objectId']] = {
+                        'kind': 'image', 'page': page_id, 'url': None,
+                        'size': size, 'position': position, 'placeholder': None,
+                    }
+        self.decks[presentation_id] = deck
+        return presentation_id
+
+    def get(self, presentationId, fields=None):
+        def run():
+            self._call('get')
+            return self._render(presentationId)
+        return _Request(run)
+
+    def batchUpdate(self, presentationId, body):
+        def run():
+            self._call('batchUpdate')
+            with self._lock:
+                deck = self._deck(presentationId)
+                # Work on a copy so a failing request leaves the deck untouched
+                staged = copy.deepcopy(deck)
+                replies = [self._apply(staged, request) for request in body.get('requests', [])]
+                self.decks[presentationId] = staged
+            return {'presentationId': presentationId, 'replies': replies}
+        return _Request(run)
+
+    def _deck(self, presentation_id):
+        if presentation_id not in self.decks:
+            raise FakeHttpError(404, f"Requested entity was not found: {presentation_id}")
+        return self.decks[presentation_id]
+
+    def _object(self, deck, object_id, kind=None):
+        obj = deck['objects'].get(object_id)
+        if obj is None or (kind and obj['kind'] != kind):
+            raise FakeHttpError(400, f"Invalid requests: The object ({object_id}) could not be found.")
+        return obj
+
+    def _new_id(self, deck, object_id):
+        if object_id in deck['objects'] or any(s['objectId'] == object_id for s in deck['slides']):
+            raise FakeHttpError(400, f"Invalid requests: The object ID ({object_id}) should be unique.")
+        return object_id
+
+    def _apply(self, deck, request):
+        kind, params = next(iter(request.items()))
+        if kind == 'createSlide':
+            page_id = self._new_id(deck, params.get('objectId') or f"gen_{len(deck['slides'])}_{time.time_ns()}")
+            layout = params.get('slideLayoutReference', {}).get('predefinedLayout', 'BLANK')
+            index = min(params.get('insertionIndex', len(deck['slides'])), len(deck['slides']))
+            deck['slides'].insert(index, {'objectId': page_id, 'layout': layout, 'notes': ''})
+            for mapping in params.get('placeholderIdMappings', []):
+                deck['objects'][self._new_id(deck, mapping['objectId'])] = {
+                    'kind': 'shape', 'page': page_id, 'text': '', 'size': (600, 80), 'position': (60, 40),
+                    'placeholder': mapping['layoutPlaceholder']['type'],
+                }
+            return {'createSlide': {'objectId': page_id}}
+        if kind in ('createShape', 'createImage'):
+            properties = params['elementProperties']
+            if not any(s['objectId'] == properties['pageObjectId'] for s in deck['slides']):
+                raise FakeHttpError(400, f"Invalid requests: The page ({properties['pageObjectId']}) could not be found.")
+            size = properties.get('size', {})
+            deck['objects'][self._new_id(deck, params['objectId'])] = {
+                'kind': 'shape' if kind == 'createShape' else 'image',
+                'page': properties['pageObjectId'], 'text': '', 'url': params.get('url'),
+                'size': (size.get('width', {}).get('magnitude', 0), size.get('height', {}).get('magnitude', 0)),
+                'position': (properties.get('transform', {}).get('translateX', 0),
+                             properties.get('transform', {}).get('translateY', 0)),
+                'placeholder': None,
+            }
+            return {kind: {'objectId': params['objectId']}}
+        if kind == 'deleteText':
+            obj = self._object(deck, params['objectId'], 'shape')
+            text_range = params.get('textRange', {'type': 'ALL'})
+            if text_range['type'] == 'ALL':
+                obj['text'] = ''
+            else:
+                length = _utf16_length(obj['text'])
+                start = text_range.get('startIndex', 0)
+                end = text_range.get('endIndex', length) if text_range['type'] == 'FIXED_RANGE' else length
+                if not 0 <= start <= end <= length:
+                    raise FakeHttpError(400, f"Invalid requests: The range is out of bounds for {params['objectId']}.")
+                start = _code_point_index(obj['text'], start, params['objectId'])
+                end = _code_point_index(obj['text'], end, params['objectId'])
+                obj['text'] = obj['text'][:start] + obj['text'][end:]
+            return {}
+        if kind == 'insertText':
+            obj = self._object(deck, params['objectId'], 'shape')
+            index = params.get('insertionIndex', 0)
+            if not 0 <= index <= _utf16_length(obj['text']):
+                raise FakeHttpError(400, f"Invalid requests: The insertion index is out of bounds for {params['objectId']}.")
+            index = _code_point_index(obj['text'], index, params['objectId'])
+            obj['text'] = obj['text'][:index] + params['text'] + obj['text'][index:]
+            return {}
+        if kind == 'replaceImage':
+            self._object(deck, params['imageObjectId'], 'image')['url'] = params['url']
+            return {}
+        if kind == 'replaceAllText':
+            needle = params['containsText']['text']
+            match_case = params['containsText'].get('matchCase', False)
+            pages = set(params.get('pageObjectIds') or [])
+            changed = 0
+            for obj in deck['objects'].values():
+                if obj['kind'] != 'shape' or (pages and obj['page'] not in pages):
+                    continue
+                haystack = obj['text'] if match_case else obj['text'].lower()
+                occurrences = haystack.count(needle if match_case else needle.lower())
+                if occurrences:
+                    changed += occurrences
+                    obj['text'] = _replace(obj['text'], needle, params['replaceText'], match_case)
+            return {'replaceAllText': {'occurrencesChanged': changed}}
+        raise FakeHttpError(400, f"Invalid requests: Unsupported request {kind}.")
+
+    def _render(self, presentation_id):
+        """Builds a presentations.get response in the real API's shape."""
+        with self._lock:
+            deck = copy.deepcopy(self._deck(presentation_id))
+        elements_by_page = {}
+        for object_id, obj in deck['objects'].items():
+            elements_by_page.setdefault(obj['page'], []).append((object_id, obj))
+        slides = []
+        for slide in deck['slides']:
+            page_elements = [_render_element(object_id, obj) for object_id, obj in elements_by_page.get(slide['objectId'], [])]
+            notes_id = f"{slide['objectId']}_notes"
+            slides.append({
+                'objectId': slide['objectId'],
+                'pageElements': page_elements,
+                'slideProperties': {
+                    'layoutObjectId': f"layout_{slide['layout'] or 'CUSTOM'}",
+                    'notesPage': {
+                        'notesProperties': {'speakerNotesObjectId': notes_id},
+                        'pageElements': [_render_element(notes_id, {
+                            'kind': 'shape', 'text': slide['notes'], 'size': (0, 0),
+                            'position': (0, 0), 'placeholder': 'BODY',
+                        })],
+                    },
+                },
+            })
+        layouts = sorted({slide['layout'] or 'CUSTOM' for slide in deck['slides']})
+        return {
+            'presentationId': presentation_id,
+            'pageSize': {'width': {'magnitude': 720 * EMU_PER_PT, 'unit': 'EMU'},
+                         'height': {'magnitude': 405 * EMU_PER_PT, 'unit': 'EMU'}},
+            'slides': slides,
+            'layouts': [{'objectId': f'layout_{name}', 'layoutProperties': {'name': name}} for name in layouts],
+        }
+
+
+def _utf16_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _code_point_index(text, index, object_id):
+    """
+    Converts a Slides text index, counted in UTF-16 code units, to a str index
+
+    Raises:
+        FakeHttpError: A 400 if the index splits a character outside the BMP, as the real API does
+    """
+    units = 0
+    for position, character in enumerate(text):
+        if units == index:
+            return position
+        units += 2 if ord(character) > 0xFFFF else 1
+        if units > index:
+            raise FakeHttpError(400, f"Invalid requests: The index {index} splits a character in {object_id}.")
+    return len(text)
+
+
+def _replace(text, needle, replacement, match_case):
+    if match_case:
+        return text.replace(needle, replacement)
+    lowered, needle_lower, pieces, start = text.lower(), needle.lower(), [], 0
+    index = lowered.find(needle_lower)
+    while index != -1:
+        pieces.append(text[start:index])
+        pieces.append(replacement)
+        start = index + len(needle)
+        index = lowered.find(needle_lower, start)
+    pieces.append(text[start:])
+    return ''.join(pieces)
+
+
+def _render_element(object_id, obj):
+    width, height = obj['size']
+    element = {
+        'objectId': object_id,
+        'size': {'width': {'magnitude': width * EMU_PER_PT, 'unit': 'EMU'},
+                 'height': {'magnitude': height * EMU_PER_PT, 'unit': 'EMU'}},
+        'transform': {'scaleX': 1, 'scaleY': 1, 'translateX': obj['position'][0] * EMU_PER_PT,
+                      'translateY': obj['position'][1] * EMU_PER_PT, 'unit': 'EMU'},
+    }
+    if obj['kind'] == 'image':
+        element['image'] = {'contentUrl': obj.get('url') or '', 'sourceUrl': obj.get('url') or ''}
+        return element
+    text_elements, index = [], 0
+    for paragraph in (obj['text'] + '\n').splitlines(keepends=True) if obj['text'] else []:
+        # Like the real API, indexes count UTF-16 code units
+        text_elements.append({'startIndex': index, 'endIndex': index + _utf16_length(paragraph),
+                              'textRun': {'content': paragraph}})
+        index += _utf16_length(paragraph)
+    element['shape'] = {'shapeType': 'TEXT_BOX', 'text': {'textElements': text_elements}}
+    if obj.get('placeholder'):
+        element['shape']['placeholder'] = {'type': obj['placeholder']}
+    return element
+
+
+# ---------------------------------------------------------------- Drive
+
+class FakeDriveService(FakeBackend):
+    """Fake of build('drive', 'v3') whose files().copy duplicates a FakeSlidesService deck."""
+
+    def __init__(self, slides_service, **kwargs):
+        super().__init__(**kwargs)
+        self.slides_service = slides_service
+        self.names = {}
+
+    def files(self):
+        return self
+
+    def copy(self, fileId, body=None, fields=None, supportsAllDrives=None):
+        def run():
+            self._call('copy')
+            slides = self.slides_service
+            with slides._lock:
+                template = slides._deck(fileId)
+                new_id = f"copy_{hashlib.sha256(f'{fileId}{time.time_ns()}'.encode('utf-8')).hexdigest()[:24]}"
+                # Like a real Drive copy, every objectId stays the same
+                slides.decks[new_id] = copy.deepcopy(template)
+            self.names[new_id] = (body or {}).get('name')
+            return {'id': new_id}
+        return _Request(run)
+
+
+# ---------------------------------------------------------------- Imagen
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeGenaiClient(FakeBackend):
+    """Fake of genai.Client exposing models.generate_images and its aio counterpart."""
+
+    def __init__(self, image_scale=0.125, **kwargs):
+        """
+        Args:
+            image_scale (float): Fraction of Imagen's real pixel dimensions to return
+            **kwargs: Latency, error rate and quota, see FakeBackend
+        """
+        super().__init__(**kwargs)
+        self.image_scale = image_scale
+        self.images_generated = 0
+        self.models = _Namespace(generate_images=self.generate_images)
+        self.aio = _Namespace(models=_Namespace(generate_images=self.generate_images_async))
+
+    def generate_images(self, model, prompt, config=None):
+        self._call('generate_images')
+        return self._images(prompt, config)
+
+    async def generate_images_async(self, model, prompt, config=None):
+        await self._call_async('generate_images')
+        return self._images(prompt, config)
+
+    def _images(self, prompt, config):
+        count = getattr(config, 'number_of_images', 1) or 1
+        aspect_ratio = getattr(config, 'aspect_ratio', None) or '1:1'
+        width, height = IMAGEN_DIMENSIONS.get(aspect_ratio, IMAGEN_DIMENSIONS['1:1'])
+        width, height = max(1, int(width * self.image_scale)), max(1, int(height * self.image_scale))
+        images = []
+        for variant in range(count):
+            seed = hashlib.sha256(f"{prompt}|{variant}|{time.time_ns()}".encode('utf-8')).digest()
+            image_bytes = make_png(width, height, seed)
+            images.append(_Namespace(image=_Namespace(image_bytes=image_bytes, mime_type='image/png')))
+        with self._lock:
+            self.images_generated += count
+        return _Namespace(generated_images=images)
+
+
+def make_png(width, height, seed=b''):
+    """
+    Encodes a noisy RGB PNG, roughly as incompressible as a real photo
+
+    Returns:
+        bytes: PNG file contents
+    """
+    rng = random.Random(seed)
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+
+# ---------------------------------------------------------------- GCS
+
+class FakeStorageClient(FakeBackend):
+    """Fake of storage.Client holding bucket contents in memory."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.buckets = {}
+        self.bytes_uploaded = 0
+        self._batch = threading.local()
+
+    def bucket(self, bucket_name):
+        if bucket_name not in self.buckets:
+            self.buckets[bucket_name] = FakeBucket(self, bucket_name)
+        return self.buckets[bucket_name]
+
+    def lookup_bucket(self, bucket_name):
+        return self.buckets.get(bucket_name)
+
+    def list_blobs(self, bucket_or_name, prefix=None):
+        bucket = bucket_or_name if isinstance(bucket_or_name, FakeBucket) else self.bucket(bucket_or_name)
+        return bucket.list_blobs(prefix=prefix)
+
+    @contextmanager
+    def batch(self):
+        """Like storage.Client.batch: deletes inside the block are sent as one call when it exits."""
+        pending = self._batch.pending = []
+        try:
+            yield
+        finally:
+            self._batch.pending = None
+        self._call('batch')
+        errors = []
+        for blob in pending:
+            try:
+                blob._delete()
+            except FakeHttpError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.objects = {}
+        self.lifecycle_rules = []
+
+    def add_lifecycle_delete_rule(self, **condition):
+        rule = {'action': {'type': 'Delete'}, 'condition': {}}
+        for name, value in condition.items():
+            # age=30, matches_prefix=[...] -> {'age': 30, 'matchesPrefix': [...]}
+            head, *rest = name.split('_')
+            rule['condition'][head + ''.join(part.title() for part in rest)] = value
+        self.lifecycle_rules = list(self.lifecycle_rules) + [rule]
+
+    def patch(self):
+        self.client._call('patch_bucket')
+
+    def blob(self, blob_name):
+        return FakeBlob(self, blob_name)
+
+    def list_blobs(self, prefix=None):
+        self.client._call('list_blobs')
+        with self.client._lock:
+            names = sorted(name for name in self.objects if not prefix or name.startswith(prefix))
+        return [self._stored_blob(name) for name in names]
+
+    def _stored_blob(self, name):
+        blob = FakeBlob(self, name)
+        stored = self.objects[name]
+        blob.content_type = stored['content_type']
+        blob.cache_control = stored['cache_control']
+        blob.size = len(stored['data'])
+        blob.time_created = stored['time_created']
+        return blob
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.cache_control = None
+        self.size = None
+        self.time_created = None
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._store(bytes(data), content_type)
+
+    def upload_from_file(self, file_obj, content_type=None, size=None, rewind=False):
+        if rewind:
+            file_obj.seek(0)
+        self._store(file_obj.read() if size is None else file_obj.read(size), content_type)
+
+    def _store(self, data, content_type):
+        client = self.bucket.client
+        client._call('upload')
+        with client._lock:
+            client.bytes_uploaded += len(data)
+            self.bucket.objects[self.name] = {
+                'data': data,
+                'content_type': content_type or self.content_type,
+                'cache_control': self.cache_control,
+                'time_created': time.time(),
+            }
+        self.size = len(data)
+
+    def patch(self):
+        client = self.bucket.client
+        client._call('patch')
+        with client._lock:
+            if self.name not in self.bucket.objects:
+                raise FakeHttpError(404, f"No such object: {self.bucket.name}/{self.name}")
+            self.bucket.objects[self.name]['cache_control'] = self.cache_control
+
+    def exists(self):
+        self.bucket.client._call('exists')
+        return self.name in self.bucket.objects
+
+    def delete(self):
+        client = self.bucket.client
+        pending = getattr(client._batch, 'pending', None)
+        if pending is not None:
+            pending.append(self)
+            return
+        client._call('delete')
+        self._delete()
+
+    def _delete(self):
+        client = self.bucket.client
+        with client._lock:
+            if self.bucket.objects.pop(self.name, None) is None:
+                raise FakeHttpError(404, f"No such object: {self.bucket.name}/{self.name}")
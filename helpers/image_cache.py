@@ -0,0 +1,129 @@
+"""
+Local index of generated images so repeated prompts reuse the stored blob instead of calling Imagen again
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import config
+
+DEFAULT_CACHE_FILE = '.image_cache.json'
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+class ImageCache:
+    def __init__(self, index_path=None, max_entries=None, max_age_days=None):
+        """
+        Load (or start) the on-disk cache index
+
+        Args:
+            index_path (str): JSON file holding the index (default: config.IMAGE_CACHE_FILE)
+            max_entries (int): Entries kept before the least recently used are evicted
+            max_age_days (float): Entries older than this are evicted
+        """
+        self.index_path = index_path or getattr(config, 'IMAGE_CACHE_FILE', DEFAULT_CACHE_FILE)
+        self.max_entries = max_entries or getattr(config, 'IMAGE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        self.max_age_days = max_age_days or getattr(config, 'IMAGE_CACHE_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable image cache {self.index_path}: {str(e)}")
+
+    @staticmethod
+    def make_key(model, prompt, aspect_ratio, seed=None, encoding=None, variant=0):
+        """
+        Builds the content address of an image
+
+        Args:
+            encoding (list): Output format settings, when they differ from Imagen's PNG
+            variant (int): Which of several distinct images for the same prompt
+
+        Returns:
+            str: Hex digest identifying (model, prompt, aspect_ratio, seed[, encoding][, variant])
+        """
+        key = [model, prompt, aspect_ratio, seed]
+        if encoding is not None or variant:
+            key.append(encoding)
+        if variant:
+            key.append(variant)
+        payload = json.dumps(key, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _expired(self, entry, now):
+        return now - entry['created'] > self.max_age_days * 86400
+
+    def get(self, key):
+        """
+        Looks up a cached image
+
+        Returns:
+            str: Public URL of the stored image, or None on a miss
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            now = time.time()
+            if entry is None or self._expired(entry, now):
+                return None
+            entry['last_used'] = now
+            return entry['url']
+
+    def put(self, key, url, object_name):
+        """Records a freshly stored image and persists the index."""
+        now = time.time()
+        with self._lock:
+            self.entries[key] = {
+                'url': url,
+                'object_name': object_name,
+                'created': now,
+                'last_used': now,
+            }
+            self._save_locked()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones above max_entries
+
+        Returns:
+            list: The evicted entries (their 'object_name' can be deleted from GCS)
+        """
+        now = time.time()
+        with self._lock:
+            evicted_keys = [key for key, entry in self.entries.items() if self._expired(entry, now)]
+            expired = set(evicted_keys)
+            remaining = sorted(
+                (key for key in self.entries if key not in expired),
+                key=lambda key: self.entries[key]['last_used']
+            )
+            overflow = len(remaining) - self.max_entries
+            if overflow > 0:
+                evicted_keys.extend(remaining[:overflow])
+            evicted = [self.entries.pop(key) for key in evicted_keys]
+            self._save_locked()
+        return evicted
+
+    def object_names(self):
+        """
+        Returns:
+            set: GCS object names of every cached image
+        """
+        with self._lock:
+            return {entry['object_name'] for entry in self.entries.values()}
+
+    def save(self):
+        """Writes the index to disk."""
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        # Write to a temporary file first so a crash never leaves a truncated index
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,202 @@
+"""
+Finds generated images no presentation, cache entry or resumable run still uses and deletes them from GCS
+"""
+
+import time
+from helpers.image_cache import DEFAULT_MAX_AGE_DAYS
+from helpers.rate_limiter import get_rate_limiter, get_status_code
+from helpers.instrumentation import get_tracer
+from helpers.run_journal import RunJournal
+import config
+
+DEFAULT_GRACE_DAYS = 2
+# GCS accepts up to 100 calls per batch request
+BATCH_SIZE = 100
+
+# Only image sources are needed to find the blobs a presentation still points at
+IMAGE_FIELDS = 'objectId,image(sourceUrl)'
+REFERENCE_FIELDS = f'slides(pageElements({IMAGE_FIELDS},elementGroup(children({IMAGE_FIELDS}))))'
+
+
+def _source_urls(presentation):
+    for page in presentation.get('slides', []):
+        for element in page.get('pageElements', []):
+            for item in [element] + element.get('elementGroup', {}).get('children', []):
+                url = item.get('image', {}).get('sourceUrl')
+                if url:
+                    yield url
+
+
+class ImageGarbageCollector:
+    def __init__(self, storage_client, bucket_name=None, prefix=None, grace_days=None, rate_limiter=None):
+        """
+        Initialize the collector for one bucket
+
+        Args:
+            storage_client: GCS client (storage.Client or helpers.fakes.FakeStorageClient)
+            bucket_name (str): Bucket holding the images (default: config.GCS_BUCKET_NAME)
+            prefix (str): Only objects under this prefix are considered (default: config.IMAGE_PREFIX or slides/)
+            grace_days (float): Objects younger than this are never deleted, so images of runs
+                                still in progress survive (default: config.IMAGE_GC_GRACE_DAYS or 2)
+            rate_limiter (RateLimiter): Limits the list, get and delete calls (default: the shared limiter)
+        """
+        self.storage_client = storage_client
+        self.bucket_name = bucket_name or config.GCS_BUCKET_NAME
+        self.bucket = storage_client.bucket(self.bucket_name)
+        self.prefix = prefix or getattr(config, 'IMAGE_PREFIX', 'slides/')
+        self.grace_days = grace_days if grace_days is not None else getattr(
+            config, 'IMAGE_GC_GRACE_DAYS', DEFAULT_GRACE_DAYS)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.url_prefix = f"https://storage.googleapis.com/{self.bucket_name}/"
+        self.referenced = set()
+
+    def object_name(self, url):
+        """Object name of one of this bucket's public URLs, or None for any other URL."""
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):].split('?')[0]
+        return None
+
+    def keep_urls(self, urls):
+        """
+        Marks images as in use
+
+        Args:
+            urls (iterable): Public URLs; URLs outside the bucket are ignored
+
+        Returns:
+            int: Number of this bucket's objects marked
+        """
+        names = {name for name in map(self.object_name, urls) if name}
+        self.referenced |= names
+        return len(names)
+
+    def keep_presentation(self, slides_service, presentation_id):
+        """
+        Marks every image a presentation currently shows, read with one presentations.get
+
+        Returns:
+            int: Number of this bucket's objects the presentation references
+        """
+        request = slides_service.presentations().get(
+            presentationId=presentation_id,
+            fields=REFERENCE_FIELDS
+        )
+        execute = get_tracer().traced('slides.get', request.execute)
+        presentation = self.rate_limiter.call('slides', execute)
+        return self.keep_urls(_source_urls(presentation))
+
+    def keep_journals(self, directory=None, now=None):
+        """
+        Marks the images uploaded by runs --resume may still apply
+
+        Those are runs left with pending or failed updates, and runs written to
+        within the grace period, which may still be going.
+        """
+        since = (now or time.time()) - self.grace_days * 86400
+        return self.keep_urls(RunJournal.recorded_urls(directory, since=since))
+
+    def keep_cache(self, cache):
+        """Marks the images an ImageCache can still hand out."""
+        if cache is None:
+            return 0
+        names = cache.object_names()
+        self.referenced |= names
+        return len(names)
+
+    def find_garbage(self, now=None):
+        """
+        Lists the objects under the prefix that are unreferenced and older than the grace period
+
+        Returns:
+            list: Blobs that can be deleted
+        """
+        cutoff = (now or time.time()) - self.grace_days * 86400
+        blobs = self.rate_limiter.call('gcs', lambda: list(self.storage_client.list_blobs(
+            self.bucket, prefix=self.prefix)))
+        garbage = []
+        for blob in blobs:
+            # The prefix placeholder created by docs/setup_gcs.py is not an image
+            if blob.name == self.prefix or blob.name in self.referenced:
+                continue
+            created = blob.time_created
+            if created is not None and not isinstance(created, (int, float)):
+                created = created.timestamp()
+            if created is None or created > cutoff:
+                continue
+            garbage.append(blob)
+        return garbage
+
+    def collect(self, dry_run=False, now=None):
+        """
+        Deletes unreferenced images in GCS batch requests
+
+        Call the keep_* methods first: anything not marked is considered garbage.
+
+        Args:
+            dry_run (bool): Only report what would be deleted
+
+        Returns:
+            dict: 'deleted' (object names), 'failed' (object names) and 'bytes' freed
+        """
+        garbage = self.find_garbage(now)
+        results = {'deleted': [], 'failed': [], 'bytes': sum(blob.size or 0 for blob in garbage)}
+        if dry_run:
+            results['deleted'] = [blob.name for blob in garbage]
+            return results
+
+        tracer = get_tracer()
+        for start in range(0, len(garbage), BATCH_SIZE):
+            chunk = garbage[start:start + BATCH_SIZE]
+
+            def delete_batch():
+                with tracer.span('gcs.delete_batch', objects=len(chunk)):
+                    with self.storage_client.batch():
+                        for blob in chunk:
+                            blob.delete()
+
+            try:
+                self.rate_limiter.call('gcs', delete_batch)
+                results['deleted'].extend(blob.name for blob in chunk)
+            except Exception as e:
+                # A batch fails as a whole (e.g. one object already gone), so retry it object by object
+                print(f"Batch delete failed, deleting one by one: {str(e)}")
+                for blob in chunk:
+                    try:
+                        self.rate_limiter.call('gcs', blob.delete)
+                        results['deleted'].append(blob.name)
+                    except Exception as e:
+                        if get_status_code(e) == 404:
+                            results['deleted'].append(blob.name)
+                        else:
+                            print(f"Error deleting {blob.name}: {str(e)}")
+                            results['failed'].append(blob.name)
+        return results
+
+
+def install_lifecycle_rule(bucket, age_days=None, prefix=None):
+    """
+    Adds a GCS lifecycle rule deleting generated images once the cache can no longer reuse them
+
+    Presentations keep their own copy of inserted images, so an image is only
+    needed while the cache may hand its URL out again; ImageCache treats entries
+    older than IMAGE_CACHE_MAX_AGE_DAYS as misses.
+
+    Args:
+        bucket: Loaded GCS bucket (e.g. from lookup_bucket), so its current rules are kept
+        age_days (int): Age at which images are deleted (default: cache max age plus one day)
+        prefix (str): Only objects under this prefix (default: config.IMAGE_PREFIX or slides/)
+
+    Returns:
+        int: The age in days of the installed rule
+    """
+    age_days = age_days or int(getattr(config, 'IMAGE_CACHE_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS)) + 1
+    prefix = prefix or getattr(config, 'IMAGE_PREFIX', 'slides/')
+    # Replace an earlier rule for the prefix instead of stacking them
+    bucket.lifecycle_rules = [
+        rule for rule in bucket.lifecycle_rules
+        if not (rule.get('action', {}).get('type') == 'Delete'
+                and rule.get('condition', {}).get('matchesPrefix') == [prefix])
+    ]
+    bucket.add_lifecycle_delete_rule(age=age_days, matches_prefix=[prefix])
+    bucket.patch()
+    return age_days
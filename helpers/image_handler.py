@@ -6,11 +6,46 @@ from google import genai
 from google.genai import types
 from google.cloud import storage
 from PIL import Image
+from concurrent.futures import Future
 from io import BytesIO
+import threading
 import uuid
+from helpers.image_cache import ImageCache
+from helpers.rate_limiter import get_rate_limiter
+from helpers.instrumentation import get_tracer
+import config
+
+# Slides only accepts PNG, JPEG and GIF for createImage/replaceImage
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# Pixels rendered per point of placeholder size; 2 keeps images sharp on HiDPI screens
+DEFAULT_PIXELS_PER_POINT = 2
+
+# Imagen returns at most this many images per generate_images call
+MAX_IMAGES_PER_CALL = 4
+
+
+def placeholder_pixel_size(size):
+    """
+    Converts a placeholder size in points (as exported by apps_script.gs) to pixels
+    
+    Args:
+        size (dict): {'width': pt, 'height': pt}, or None if unknown
+        
+    Returns:
+        tuple: (width, height) in pixels, or None
+    """
+    if not size or not size.get('width') or not size.get('height'):
+        return None
+    scale = getattr(config, 'IMAGE_PIXELS_PER_POINT', DEFAULT_PIXELS_PER_POINT)
+    return (round(size['width'] * scale), round(size['height'] * scale))
 
 class ImageHandler:
-    def __init__(self, genai_api_key, bucket_name, project_id):
+    def __init__(self, genai_api_key, bucket_name, project_id, cache=None, seed=None, rate_limiter=None,
+                 client=None, storage_client=None, image_format=None, quality=None, variants_per_call=None):
         """
         Initialize with necessary credentials and configuration
         
@@ -18,66 +53,273 @@ class ImageHandler:
             genai_api_key (str): API key for Google's Generative AI
             bucket_name (str): GCS bucket name for storing images
             project_id (str): Google Cloud project ID
+            cache (ImageCache): Reuse images already generated for the same prompt.
+                                Without a cache every call generates a new image.
+            seed (int): Optional Imagen seed, part of the cache key
+            rate_limiter (RateLimiter): Limits Imagen and GCS calls (default: the shared limiter)
+            client: Pre-built genai client (e.g. helpers.fakes.FakeGenaiClient)
+            storage_client: Pre-built GCS client (e.g. helpers.fakes.FakeStorageClient)
+            image_format (str): "png" or "jpeg" (default: config.IMAGE_FORMAT or "png")
+            quality (int): JPEG quality, 1-95 (default: config.IMAGE_QUALITY or 85)
+            variants_per_call (int): Images requested per Imagen call, up to 4
+                                     (default: config.IMAGE_VARIANTS_PER_CALL or 1). Above 1,
+                                     placeholders sharing a prompt get distinct variants, and
+                                     with a cache the unused variants are kept as spares.
+            
+        Raises:
+            ValueError: If the image format is not one Slides can display
         """
-        self.client = genai.Client(api_key=genai_api_key)
-        self.storage_client = storage.Client(project=project_id)
+        self.client = client or genai.Client(api_key=genai_api_key)
+        self.storage_client = storage_client or storage.Client(project=project_id)
         self.bucket_name = bucket_name
         self.bucket = self.storage_client.bucket(bucket_name)
+        self.model = 'imagen-3.0-generate-002'
+        self.cache = cache
+        self.seed = seed
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.image_format = (image_format or getattr(config, 'IMAGE_FORMAT', 'png')).lower()
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Invalid image_format. Slides accepts: {set(IMAGE_FORMATS)}")
+        self.quality = quality or getattr(config, 'IMAGE_QUALITY', 85)
+        self.variants_per_call = max(1, min(MAX_IMAGES_PER_CALL, variants_per_call or getattr(
+            config, 'IMAGE_VARIANTS_PER_CALL', 1)))
+        # Generations in progress, so concurrent requests for the same image
+        # (e.g. from decks of one batch) wait for it instead of repeating it
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.generations_shared = 0
     
-    def generate_and_store_image(self, prompt, aspect_ratio="1:1"):
+    def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
         """
         Generates an image from a prompt and stores it in GCS
         
         Args:
             prompt (str): Description for image generation
             aspect_ratio (str): One of "1:1", "3:4", "4:3", "9:16", "16:9"
+            target_size (tuple): Rendered (width, height) in pixels of the placeholder;
+                                 larger images are downscaled to cover it
+            variant (int): Which of several distinct images for this prompt to return
             
         Returns:
             str: Public URL of the stored image
         
+        Raises:
+            ValueError: If invalid aspect_ratio is provided
+        """
+        if variant or self.variants_per_call > 1:
+            return self.generate_variants(prompt, aspect_ratio, [variant], target_size)[variant]
+        
+        cache_key, cached_url, flight_key = self._lookup(prompt, aspect_ratio, target_size)
+        if cached_url:
+            return cached_url
+        
+        with self._in_flight_lock:
+            pending = self._in_flight.get(flight_key)
+            if pending is None:
+                pending = self._in_flight[flight_key] = Future()
+                owner = True
+            else:
+                self.generations_shared += 1
+                owner = False
+        if not owner:
+            return pending.result()
+        
+        image_url = None
+        try:
+            image_url = self._generate_and_store(prompt, aspect_ratio, target_size, [cache_key])[0]
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[flight_key]
+            pending.set_result(image_url)
+        return image_url
+    
+    def generate_variants(self, prompt, aspect_ratio="1:1", variants=(0,), target_size=None):
+        """
+        Generates distinct images for one prompt, variants_per_call per Imagen call
+        
+        Cached variants are reused. With a cache, calls are filled up with spare
+        variants (numbered after the requested ones) so a later request for
+        another variant needs no API call.
+        
+        Args:
+            variants (list): Variant numbers wanted
+            
+        Returns:
+            dict: Variant number -> public URL (None on failure)
+        
+        Raises:
+            ValueError: If invalid aspect_ratio is provided
+        """
+        urls, calls = self._plan_variants(prompt, aspect_ratio, target_size, variants)
+        for batch in calls:
+            stored = self._generate_and_store(prompt, aspect_ratio, target_size, [key for _, key in batch])
+            for (variant, _), url in zip(batch, stored):
+                if variant in urls:
+                    urls[variant] = url
+        return urls
+    
+    def _plan_variants(self, prompt, aspect_ratio, target_size, variants):
+        """
+        Splits the variants the cache cannot serve into Imagen calls
+        
+        Returns:
+            tuple: (variant -> cached URL or None, list of calls, each a list of (variant, cache key))
+        """
+        urls = {}
+        missing = []
+        for variant in variants:
+            cache_key, cached_url, _ = self._lookup(prompt, aspect_ratio, target_size, variant)
+            urls[variant] = cached_url
+            if not cached_url:
+                missing.append((variant, cache_key))
+        
+        per_call = self.variants_per_call
+        if self.cache is not None and missing:
+            spares_needed = -len(missing) % per_call
+            variant = max(variants)
+            while spares_needed:
+                variant += 1
+                cache_key, cached_url, _ = self._lookup(prompt, aspect_ratio, target_size, variant)
+                if not cached_url:
+                    missing.append((variant, cache_key))
+                    spares_needed -= 1
+        return urls, [missing[i:i + per_call] for i in range(0, len(missing), per_call)]
+    
+    def _lookup(self, prompt, aspect_ratio, target_size, variant=0):
+        """
+        Validates a request and checks the cache for it
+        
+        Returns:
+            tuple: (cache key or None, cached URL or None, key identifying identical requests)
+        
         Raises:
             ValueError: If invalid aspect_ratio is provided
         """
         VALID_RATIOS = {"1:1", "3:4", "4:3", "9:16", "16:9"}
         if aspect_ratio not in VALID_RATIOS:
             raise ValueError(f"Invalid aspect_ratio. Must be one of: {VALID_RATIOS}")
+        
+        # The stored bytes depend on the encoding too, so it is part of the cache key
+        encoding = None
+        if self.image_format != 'png' or target_size:
+            encoding = [self.image_format, self.quality, list(target_size) if target_size else None]
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ImageCache.make_key(self.model, prompt, aspect_ratio, self.seed, encoding, variant)
+            cached_url = self.cache.get(cache_key)
+            if cached_url:
+                get_tracer().record('image.cache_hit', 0.0)
+                return cache_key, cached_url, cache_key
+        return cache_key, None, cache_key or (prompt, aspect_ratio, repr(encoding), variant)
+    
+    def _image_config(self, aspect_ratio, count=1):
+        image_config = {'number_of_images': count, 'aspect_ratio': aspect_ratio}
+        if self.seed is not None:
+            image_config['seed'] = self.seed
+        return types.GenerateImagesConfig(**image_config)
+    
+    def _new_blob(self, cache_key):
+        """
+        Creates the GCS blob for a new image
+        
+        Cached images live under their content address so a re-run overwrites
+        rather than orphans them; uncached ones get a unique name. Metadata set
+        on the blob beforehand is sent with the upload itself, so no separate
+        patch() round trip is needed.
+        
+        Returns:
+            tuple: (blob, object name)
+        """
+        filename = f"slides/{cache_key or uuid.uuid4()}.{self.image_format}"
+        blob = self.bucket.blob(filename)
+        blob.cache_control = 'public, max-age=31536000'  # Cache for 1 year
+        return blob, filename
+    
+    def _stored(self, cache_key, filename):
+        """Records a finished upload in the cache and returns its public URL."""
+        # Instead of using IAM, use signed URLs with a long expiration
+        image_url = f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
+        if cache_key:
+            self.cache.put(cache_key, image_url, filename)
+        return image_url
+    
+    def _generate_and_store(self, prompt, aspect_ratio, target_size, cache_keys):
+        """
+        Generates len(cache_keys) images in one Imagen call, then encodes and uploads each
+        
+        Returns:
+            list: Public URL per cache key, None where generation or upload failed
+        """
+        tracer = get_tracer()
+        urls = [None] * len(cache_keys)
         try:
             # Generate image using Imagen
-            response = self.client.models.generate_images(
-                model='imagen-3.0-generate-002',
+            response = self.rate_limiter.call(
+                'imagen',
+                tracer.traced('imagen.generate_images', self.client.models.generate_images,
+                              images=len(cache_keys)),
+                model=self.model,
                 prompt=prompt,
-                config=types.GenerateImagesConfig(
-                    number_of_images=1,
-                    aspect_ratio=aspect_ratio
-                )
+                config=self._image_config(aspect_ratio, len(cache_keys))
             )
             
             if not response.generated_images:
                 raise Exception("No images were generated")
-            
-            # Get image bytes from response
-            image_bytes = response.generated_images[0].image.image_bytes
-            
-            # Generate unique filename
-            filename = f"slides/{uuid.uuid4()}.png"
-            
-            # Upload to GCS
-            blob = self.bucket.blob(filename)
-            blob.upload_from_string(
-                image_bytes,
-                content_type='image/png'
-            )
-            
-            # Make the blob publicly accessible and get its public URL
-            blob.cache_control = 'public, max-age=31536000'  # Cache for 1 year
-            blob.patch()
-            
-            # Instead of using IAM, use signed URLs with a long expiration
-            return f"https://storage.googleapis.com/{self.bucket_name}/{filename}"
-            
         except Exception as e:
             print(f"Error in generate_and_store_image: {str(e)}")
-            return None
+            return urls
+        
+        # Imagen may return fewer images than asked (e.g. when some are filtered)
+        for index, generated in enumerate(response.generated_images[:len(cache_keys)]):
+            try:
+                with tracer.span('image.encode'):
+                    image_bytes, content_type = self._encode_image(generated.image.image_bytes, target_size)
+                
+                # Upload to GCS; BytesIO shares the bytes buffer instead of copying it
+                blob, filename = self._new_blob(cache_keys[index])
+                self.rate_limiter.call(
+                    'gcs',
+                    tracer.traced('gcs.upload', blob.upload_from_file, bytes=len(image_bytes)),
+                    BytesIO(image_bytes),
+                    size=len(image_bytes),
+                    content_type=content_type,
+                    rewind=True
+                )
+                urls[index] = self._stored(cache_keys[index], filename)
+                
+            except Exception as e:
+                print(f"Error in generate_and_store_image: {str(e)}")
+        return urls
+    
+    def _encode_image(self, image_bytes, target_size=None):
+        """
+        Re-encodes Imagen's PNG to the configured format and placeholder size
+        
+        Returns:
+            tuple: (bytes, content type)
+        """
+        pil_format, content_type = IMAGE_FORMATS[self.image_format]
+        if self.image_format == 'png' and not target_size:
+            return image_bytes, content_type
+        
+        image = Image.open(BytesIO(image_bytes))
+        if target_size:
+            # replaceImage uses CENTER_CROP, so the image must still cover the
+            # placeholder on both sides; never upscale
+            scale = max(target_size[0] / image.width, target_size[1] / image.height)
+            if scale < 1:
+                image = image.resize(
+                    (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                    Image.LANCZOS
+                )
+        
+        output = BytesIO()
+        if pil_format == 'JPEG':
+            image.convert('RGB').save(output, format='JPEG', quality=self.quality, optimize=True)
+        else:
+            image.save(output, format='PNG', optimize=True)
+        return output.getvalue(), content_type
     
     def delete_image(self, image_url):
         """
@@ -90,6 +332,25 @@ class ImageHandler:
             # Extract filename from URL
             filename = image_url.split('/')[-1]
             blob = self.bucket.blob(f"slides/{filename}")
-            blob.delete()
+            self.rate_limiter.call('gcs', blob.delete)
         except Exception as e:
-            print(f"Error deleting image: {str(e)}")
\ No newline at end of file
+            print(f"Error deleting image: {str(e)}")
+    
+    def prune_cache(self):
+        """
+        Evicts old and least recently used cache entries and deletes their images from GCS
+        
+        Returns:
+            int: Number of evicted images
+        """
+        if self.cache is None:
+            return 0
+        evicted = self.cache.evict()
+        for entry in evicted:
+            try:
+                self.rate_limiter.call('gcs', self.bucket.blob(entry['object_name']).delete)
+            except Exception as e:
+                print(f"Error deleting cached image {entry['object_name']}: {str(e)}")
+        if evicted:
+            print(f"Evicted {len(evicted)} images from the cache")
+        return len(evicted)
\ No newline at end of file
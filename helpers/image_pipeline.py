@@ -0,0 +1,300 @@
+"""
+Generates images for many prompts concurrently, independently of the Slides writes that use them
+"""
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from helpers.image_handler import placeholder_pixel_size
+from helpers.instrumentation import in_context
+import config
+
+DEFAULT_IMAGE_WORKERS = 4
+DEFAULT_ASYNC_CONCURRENCY = 32
+
+
+class ImageJob:
+    """One image to generate for a placeholder identified by key."""
+
+    __slots__ = ('key', 'prompt', 'aspect_ratio', 'target_size', 'variant')
+
+    def __init__(self, key, prompt, aspect_ratio='1:1', target_size=None, variant=None):
+        self.key = key
+        self.prompt = prompt
+        self.aspect_ratio = aspect_ratio
+        self.target_size = target_size
+        # None lets the pipeline choose; an int pins one of the prompt's variants
+        self.variant = variant
+
+    @classmethod
+    def from_element(cls, key, image_elem, size=None):
+        """
+        Builds the job for an IMAGE element of the input JSON
+
+        size ({'width': pt, 'height': pt}) overrides the exported size, e.g. with
+        the placeholder's real size from a PresentationIndex. An optional
+        'variant' in the element picks another image for the same prompt.
+        """
+        return cls(
+            key,
+            image_elem['image_prompt'],
+            image_elem.get('aspect_ratio', '1:1'),
+            placeholder_pixel_size(size or image_elem.get('size')),
+            image_elem.get('variant')
+        )
+
+
+class ImagePipeline:
+    def __init__(self, image_handler, max_workers=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            image_handler: ImageHandler used to generate and store each image
+            max_workers (int): Number of images generated at the same time
+                               (default: config.IMAGE_WORKERS or 4)
+        """
+        self.image_handler = image_handler
+        self.max_workers = max_workers or getattr(config, 'IMAGE_WORKERS', DEFAULT_IMAGE_WORKERS)
+        # Jobs served by another job's image instead of their own generation
+        self.generations_saved = 0
+
+    @staticmethod
+    def group_jobs(jobs):
+        """
+        Groups jobs that ask for the same image
+
+        Returns:
+            dict: (prompt, aspect_ratio) -> list of ImageJob
+        """
+        groups = {}
+        for job in jobs:
+            groups.setdefault((job.prompt, job.aspect_ratio), []).append(job)
+        return groups
+
+    @staticmethod
+    def _group_target_size(group):
+        """Smallest size that covers every placeholder of the group (None if any is unknown)."""
+        sizes = [job.target_size for job in group]
+        if any(size is None for size in sizes):
+            return None
+        return (max(width for width, _ in sizes), max(height for _, height in sizes))
+
+    def _assign_variants(self, group):
+        """
+        Picks the variant each job of a group gets
+
+        Pinned variants are kept. The rest share variant 0, or, when the handler
+        requests several images per call, each get their own variant.
+
+        Returns:
+            dict: Job key -> variant number
+        """
+        distinct = getattr(self.image_handler, 'variants_per_call', 1) > 1
+        pinned = {job.variant for job in group if job.variant is not None}
+        free = (variant for variant in itertools.count() if variant not in pinned)
+        return {
+            job.key: job.variant if job.variant is not None else (next(free) if distinct else 0)
+            for job in group
+        }
+
+    def _count_saved(self, groups, assignments):
+        saved = sum(len(group) - len(set(assignments[key].values()))
+                    for key, group in groups.items())
+        self.generations_saved += saved
+        return saved
+
+    def _generate_group(self, prompt, aspect_ratio, group, assigned):
+        """
+        Generates the images of one group
+
+        Returns:
+            dict: Job key -> URL (or None)
+        """
+        variants = sorted(set(assigned.values()))
+        target_size = self._group_target_size(group)
+        if variants == [0]:
+            by_variant = {0: self.image_handler.generate_and_store_image(
+                prompt, aspect_ratio=aspect_ratio, target_size=target_size)}
+        else:
+            by_variant = self.image_handler.generate_variants(prompt, aspect_ratio, variants, target_size)
+        return {key: by_variant.get(variant) for key, variant in assigned.items()}
+
+    def _resume(self, jobs, journal, presentation_id):
+        """
+        Takes the images a resumed run already uploaded from its journal
+
+        Returns:
+            tuple: (job key -> URL of journaled images, jobs still to generate)
+        """
+        if journal is None:
+            return {}, jobs
+        urls = {}
+        remaining = []
+        for job in jobs:
+            url = journal.image_url(presentation_id, job.key)
+            if url:
+                urls[job.key] = url
+            else:
+                remaining.append(job)
+        if urls:
+            print(f"Reusing {len(urls)} images uploaded earlier in this run")
+        return urls, remaining
+
+    def _journal(self, urls, journal, presentation_id):
+        if journal is None:
+            return
+        for key, url in urls.items():
+            journal.record_image(presentation_id, key, url)
+
+    def _finisher(self, journal, presentation_id, on_ready):
+        """Callback run with each group's URLs as it finishes: journal them, then hand them on."""
+        def finished(urls):
+            self._journal(urls, journal, presentation_id)
+            if on_ready is not None:
+                on_ready(urls)
+        return finished
+
+    def generate(self, jobs, journal=None, presentation_id=None, on_ready=None):
+        """
+        Runs every job through a bounded worker pool
+
+        Jobs with the same prompt and aspect ratio share one generation, sized
+        for the largest of their placeholders, unless they are assigned distinct
+        variants. A failing prompt only affects its own jobs; their keys map to None.
+
+        Args:
+            jobs (list): ImageJob instances
+            journal (RunJournal): Records each uploaded image; images it already
+                                  holds for presentation_id are not generated again
+            presentation_id (str): Presentation the jobs belong to, for the journal
+            on_ready (callable): Called with {job key: URL (or None)} for each group as soon as it
+                                 finishes (and first with the journaled images), so its images can
+                                 be applied while the others still generate
+
+        Returns:
+            dict: Mapping of job key to the public URL of its image (or None)
+        """
+        resumed, jobs = self._resume(jobs, journal, presentation_id)
+        if resumed and on_ready is not None:
+            on_ready(dict(resumed))
+        urls = self._generate(jobs, self._finisher(journal, presentation_id, on_ready))
+        urls.update(resumed)
+        return urls
+
+    def _generate(self, jobs, finished):
+        urls = {}
+        if not jobs:
+            return urls
+
+        groups = self.group_jobs(jobs)
+        assignments = {key: self._assign_variants(group) for key, group in groups.items()}
+        saved = self._count_saved(groups, assignments)
+        print(f"Generating images for {len(jobs)} placeholders from {len(groups)} prompts "
+              f"({saved} duplicate prompts reused) with {self.max_workers} workers...")
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(in_context(self._generate_group), prompt, aspect_ratio, group,
+                                assignments[(prompt, aspect_ratio)]): group
+                for (prompt, aspect_ratio), group in groups.items()
+            }
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    group_urls = future.result()
+                except Exception as e:
+                    print(f"Error generating image for {group[0].key}: {str(e)}")
+                    group_urls = {job.key: None for job in group}
+                done += 1
+                urls.update(group_urls)
+                keys = ', '.join(str(job.key) for job in group)
+                print(f"  [{done}/{len(groups)}] {'done' if all(group_urls.values()) else 'failed'}: {keys}")
+                finished(group_urls)
+
+        return urls
+
+
+class AsyncImagePipeline(ImagePipeline):
+    def __init__(self, image_handler, max_workers=None):
+        """
+        Initialize the pipeline for an AsyncImageHandler
+
+        Args:
+            image_handler: AsyncImageHandler used to generate and store each image
+            max_workers (int): Number of generations in flight at the same time
+                               (default: config.ASYNC_IMAGE_CONCURRENCY or 32)
+        """
+        super().__init__(image_handler, max_workers=max_workers or getattr(
+            config, 'ASYNC_IMAGE_CONCURRENCY', DEFAULT_ASYNC_CONCURRENCY))
+
+    def generate(self, jobs, journal=None, presentation_id=None, on_ready=None):
+        """Runs generate_async on a new event loop, for synchronous callers."""
+        return asyncio.run(self.generate_async(jobs, journal, presentation_id, on_ready))
+
+    async def generate_async(self, jobs, journal=None, presentation_id=None, on_ready=None):
+        """
+        Runs every job on the current event loop, at most max_workers at a time
+
+        Grouping, failure handling, journaling and on_ready are the same as
+        ImagePipeline.generate; on_ready runs on the event loop, so it must not block.
+
+        Returns:
+            dict: Mapping of job key to the public URL of its image (or None)
+        """
+        resumed, jobs = self._resume(jobs, journal, presentation_id)
+        if resumed and on_ready is not None:
+            on_ready(dict(resumed))
+        urls = await self._generate_async(jobs, self._finisher(journal, presentation_id, on_ready))
+        urls.update(resumed)
+        return urls
+
+    async def _generate_async(self, jobs, finished):
+        urls = {}
+        if not jobs:
+            return urls
+
+        groups = self.group_jobs(jobs)
+        assignments = {key: self._assign_variants(group) for key, group in groups.items()}
+        saved = self._count_saved(groups, assignments)
+        print(f"Generating images for {len(jobs)} placeholders from {len(groups)} prompts "
+              f"({saved} duplicate prompts reused) with up to {self.max_workers} in flight...")
+        semaphore = asyncio.Semaphore(self.max_workers)
+        done = 0
+
+        async def run(prompt, aspect_ratio, group):
+            nonlocal done
+            assigned = assignments[(prompt, aspect_ratio)]
+            async with semaphore:
+                try:
+                    group_urls = await self._generate_group_async(prompt, aspect_ratio, group, assigned)
+                except Exception as e:
+                    print(f"Error generating image for {group[0].key}: {str(e)}")
+                    group_urls = {job.key: None for job in group}
+            done += 1
+            urls.update(group_urls)
+            keys = ', '.join(str(job.key) for job in group)
+            print(f"  [{done}/{len(groups)}] {'done' if all(group_urls.values()) else 'failed'}: {keys}")
+            finished(group_urls)
+
+        await asyncio.gather(*(run(prompt, aspect_ratio, group)
+                               for (prompt, aspect_ratio), group in groups.items()))
+        return urls
+
+    async def _generate_group_async(self, prompt, aspect_ratio, group, assigned):
+        """Async counterpart of ImagePipeline._generate_group."""
+        variants = sorted(set(assigned.values()))
+        target_size = self._group_target_size(group)
+        if variants == [0]:
+            by_variant = {0: await self.image_handler.generate_and_store_image(
+                prompt, aspect_ratio=aspect_ratio, target_size=target_size)}
+        else:
+            by_variant = await self.image_handler.generate_variants(prompt, aspect_ratio, variants, target_size)
+        return {key: by_variant.get(variant) for key, variant in assigned.items()}
+
+
+def pipeline_for(image_handler, max_workers=None):
+    """The pipeline that fits the handler: an AsyncImageHandler gets the event-loop one."""
+    if asyncio.iscoroutinefunction(image_handler.generate_and_store_image):
+        return AsyncImagePipeline(image_handler, max_workers=max_workers)
+    return ImagePipeline(image_handler, max_workers=max_workers)
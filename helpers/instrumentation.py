@@ -0,0 +1,200 @@
+"""
+Lightweight tracing of run phases, API calls and rate-limit sleeps, with a JSON-lines trace and a latency summary
+"""
+
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers
+
+    Returns:
+        float: The value at the given fraction (0-1), or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Tracer:
+    def __init__(self, trace_file=None):
+        """
+        Initialize an empty trace
+
+        Args:
+            trace_file (str): Append one JSON line per event to this file (default: config.TRACE_FILE, else none)
+        """
+        self.trace_file = trace_file or getattr(config, 'TRACE_FILE', None)
+        self.events = []
+        self._lock = threading.Lock()
+        self._file = open(self.trace_file, "a") if self.trace_file else None
+
+    def record(self, name, seconds, start=None, **attrs):
+        """
+        Adds a finished event to the trace
+
+        Args:
+            name (str): Event name, e.g. 'slides.batchUpdate' or 'ratelimit.wait'
+            seconds (float): Duration of the event
+            start (float): Wall-clock start time (default: now minus the duration)
+            **attrs: Extra fields such as backend, bytes or error
+        """
+        event = {
+            'name': name,
+            'start': round(start if start is not None else time.time() - seconds, 6),
+            'seconds': round(seconds, 6),
+            'thread': threading.current_thread().name,
+        }
+        event.update(attrs)
+        with self._lock:
+            self.events.append(event)
+            if self._file:
+                self._file.write(json.dumps(event) + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the enclosed block; the yielded dict can be filled with more attributes
+
+        Errors are recorded on the span and re-raised.
+        """
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs['error'] = str(e)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, start=start, **attrs)
+
+    def traced(self, name, func, **attrs):
+        """
+        Wraps func so every call of it is recorded as a span
+
+        Used around functions handed to RateLimiter.call, so each attempt is timed
+        on its own and retries and throttling sleeps are not counted as latency.
+        """
+        def wrapper(*args, **kwargs):
+            with self.span(name, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def summary(self):
+        """
+        Aggregates the trace per event name
+
+        Returns:
+            dict: Name -> count, errors, total, p50, p95 and max seconds, and bytes
+        """
+        with self._lock:
+            events = list(self.events)
+        grouped = {}
+        for event in events:
+            grouped.setdefault(event['name'], []).append(event)
+        summary = {}
+        for name, group in sorted(grouped.items()):
+            durations = [event['seconds'] for event in group]
+            summary[name] = {
+                'count': len(group),
+                'errors': sum(1 for event in group if 'error' in event),
+                'total': sum(durations),
+                'p50': percentile(durations, 0.50),
+                'p95': percentile(durations, 0.95),
+                'max': max(durations),
+                'bytes': sum(event.get('bytes', 0) for event in group),
+            }
+        return summary
+
+    def throttled_seconds(self):
+        """Total time callers spent sleeping in the rate limiter."""
+        with self._lock:
+            return sum(event['seconds'] for event in self.events if event['name'].startswith('ratelimit.'))
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print("\nTiming Summary:")
+        header = f"{'event':<26}{'count':>7}{'errors':>8}{'total s':>10}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'MB':>9}"
+        print(header)
+        print('-' * len(header))
+        for name, row in summary.items():
+            print(f"{name:<26}{row['count']:>7}{row['errors']:>8}{row['total']:>10.2f}{row['p50']:>9.3f}"
+                  f"{row['p95']:>9.3f}{row['max']:>9.3f}{row['bytes'] / 1e6:>9.2f}")
+        print(f"Time lost to throttling: {self.throttled_seconds():.2f}s")
+        if self.trace_file:
+            print(f"Trace written to {self.trace_file}")
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+_shared_tracer = None
+_shared_lock = threading.Lock()
+# Tracer of the job running in this context, e.g. one daemon job among several
+_context_tracer = contextvars.ContextVar('tracer', default=None)
+
+
+def get_tracer():
+    """Returns the Tracer every component records into: the current job's, else the process-wide one."""
+    tracer = _context_tracer.get()
+    if tracer is not None:
+        return tracer
+    global _shared_tracer
+    with _shared_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer()
+        return _shared_tracer
+
+
+def set_tracer(tracer):
+    """
+    Replaces the process-wide Tracer, e.g. to write a trace file or start a fresh trace
+
+    Returns:
+        Tracer: The tracer that was installed
+    """
+    global _shared_tracer
+    with _shared_lock:
+        if _shared_tracer is not None and _shared_tracer is not tracer:
+            _shared_tracer.close()
+        _shared_tracer = tracer
+        return tracer
+
+
+def use_tracer(tracer):
+    """
+    Makes get_tracer() return tracer in the current context and the threads started with in_context
+
+    Returns:
+        contextvars.Token: Pass to reset_tracer to go back to the previous tracer
+    """
+    return _context_tracer.set(tracer)
+
+
+def reset_tracer(token):
+    _context_tracer.reset(token)
+
+
+def in_context(func):
+    """
+    Wraps func to run in a copy of the caller's context
+
+    Threads do not inherit context variables, so helper threads are started with
+    this to keep recording into (and printing for) the job that started them.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
@@ -0,0 +1,238 @@
+"""
+Persistent queue of update jobs for the daemon, with each job's progress log kept for clients to follow
+
+Only the standard library is imported here, so the thin client (submit_job.py)
+can share the paths and protocol without loading any Google client.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import config
+
+DEFAULT_DAEMON_DIR = '.daemon'
+# queued -> running -> done, or failed
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+JOB_KINDS = ('deck', 'slides', 'images')
+
+
+def daemon_dir():
+    return getattr(config, 'DAEMON_DIR', DEFAULT_DAEMON_DIR)
+
+
+def socket_path():
+    """Local socket the daemon listens on (default: <config.DAEMON_DIR>/daemon.sock)."""
+    return getattr(config, 'DAEMON_SOCKET', os.path.join(daemon_dir(), 'daemon.sock'))
+
+
+def spool_dir():
+    """Directory the daemon takes job files from (default: <config.DAEMON_DIR>/spool)."""
+    return getattr(config, 'DAEMON_SPOOL_DIR', os.path.join(daemon_dir(), 'spool'))
+
+
+def check_spec(spec):
+    """
+    Checks a job description
+
+    A job is {"input": JSON file, "presentation_id": ..., "kind": "deck" | "slides" | "images",
+    "slides": [selectors] (kind "slides"), "full": bool}.
+
+    Returns:
+        dict: The spec with its defaults filled in
+
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("job should be an object")
+    if not isinstance(spec.get('input'), str):
+        raise ValueError("job needs 'input', the path of its input JSON")
+    spec = dict(spec)
+    spec['input'] = os.path.abspath(spec['input'])
+    spec['presentation_id'] = spec.get('presentation_id') or config.TEMPLATE_PRESENTATION_ID
+    spec['kind'] = spec.get('kind') or ('slides' if spec.get('slides') else 'deck')
+    if spec['kind'] not in JOB_KINDS:
+        raise ValueError(f"kind should be one of {', '.join(JOB_KINDS)}")
+    if spec['kind'] == 'slides' and not spec.get('slides'):
+        raise ValueError("a 'slides' job needs 'slides', a list of slide selectors")
+    spec['full'] = bool(spec.get('full'))
+    return spec
+
+
+class Job:
+    """One queued update; its progress log is kept on disk, see JobQueue.log."""
+
+    __slots__ = ('id', 'spec', 'state', 'run_id', 'submitted', 'started', 'finished', 'result', 'error')
+
+    def __init__(self, spec, id=None, state='queued', run_id=None, submitted=None, started=None,
+                 finished=None, result=None, error=None):
+        self.id = id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.spec = spec
+        self.state = state
+        # ID of the job's RunJournal, so a job interrupted by a restart resumes where it stopped
+        self.run_id = run_id
+        self.submitted = submitted or time.time()
+        self.started = started
+        self.finished = finished
+        self.result = result
+        self.error = error
+
+    @property
+    def presentation_id(self):
+        return self.spec['presentation_id']
+
+    @property
+    def ended(self):
+        return self.state in ('done', 'failed')
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class JobQueue:
+    def __init__(self, directory=None):
+        """
+        Load the queue, requeueing jobs a previous daemon left unfinished
+
+        Args:
+            directory (str): Where jobs and their logs are kept (default: <config.DAEMON_DIR>/jobs)
+        """
+        self.directory = directory or os.path.join(daemon_dir(), 'jobs')
+        os.makedirs(self.directory, exist_ok=True)
+        self._condition = threading.Condition()
+        self.jobs = {}
+        # Presentations with a running job; a second job for one waits, so edits never interleave
+        self._busy = set()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r") as f:
+                    job = Job(**json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Ignoring unreadable job {name}: {str(e)}")
+                continue
+            if job.state == 'running':
+                job.state = 'queued'
+                print(f"Requeueing job {job.id}, interrupted while running")
+            self.jobs[job.id] = job
+
+    def _path(self, job, extension):
+        return os.path.join(self.directory, f"{job.id}.{extension}")
+
+    def _save(self, job):
+        tmp_path = f"{self._path(job, 'json')}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp_path, self._path(job, 'json'))
+
+    def submit(self, spec):
+        """
+        Queues a job
+
+        Returns:
+            Job: The queued job
+
+        Raises:
+            ValueError: If the spec is invalid (see check_spec)
+        """
+        job = Job(check_spec(spec))
+        with self._condition:
+            self.jobs[job.id] = job
+            self._save(job)
+            self._condition.notify_all()
+        return job
+
+    def pending(self):
+        with self._condition:
+            return [job for job in self.jobs.values() if job.state == 'queued']
+
+    def take(self, stop=None):
+        """
+        Waits for the oldest queued job whose presentation is not busy and marks it running
+
+        Args:
+            stop (threading.Event): Returns None once set
+
+        Returns:
+            Job: The job to run, or None when stopping
+        """
+        with self._condition:
+            while not (stop is not None and stop.is_set()):
+                for job in sorted(self.jobs.values(), key=lambda job: job.submitted):
+                    if job.state == 'queued' and job.presentation_id not in self._busy:
+                        job.state = 'running'
+                        job.started = time.time()
+                        self._busy.add(job.presentation_id)
+                        self._save(job)
+                        self._condition.notify_all()
+                        return job
+                self._condition.wait(1)
+            return None
+
+    def update(self, job):
+        """Saves a change to a job, e.g. its run_id."""
+        with self._condition:
+            self._save(job)
+
+    def finish(self, job, result=None, error=None):
+        """Records a job's outcome and frees its presentation."""
+        with self._condition:
+            job.state = 'failed' if error else 'done'
+            job.finished = time.time()
+            job.result = result
+            job.error = error
+            self._busy.discard(job.presentation_id)
+            self._save(job)
+            self._condition.notify_all()
+
+    def log(self, job, text):
+        """Appends progress output to a job's log."""
+        with self._condition:
+            with open(self._path(job, 'log'), "a", encoding='utf-8') as f:
+                f.write(text)
+            self._condition.notify_all()
+
+    def follow(self, job_id, stop=None):
+        """
+        Yields a job's log as it is written, from the start, until the job ends
+
+        The log is read back from its file, so a daemon holds no output in memory,
+        and output written before a restart is included.
+
+        Yields:
+            str: Chunks of output
+
+        Raises:
+            KeyError: If there is no such job
+        """
+        with self._condition:
+            job = self.jobs[job_id]
+        path = self._path(job, 'log')
+        position = 0
+        while True:
+            with self._condition:
+                while True:
+                    size = os.path.getsize(path) if os.path.exists(path) else 0
+                    ended = job.ended or (stop is not None and stop.is_set())
+                    if size > position or ended:
+                        break
+                    self._condition.wait(1)
+                # log() writes whole chunks under the same lock, so this never splits a character
+                chunk = b''
+                if size > position:
+                    with open(path, "rb") as f:
+                        f.seek(position)
+                        chunk = f.read(size - position)
+                    position = size
+            if chunk:
+                yield chunk.decode('utf-8')
+            if ended:
+                return
+
+    def notify(self):
+        """Wakes every waiting take() and follow(), e.g. when stopping."""
+        with self._condition:
+            self._condition.notify_all()
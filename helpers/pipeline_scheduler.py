@@ -0,0 +1,187 @@
+"""
+Applies Slides writes as soon as the objects they depend on exist, while other phases are still producing them
+"""
+
+import threading
+import time
+from helpers.request_planner import RequestPlanner
+from helpers.instrumentation import get_tracer, in_context
+import config
+
+# After the first batch, units that become ready wait up to this long for more to join them.
+# The default Slides quota is about one write request per second, so waiting longer saves
+# no quota and only delays the writes.
+DEFAULT_LINGER_SECONDS = 1
+
+
+def page_dependencies(key, requests):
+    """
+    Pages a unit places elements on, other than one it creates itself
+
+    Returns:
+        set: pageObjectIds referenced by the unit's requests
+    """
+    pages = set()
+    for request in requests:
+        for body in request.values():
+            page = body.get('elementProperties', {}).get('pageObjectId')
+            if page and page != key:
+                pages.add(page)
+    return pages
+
+
+class PipelineScheduler:
+    def __init__(self, execute_plan, presentation_id, linger=None):
+        """
+        Initialize an empty schedule for one presentation
+
+        Units are queued with the same add() as a RequestPlanner. A unit that puts
+        elements on a page created by another queued unit waits until that unit is
+        applied, and fails if it failed; a unit queued after others is sent with or
+        after them, and fails if one of them failed; every other unit is ready at once. A writer
+        thread sends everything queued by start() in one plan, then everything that
+        became ready since, at most linger seconds after the oldest of it became
+        ready, so writes follow their inputs closely without one batchUpdate per unit.
+
+        Args:
+            execute_plan (callable): Sends a RequestPlanner, e.g. PresentationUpdater.execute_plan
+            presentation_id (str): The ID of the presentation
+            linger (float): Longest a ready unit waits for others to share its batch
+                            (default: config.WRITE_LINGER_SECONDS or 1)
+        """
+        self.execute_plan = execute_plan
+        self.presentation_id = presentation_id
+        self.linger = linger if linger is not None else getattr(config, 'WRITE_LINGER_SECONDS',
+                                                                 DEFAULT_LINGER_SECONDS)
+        self.results = {'applied': [], 'failed': {}, 'calls': 0}
+        self._condition = threading.Condition()
+        # (key, description, requests, dependencies, after) of units whose dependencies are not settled
+        self._waiting = []
+        # Units that can be sent, and since when the oldest of them could
+        self._ready = []
+        self._ready_since = None
+        self._batches = 0
+        # Keys of units queued or in flight
+        self._unsettled = set()
+        self._closed = False
+        self._error = None
+        self._thread = None
+
+    def add(self, requests, key, description=None, after=()):
+        """
+        Queues a unit of requests
+
+        Args:
+            requests (list): Slides API request dicts that belong together
+            key: Identifier reported back in the results
+            description (str): Human readable label used in log output
+            after (iterable): Keys of units queued before this one that it only makes
+                              sense after, as RequestPlanner.add
+        """
+        if not requests:
+            return
+        with self._condition:
+            self._waiting.append((key, description, list(requests), page_dependencies(key, requests),
+                                  set(after)))
+            self._unsettled.add(key)
+            self._condition.notify()
+
+    def start(self):
+        """Starts sending ready units in the background."""
+        self._thread = threading.Thread(target=in_context(self._run), name=f"writer-{self.presentation_id}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Sends what is left once nothing more will be queued, and waits for it
+
+        Returns:
+            dict: 'applied' keys, 'failed' mapping of key to error message and
+                  the number of API 'calls' made, as RequestPlanner.execute
+
+        Raises:
+            Exception: Whatever stopped the writer, e.g. an error about the whole presentation
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self._run()
+        if self._error is not None:
+            raise self._error
+        return self.results
+
+    def _settle_waiting(self):
+        """Moves the units whose dependencies are settled to the ready list; the ones depending on a failure fail."""
+        waiting = []
+        # A unit can share a plan with the units it is queued after, which then sends them first
+        ready_keys = {unit[0] for unit in self._ready}
+        for unit in self._waiting:
+            key, description, _, dependencies, after = unit
+            failed = [dependency for dependency in dependencies | after if dependency in self.results['failed']]
+            if failed:
+                error = f"depends on {failed[0]}, which failed"
+                print(f"Failed to apply {description or key}: {error}")
+                self.results['failed'][key] = error
+                self._unsettled.discard(key)
+            elif dependencies & self._unsettled or (after & self._unsettled) - ready_keys:
+                waiting.append(unit)
+            else:
+                ready_keys.add(key)
+                if not self._ready:
+                    self._ready_since = time.monotonic()
+                self._ready.append(unit)
+        self._waiting = waiting
+
+    def _next_batch(self):
+        """
+        Waits until the ready units should be sent
+
+        Returns:
+            list: The units to send, or an empty list once everything is sent
+        """
+        with self._condition:
+            while True:
+                self._settle_waiting()
+                if self._ready:
+                    wait = 0 if self._closed or not self._batches else (
+                        self._ready_since + self.linger - time.monotonic())
+                    if wait <= 0:
+                        ready, self._ready = self._ready, []
+                        self._batches += 1
+                        return ready
+                    self._condition.wait(wait)
+                elif self._closed and not self._waiting:
+                    return []
+                else:
+                    self._condition.wait()
+
+    def _run(self):
+        tracer = get_tracer()
+        while True:
+            ready = self._next_batch()
+            if not ready:
+                return
+
+            planner = RequestPlanner()
+            for key, description, requests, _, after in ready:
+                planner.add(requests, key=key, description=description, after=after)
+            try:
+                with tracer.span('phase.write', presentation=self.presentation_id, units=len(ready)):
+                    results = self.execute_plan(self.presentation_id, planner)
+            except BaseException as e:
+                with self._condition:
+                    self._error = e
+                    self._waiting = []
+                    self._ready = []
+                return
+
+            with self._condition:
+                self.results['applied'].extend(results['applied'])
+                self.results['failed'].update(results['failed'])
+                self.results['calls'] += results['calls']
+                self._unsettled.difference_update(key for key, *_ in ready)
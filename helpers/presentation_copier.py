@@ -0,0 +1,49 @@
+"""
+Copies the template presentation with the Drive API so runs never modify the template itself
+"""
+
+import time
+import config
+
+
+def copy_presentation(drive_service, template_id, name=None, folder_id=None, rate_limiter=None,
+                      journal=None, copy_key='copy'):
+    """
+    Makes a Drive copy of a presentation
+
+    The copy keeps every objectId of the template, so the input JSON applies to it unchanged.
+
+    Args:
+        drive_service: Google Drive v3 service instance (or helpers.fakes.FakeDriveService)
+        template_id (str): The ID of the presentation to copy
+        name (str): Title of the copy (default: template ID plus a timestamp)
+        folder_id (str): Drive folder for the copy (default: config.COPY_FOLDER_ID, else the template's)
+        rate_limiter (RateLimiter): Limits and retries the Drive call
+        journal (RunJournal): A resumed run reuses the copy it already made
+        copy_key (str): Journal key of this copy, to tell several copies of one template apart
+
+    Returns:
+        str: The ID of the new presentation
+    """
+    if journal is not None:
+        entry = journal.get(template_id, copy_key)
+        if entry and entry.get('copy_id'):
+            print(f"Reusing copy {entry['copy_id']} of template {template_id} made earlier in this run")
+            return entry['copy_id']
+    
+    body = {'name': name or f"{template_id} copy {time.strftime('%Y-%m-%d %H:%M:%S')}"}
+    folder_id = folder_id or getattr(config, 'COPY_FOLDER_ID', None)
+    if folder_id:
+        body['parents'] = [folder_id]
+
+    request = drive_service.files().copy(
+        fileId=template_id,
+        body=body,
+        fields='id',
+        supportsAllDrives=True
+    )
+    response = rate_limiter.call('drive', request.execute) if rate_limiter else request.execute()
+    print(f"Copied template {template_id} to https://docs.google.com/presentation/d/{response['id']}/edit")
+    if journal is not None:
+        journal.record(template_id, copy_key, 'applied', copy_id=response['id'])
+    return response['id']
@@ -0,0 +1,215 @@
+"""
+Fetches a presentation once and indexes its elements so updates can be checked before any writes
+"""
+
+from helpers.instrumentation import get_tracer
+
+# Only what the index needs; groups are flattened one level deep
+ELEMENT_FIELDS = (
+    'objectId,size,transform,shape(shapeType,placeholder(type),text(textElements(textRun(content),autoText(content)))),'
+    'image(contentUrl)'
+)
+PRESENTATION_FIELDS = (
+    f'slides(objectId,pageElements({ELEMENT_FIELDS},elementGroup(children({ELEMENT_FIELDS}))))'
+)
+
+EMU_PER_PT = 12700
+
+
+def dimension_pt(dimension):
+    """Converts a Slides Dimension ({'magnitude', 'unit'}) to points."""
+    if not dimension:
+        return 0.0
+    magnitude = dimension.get('magnitude', 0)
+    return magnitude / EMU_PER_PT if dimension.get('unit', 'EMU') == 'EMU' else magnitude
+
+
+class IndexedElement:
+    """One page element of the presentation."""
+
+    __slots__ = ('object_id', 'page_id', 'slide_index', 'kind', 'size', 'placeholder', 'text')
+
+    def __init__(self, object_id, page_id, slide_index, kind, size, placeholder, text=None):
+        self.object_id = object_id
+        self.page_id = page_id
+        self.slide_index = slide_index
+        self.kind = kind
+        self.size = size
+        self.placeholder = placeholder
+        # Current text of a shape, without the newline that ends every shape's text
+        self.text = text
+
+
+class PresentationIndex:
+    def __init__(self, presentation):
+        """
+        Index a presentations.get response
+
+        Args:
+            presentation (dict): Response of presentations().get, at least PRESENTATION_FIELDS
+        """
+        self.page_ids = set()
+        # Page objectIds in slide order
+        self.slide_ids = []
+        self.elements = {}
+        for slide_index, page in enumerate(presentation.get('slides', [])):
+            self.page_ids.add(page['objectId'])
+            self.slide_ids.append(page['objectId'])
+            for element in page.get('pageElements', []):
+                self._add(page['objectId'], slide_index, element)
+                for child in element.get('elementGroup', {}).get('children', []):
+                    self._add(page['objectId'], slide_index, child)
+
+    def _add(self, page_id, slide_index, element):
+        if 'image' in element:
+            kind = 'image'
+        elif 'shape' in element:
+            kind = 'shape'
+        elif 'elementGroup' in element:
+            kind = 'group'
+        else:
+            kind = 'other'
+        # The rendered size is the intrinsic size scaled by the transform
+        size = element.get('size', {})
+        transform = element.get('transform', {})
+        width = dimension_pt(size.get('width')) * abs(transform.get('scaleX', 1))
+        height = dimension_pt(size.get('height')) * abs(transform.get('scaleY', 1))
+        placeholder = element.get('shape', {}).get('placeholder', {}).get('type')
+        text = None
+        if kind == 'shape':
+            # Auto text (e.g. slide numbers) takes up indexes like any other run
+            text = ''.join(
+                text_element.get('textRun', text_element.get('autoText', {})).get('content', '')
+                for text_element in element['shape'].get('text', {}).get('textElements', [])
+            )
+            if text.endswith('\n'):
+                text = text[:-1]
+        self.elements[element['objectId']] = IndexedElement(
+            element['objectId'], page_id, slide_index, kind,
+            {'width': width, 'height': height} if width and height else None,
+            placeholder, text
+        )
+
+    @classmethod
+    def fetch(cls, slides_service, presentation_id, rate_limiter=None):
+        """
+        Reads the presentation with a single presentations.get call
+
+        Args:
+            slides_service: Google Slides service instance
+            presentation_id (str): The ID of the presentation
+            rate_limiter (RateLimiter): Limits and retries the call
+
+        Returns:
+            PresentationIndex: Index of the presentation's pages and elements
+        """
+        request = slides_service.presentations().get(
+            presentationId=presentation_id,
+            fields=PRESENTATION_FIELDS
+        )
+        execute = get_tracer().traced('slides.get', request.execute)
+        presentation = rate_limiter.call('slides', execute) if rate_limiter else execute()
+        return cls(presentation)
+
+    def __contains__(self, object_id):
+        return object_id in self.elements or object_id in self.page_ids
+
+    def size_of(self, object_id):
+        """
+        Rendered size of an element in points
+
+        Returns:
+            dict: {'width': pt, 'height': pt}, or None if unknown
+        """
+        element = self.elements.get(object_id)
+        return element.size if element else None
+
+    def text_of(self, object_id):
+        """
+        Current text of a shape
+
+        Returns:
+            str: The text without its final newline, or None if the element is not a shape
+        """
+        element = self.elements.get(object_id)
+        return element.text if element else None
+
+    def slide_pages(self, slides_data):
+        """
+        Maps the input's slide numbers to the pages they are on
+
+        A slide is found through its elements' objectIds, or else by its
+        position, as exported.
+
+        Returns:
+            dict: slideNumber -> page objectId, for slides that exist
+        """
+        pages = {}
+        for slide in slides_data:
+            if not slide.get('exists'):
+                continue
+            elements = slide.get('elements', {})
+            for element in elements.get('TEXT', []) + elements.get('IMAGE', []):
+                indexed = self.elements.get(element.get('objectId'))
+                if indexed is not None:
+                    pages[slide['slideNumber']] = indexed.page_id
+                    break
+            else:
+                if slide['slideNumber'] <= len(self.slide_ids):
+                    pages[slide['slideNumber']] = self.slide_ids[slide['slideNumber'] - 1]
+        return pages
+
+    def check_text(self, object_id):
+        """
+        Checks that text can be written to an element
+
+        Returns:
+            str: Why the element cannot take the update, or None if it can
+        """
+        element = self.elements.get(object_id)
+        if element is None:
+            return "not found in the presentation"
+        if element.kind != 'shape':
+            return f"is a {element.kind}, not a text shape"
+        return None
+
+    def check_image(self, object_id):
+        """
+        Checks that an element can have its image replaced
+
+        Returns:
+            str: Why the element cannot take the update, or None if it can
+        """
+        element = self.elements.get(object_id)
+        if element is None:
+            return "not found in the presentation"
+        if element.kind != 'image':
+            return f"is a {element.kind}, not an image"
+        return None
+
+    def validate(self, slides_data):
+        """
+        Checks every update in the input JSON against the presentation
+
+        Args:
+            slides_data (list): 'slides' of the input JSON
+
+        Returns:
+            list: (slideNumber, objectId, reason) for every update that would fail
+        """
+        problems = []
+        for slide in slides_data:
+            if not slide.get('exists'):
+                continue
+            elements = slide.get('elements', {})
+            for text_elem in elements.get('TEXT', []):
+                reason = text_elem.get('objectId') and self.check_text(text_elem['objectId'])
+                if reason:
+                    problems.append((slide['slideNumber'], text_elem['objectId'], reason))
+            for image_elem in elements.get('IMAGE', []):
+                if not image_elem.get('image_prompt'):
+                    continue
+                reason = image_elem.get('objectId') and self.check_image(image_elem['objectId'])
+                if reason:
+                    problems.append((slide['slideNumber'], image_elem['objectId'], reason))
+        return problems
@@ -0,0 +1,278 @@
+"""
+Thread-safe token-bucket rate limiting with adaptive backoff for the Slides, Imagen, GCS and Drive APIs
+"""
+
+import asyncio
+import random
+import threading
+import time
+from helpers.instrumentation import get_tracer
+import config
+
+try:
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+except ImportError:  # Optional: only the pooled Google session (helpers/clients.py) raises its errors
+    requests = None
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 64.0
+
+
+def get_status_code(error):
+    """
+    Extracts the HTTP status from the error types raised by the Google clients
+
+    Returns:
+        int: Status code, or None if the error carries none
+    """
+    resp = getattr(error, 'resp', None)  # googleapiclient HttpError
+    if resp is not None and getattr(resp, 'status', None):
+        return int(resp.status)
+    code = getattr(error, 'code', None)  # google.genai and google.api_core errors
+    if isinstance(code, int):
+        return code
+    response = getattr(error, 'response', None)
+    if response is not None and isinstance(getattr(response, 'status_code', None), int):
+        return response.status_code
+    return None
+
+
+def get_retry_after(error):
+    """
+    Reads the Retry-After header (in seconds) from an API error
+
+    Returns:
+        float: Seconds the server asked us to wait, or None
+    """
+    headers = getattr(error, 'resp', None)
+    if headers is None:
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers is None:
+        return None
+    try:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        return float(value) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def is_connection_error(error):
+    """True for a dropped or timed-out connection, including the requests errors of the pooled session."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return requests is not None and isinstance(error, (requests.exceptions.ConnectionError,
+                                                       requests.exceptions.Timeout))
+
+
+def is_unsent(error):
+    """True for a connection that failed before the request was sent, so the server never saw it."""
+    if isinstance(error, ConnectionRefusedError):
+        return True
+    if requests is None:
+        return False
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason says how the connection failed
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, ConnectTimeoutError)
+
+
+def is_retryable(error):
+    """True for throttling, transient server errors and dropped connections."""
+    if is_connection_error(error):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=None):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate_per_minute (float): Sustained number of requests per minute
+            burst (int): Requests that may be sent back to back (default: one minute of quota)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until it is available
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self):
+        """
+        Takes one token without waiting for it
+
+        Returns:
+            float: Seconds the caller must wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now and sleep outside the lock, so waiting
+            # callers queue up fairly instead of racing for the lock
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate if self.tokens < 0 else 0.0,
+                       self.blocked_until - now)
+        return max(wait, 0.0)
+
+    def pause(self, seconds):
+        """Holds every caller of this bucket back for the given time (server pushback)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    def __init__(self, limits=None, max_retries=MAX_RETRIES, backoff_scale=1.0):
+        """
+        Initialize one bucket per backend
+
+        Args:
+            limits (dict): Backend name -> (requests per minute, burst or None).
+                           Defaults come from config.
+            max_retries (int): Retries of a throttled or failed call before giving up
+            backoff_scale (float): Multiplier for the exponential backoff, e.g. the
+                                   benchmark's time scale; Retry-After is honoured as sent
+        """
+        if limits is None:
+            limits = {
+                'slides': (getattr(config, 'REQUESTS_PER_MINUTE', 60),
+                           getattr(config, 'SLIDES_BURST', None)),
+                'imagen': (getattr(config, 'IMAGEN_REQUESTS_PER_MINUTE', 20),
+                           getattr(config, 'IMAGEN_BURST', None)),
+                'gcs': (getattr(config, 'GCS_REQUESTS_PER_MINUTE', 600),
+                        getattr(config, 'GCS_BURST', None)),
+                'drive': (getattr(config, 'DRIVE_REQUESTS_PER_MINUTE', 60),
+                          getattr(config, 'DRIVE_BURST', None)),
+            }
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in limits.items()}
+        self.max_retries = max_retries
+        self.backoff_scale = backoff_scale
+
+    def acquire(self, backend):
+        """Waits for a request slot on the backend; returns the seconds waited."""
+        waited = self.buckets[backend].acquire()
+        if waited > 0:
+            get_tracer().record('ratelimit.wait', waited, backend=backend)
+        return waited
+
+    async def acquire_async(self, backend):
+        """Like acquire, but waits on the event loop instead of blocking the thread."""
+        waited = self.buckets[backend].reserve()
+        if waited > 0:
+            await asyncio.sleep(waited)
+            get_tracer().record('ratelimit.wait', waited, backend=backend)
+        return waited
+
+    def call(self, backend, func, *args, **kwargs):
+        """
+        Runs func under the backend's rate limit, retrying retryable errors
+
+        Backoff is exponential with full jitter unless the server sent a
+        Retry-After header. On a 429 the whole bucket is paused, so concurrent
+        callers slow down together instead of all hitting the quota again.
+
+        Returns:
+            The return value of func
+
+        Raises:
+            Exception: The last error once retries are exhausted, or any
+                       non-retryable error immediately
+        """
+        return self._call(backend, func, args, kwargs, idempotent=True)
+
+    def call_once(self, backend, func, *args, **kwargs):
+        """
+        Runs a write that must not be applied twice under the backend's rate limit
+
+        A 5xx or dropped connection may come after the server applied the write,
+        e.g. a batchUpdate inserting text or creating slides, so only throttling
+        (429) and connections that failed before the request was sent are
+        retried; anything else is raised for the caller to re-read and re-plan.
+
+        Returns:
+            The return value of func
+        """
+        return self._call(backend, func, args, kwargs, idempotent=False)
+
+    def _call(self, backend, func, args, kwargs, idempotent):
+        attempt = 0
+        while True:
+            self.acquire(backend)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(backend, e, attempt, idempotent)
+                time.sleep(delay)
+                get_tracer().record('ratelimit.backoff', delay, backend=backend, status=get_status_code(e))
+                attempt += 1
+
+    async def call_async(self, backend, func, *args, **kwargs):
+        """
+        Awaits func(*args, **kwargs) under the backend's rate limit; see call
+
+        Args:
+            func: Coroutine function, e.g. client.aio.models.generate_images
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async(backend)
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(backend, e, attempt)
+                await asyncio.sleep(delay)
+                get_tracer().record('ratelimit.backoff', delay, backend=backend, status=get_status_code(e))
+                attempt += 1
+
+    def _retry_delay(self, backend, error, attempt, idempotent=True):
+        """
+        Picks the wait before retrying a failed call, pausing the bucket on a 429
+
+        Raises:
+            Exception: The error itself when it should not be retried
+        """
+        if idempotent:
+            retryable = is_retryable(error)
+        else:
+            retryable = get_status_code(error) == 429 or is_unsent(error)
+        if attempt >= self.max_retries or not retryable:
+            raise error
+        delay = get_retry_after(error)
+        if delay is None:
+            backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)
+            delay = random.uniform(0, backoff) * self.backoff_scale
+        if get_status_code(error) == 429:
+            self.buckets[backend].pause(delay)
+        print(f"{backend} request failed ({str(error)}), retrying in {delay:.1f}s")
+        return delay
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Returns the process-wide RateLimiter shared by every client."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,182 @@
+"""
+Collects Slides API requests from every update phase and sends them in as few batchUpdate calls as possible
+"""
+
+import json
+from helpers.rate_limiter import get_status_code, is_retryable
+from helpers.instrumentation import get_tracer
+
+# Order in which request kinds have to reach the API. A unit of work is ranked
+# by its first request, so a createShape + insertText pair stays together.
+REQUEST_ORDER = {
+    'createSlide': 0,
+    'createShape': 1,
+    'createImage': 1,
+    # Deck-wide token replacements run ahead of the element rewrites queued after them
+    'replaceAllText': 2,
+    'deleteText': 2,
+    'insertText': 2,
+    'replaceImage': 3,
+}
+
+# batchUpdate has no documented request-count cap, but the HTTP body does have
+# a size limit, so batches are kept well under it.
+MAX_REQUESTS_PER_BATCH = 500
+MAX_BATCH_BYTES = 1_000_000
+
+
+class PlannedUnit:
+    """A group of requests that must be applied together and in order."""
+
+    __slots__ = ('key', 'description', 'requests', 'after', 'rank', 'size')
+
+    def __init__(self, key, description, requests, after=()):
+        self.key = key
+        self.description = description or str(key)
+        self.requests = requests
+        self.after = set(after)
+        self.rank = REQUEST_ORDER.get(next(iter(requests[0])), len(REQUEST_ORDER))
+        self.size = len(json.dumps(requests))
+
+
+class RequestPlanner:
+    def __init__(self, max_requests=MAX_REQUESTS_PER_BATCH, max_bytes=MAX_BATCH_BYTES):
+        """
+        Initialize an empty plan
+
+        Args:
+            max_requests (int): Maximum number of requests sent in one batchUpdate
+            max_bytes (int): Maximum serialized size of one batchUpdate body
+        """
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.units = []
+
+    def __len__(self):
+        return len(self.units)
+
+    def add(self, requests, key, description=None, after=()):
+        """
+        Queues a unit of requests
+
+        Args:
+            requests (list): Slides API request dicts that belong together
+            key: Identifier reported back in the execution results
+            description (str): Human readable label used in log output
+            after (iterable): Keys of units queued before this one that it only makes
+                              sense after; if one of them fails, this one is not sent
+        """
+        if requests:
+            self.units.append(PlannedUnit(key, description, list(requests), after))
+
+    def batches(self):
+        """
+        Orders the queued units and packs them into batches
+
+        Returns:
+            list: Lists of PlannedUnit, each small enough for one batchUpdate
+        """
+        batches = []
+        current, count, size = [], 0, 0
+        # sorted() is stable, so units of the same kind keep their queue order
+        for unit in sorted(self.units, key=lambda u: u.rank):
+            if current and (count + len(unit.requests) > self.max_requests
+                            or size + unit.size > self.max_bytes):
+                batches.append(current)
+                current, count, size = [], 0, 0
+            current.append(unit)
+            count += len(unit.requests)
+            size += unit.size
+        if current:
+            batches.append(current)
+        return batches
+
+    def execute(self, slides_service, presentation_id, rate_limiter=None, journal=None):
+        """
+        Sends the plan to the Slides API
+
+        batchUpdate is atomic, so when a batch is rejected it is split in half and
+        each half retried until the failing unit is isolated. Everything else in
+        the batch is still applied, except the units queued after a failed one.
+        Only invalid-request (400) errors are split; throttling is retried by the
+        rate limiter. Server errors and dropped connections fail the batch
+        outright, since it may have been applied and sending it again would
+        repeat its inserts and creates; the next run reads the presentation
+        again. So do errors about the whole presentation (403, 404).
+
+        Args:
+            slides_service: Google Slides service instance
+            presentation_id (str): The ID of the presentation
+            rate_limiter (RateLimiter): Limits and retries the batchUpdate calls
+            journal (RunJournal): Records every unit's outcome; units it already
+                                  lists as applied are not sent again
+
+        Returns:
+            dict: 'applied' keys, 'failed' mapping of key to error message and
+                  the number of API 'calls' made
+        """
+        results = {'applied': [], 'failed': {}, 'calls': 0}
+        tracer = get_tracer()
+
+        if journal is not None:
+            done = [unit for unit in self.units if journal.is_applied(presentation_id, unit.key)]
+            if done:
+                print(f"Skipping {len(done)} updates already applied in this run")
+                results['applied'].extend(unit.key for unit in done)
+                self.units = [unit for unit in self.units if unit not in done]
+            for unit in self.units:
+                journal.record(presentation_id, unit.key, 'pending')
+
+        def fail(unit, error):
+            print(f"Failed to apply {unit.description}: {error}")
+            results['failed'][unit.key] = error
+            if journal is not None:
+                journal.record(presentation_id, unit.key, 'failed', error=error)
+
+        def send(units):
+            # A unit sent after what it depends on failed would apply to the wrong text
+            sendable = []
+            for unit in units:
+                failed = [key for key in unit.after if key in results['failed']]
+                if failed:
+                    fail(unit, f"depends on {failed[0]}, which failed")
+                else:
+                    sendable.append(unit)
+            units = sendable
+            if not units:
+                return
+            results['calls'] += 1
+            requests = [r for unit in units for r in unit.requests]
+            request = slides_service.presentations().batchUpdate(
+                presentationId=presentation_id,
+                body={'requests': requests}
+            )
+            execute = tracer.traced('slides.batchUpdate', request.execute,
+                                    requests=len(requests), bytes=sum(unit.size for unit in units))
+            try:
+                if rate_limiter:
+                    # A batch the server applied before failing must not be applied again
+                    rate_limiter.call_once('slides', execute)
+                else:
+                    execute()
+            except Exception as e:
+                if len(units) == 1 or is_retryable(e) or get_status_code(e) not in (400, None):
+                    for unit in units:
+                        fail(unit, str(e))
+                    return
+                middle = len(units) // 2
+                send(units[:middle])
+                send(units[middle:])
+                return
+            results['applied'].extend(unit.key for unit in units)
+            if journal is not None:
+                for unit in units:
+                    journal.record(presentation_id, unit.key, 'applied')
+
+        for batch in self.batches():
+            send(batch)
+
+        self.units = []
+        print(f"Applied {len(results['applied'])} planned updates in {results['calls']} API calls "
+              f"({len(results['failed'])} failed)")
+        return results
@@ -0,0 +1,171 @@
+"""
+Append-only journal of every planned operation in a run, so an interrupted run can be resumed
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import config
+
+DEFAULT_JOURNAL_DIR = '.journal'
+
+# Planner units go pending -> applied and images are uploaded; either can have failed
+STATES = ('pending', 'uploaded', 'applied', 'failed')
+
+
+def journal_key(key):
+    """Turns a planner or image job key (str or tuple) into the journal's string key."""
+    if isinstance(key, (tuple, list)):
+        return '/'.join(str(part) for part in key)
+    return str(key)
+
+
+def image_key(key):
+    """
+    Journal key of an image job
+
+    Images are kept apart from planner units, which may share their key (an
+    image's objectId), so applying the update does not overwrite the upload.
+    """
+    return ('image',) + tuple(key) if isinstance(key, (tuple, list)) else ('image', key)
+
+
+class RunJournal:
+    def __init__(self, run_id=None, directory=None):
+        """
+        Start a new run, or resume one
+
+        Args:
+            run_id (str): ID of the run to resume; a new ID is generated when omitted
+            directory (str): Where journals are kept (default: config.JOURNAL_DIR or .journal)
+
+        Raises:
+            ValueError: If run_id is given but has no journal
+        """
+        self.directory = directory or getattr(config, 'JOURNAL_DIR', DEFAULT_JOURNAL_DIR)
+        self.resumed = run_id is not None
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.path = os.path.join(self.directory, f"{self.run_id}.jsonl")
+        self._lock = threading.Lock()
+        self.entries = {}
+
+        if self.resumed:
+            if not os.path.exists(self.path):
+                raise ValueError(f"No journal for run {run_id} in {self.directory}")
+            self._replay()
+            print(f"Resuming run {self.run_id}: " +
+                  ', '.join(f"{count} {state}" for state, count in self.counts().items()))
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            print(f"Run ID: {self.run_id} (continue an interrupted run with --resume {self.run_id})")
+        self._file = open(self.path, "a")
+
+    def _replay(self):
+        self.entries = self._read(self.path)
+
+    @staticmethod
+    def _read(path):
+        """Merges a journal file's records into one entry per operation."""
+        entries = {}
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a half-written last line
+                    continue
+                entries.setdefault((record.pop('presentation_id'), record.pop('key')), {}).update(record)
+        return entries
+
+    @staticmethod
+    def recorded_urls(directory=None, since=None):
+        """
+        Collects the image URLs recorded by the journals that can still be resumed
+
+        A run that finished with every operation applied has nothing left to
+        resume, so only journals with pending or failed operations count, and
+        any written to since the given time, whose run may still be going.
+
+        Args:
+            directory (str): Where journals are kept (default: config.JOURNAL_DIR or .journal)
+            since (float): Journals written to after this time count too (default: all of them)
+
+        Returns:
+            set: URLs of images uploaded by resumable runs
+        """
+        directory = directory or getattr(config, 'JOURNAL_DIR', DEFAULT_JOURNAL_DIR)
+        urls = set()
+        if not os.path.isdir(directory):
+            return urls
+        for name in os.listdir(directory):
+            if not name.endswith('.jsonl'):
+                continue
+            entries = RunJournal._read(os.path.join(directory, name)).values()
+            resumable = since is None or any(entry.get('state') in ('pending', 'failed') for entry in entries)
+            written = max((entry.get('time', 0) for entry in entries), default=0)
+            if resumable or written > since:
+                urls.update(entry['url'] for entry in entries if entry.get('url'))
+        return urls
+
+    def record(self, presentation_id, key, state, **fields):
+        """
+        Appends a state change; later records override earlier fields of the same operation
+
+        Args:
+            presentation_id (str): Presentation the operation belongs to
+            key: Planner unit or image job key
+            state (str): One of STATES
+            **fields: Extra data, e.g. url for uploaded images or error for failures
+        """
+        key = journal_key(key)
+        record = {'presentation_id': presentation_id, 'key': key, 'state': state, 'time': time.time()}
+        record.update(fields)
+        with self._lock:
+            self.entries.setdefault((presentation_id, key), {}).update(
+                {name: value for name, value in record.items() if name not in ('presentation_id', 'key')})
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def get(self, presentation_id, key):
+        """
+        Returns:
+            dict: Latest merged state and fields of the operation, or None
+        """
+        with self._lock:
+            entry = self.entries.get((presentation_id, journal_key(key)))
+            return dict(entry) if entry else None
+
+    def is_applied(self, presentation_id, key):
+        entry = self.get(presentation_id, key)
+        return entry is not None and entry['state'] == 'applied'
+
+    def record_image(self, presentation_id, key, url):
+        """Records an image job as uploaded to url, or as failed when url is None."""
+        if url:
+            self.record(presentation_id, image_key(key), 'uploaded', url=url)
+        else:
+            self.record(presentation_id, image_key(key), 'failed', error="image generation failed")
+
+    def image_url(self, presentation_id, key):
+        """URL of an image job uploaded earlier in this run, or None if it has not been."""
+        entry = self.get(presentation_id, image_key(key))
+        return entry['url'] if entry and entry['state'] == 'uploaded' else None
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of operations per current state
+        """
+        with self._lock:
+            counts = {}
+            for entry in self.entries.values():
+                counts[entry['state']] = counts.get(entry['state'], 0) + 1
+            return counts
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,92 @@
+"""
+Remembers what was last pushed to each presentation so unchanged elements can be skipped
+"""
+
+import hashlib
+import json
+import os
+import threading
+import config
+
+DEFAULT_MANIFEST_FILE = '.run_manifest.json'
+
+
+def _plain_json(value):
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RunManifest:
+    def __init__(self, path=None):
+        """
+        Load (or start) the manifest of per-objectId content hashes
+
+        Args:
+            path (str): JSON file holding the manifest (default: config.RUN_MANIFEST_FILE)
+        """
+        self.path = path or getattr(config, 'RUN_MANIFEST_FILE', DEFAULT_MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self.presentations = {}
+        self._staged = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.presentations = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable run manifest {self.path}: {str(e)}")
+
+    @staticmethod
+    def content_hash(*values):
+        """
+        Hashes the input fields that define an element's content
+
+        Returns:
+            str: Hex digest of the values
+        """
+        # Deck records (helpers.deck_loader) hash exactly like the dicts they were loaded from
+        payload = json.dumps(values, ensure_ascii=False, sort_keys=True, default=_plain_json)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_changed(self, presentation_id, object_id, digest):
+        """True unless the element was last pushed with exactly this content."""
+        with self._lock:
+            return self.presentations.get(presentation_id, {}).get(str(object_id)) != digest
+
+    def stage_if_changed(self, presentation_id, object_id, *content):
+        """
+        Compares an element's content with the last run
+
+        Changed content is staged so commit() can record it once the update is applied.
+
+        Returns:
+            bool: True if the element has to be pushed
+        """
+        digest = self.content_hash(*content)
+        if not self.is_changed(presentation_id, object_id, digest):
+            return False
+        with self._lock:
+            self._staged[(presentation_id, str(object_id))] = digest
+        return True
+
+    def commit(self, presentation_id, applied_ids):
+        """Records the staged content of every applied element and saves the manifest."""
+        with self._lock:
+            for object_id in applied_ids:
+                digest = self._staged.pop((presentation_id, str(object_id)), None)
+                if digest:
+                    self.presentations.setdefault(presentation_id, {})[str(object_id)] = digest
+        self.save()
+
+    def reset(self, presentation_id):
+        """Forgets everything pushed to a presentation, forcing a full update."""
+        with self._lock:
+            self.presentations.pop(presentation_id, None)
+
+    def save(self):
+        """Writes the manifest to disk."""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.presentations, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,124 @@
+"""
+Indexes a loaded deck once so slides can be picked by number, range, layout, objectId, notes or content
+"""
+
+import re
+
+# Element kinds for has:<kind>
+ELEMENT_KINDS = {'text': 'TEXT', 'image': 'IMAGE'}
+
+SELECTOR_HELP = (
+    "Slide selectors: 5, 3-9, layout=TITLE_AND_BODY, objectId=g3298..., notes=keyword, "
+    "has:image, has:text, has:notes, new. Terms joined with ',' must all match; "
+    "separate selectors add up"
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    return {word.lower() for word in _WORD.findall(text or '')}
+
+
+class SlideIndex:
+    def __init__(self, slides_data):
+        """
+        Build the lookup tables for a deck
+
+        Args:
+            slides_data (list): 'slides' of the input JSON (dicts or deck_loader records)
+        """
+        self.slides = list(slides_data)
+        self.by_number = {}
+        self.by_layout = {}
+        self.by_object_id = {}
+        self.by_notes_word = {}
+        self.by_kind = {'text': set(), 'image': set(), 'notes': set(), 'new': set()}
+
+        for slide in self.slides:
+            number = slide['slideNumber']
+            self.by_number[number] = slide
+            self.by_layout.setdefault(slide.get('layout'), set()).add(number)
+            if not slide.get('exists'):
+                self.by_kind['new'].add(number)
+            if slide.get('notes'):
+                self.by_kind['notes'].add(number)
+                for word in _words(slide['notes']):
+                    self.by_notes_word.setdefault(word, set()).add(number)
+            elements = slide.get('elements', {})
+            for kind, element_type in ELEMENT_KINDS.items():
+                for element in elements.get(element_type, []):
+                    self.by_kind[kind].add(number)
+                    if element.get('objectId'):
+                        self.by_object_id[element['objectId']] = number
+
+    def _term(self, term):
+        """
+        Slide numbers matching one selector term
+
+        Raises:
+            ValueError: If the term is not a valid selector
+        """
+        term = term.strip()
+        if re.fullmatch(r"\d+", term):
+            return {int(term)} & self.by_number.keys()
+        match = re.fullmatch(r"(\d+)\s*-\s*(\d+)", term)
+        if match:
+            low, high = sorted((int(match.group(1)), int(match.group(2))))
+            # Walk whichever side is smaller: the range or the deck
+            if high - low < len(self.by_number):
+                return {number for number in range(low, high + 1) if number in self.by_number}
+            return {number for number in self.by_number if low <= number <= high}
+        if term == 'new':
+            return set(self.by_kind['new'])
+        if term.startswith('has:'):
+            kind = term[len('has:'):].lower()
+            if kind not in self.by_kind or kind == 'new':
+                raise ValueError(f"Unknown selector {term}: use has:text, has:image or has:notes")
+            return set(self.by_kind[kind])
+        name, separator, value = term.partition('=')
+        if separator:
+            name = name.strip().lower()
+            value = value.strip()
+            if name == 'layout':
+                return set(self.by_layout.get(value.upper(), ()))
+            if name == 'objectid':
+                number = self.by_object_id.get(value)
+                return {number} if number is not None else set()
+            if name == 'notes':
+                words = _words(value)
+                if not words:
+                    raise ValueError(f"Selector {term} needs a keyword")
+                return set.intersection(*(self.by_notes_word.get(word, set()) for word in words))
+        raise ValueError(f"Unknown selector {term}. {SELECTOR_HELP}")
+
+    def select_numbers(self, selectors):
+        """
+        Resolves selectors to slide numbers
+
+        Args:
+            selectors (list): Slide numbers (int) or selector strings, e.g. ['3-9', 'layout=TITLE,has:image']
+
+        Returns:
+            list: Matching slide numbers, sorted
+
+        Raises:
+            ValueError: If a selector cannot be parsed
+        """
+        selected = set()
+        for selector in selectors:
+            if isinstance(selector, int):
+                selected |= {selector} & self.by_number.keys()
+                continue
+            terms = [term for term in str(selector).split(',') if term.strip()]
+            if not terms:
+                raise ValueError(f"Empty selector. {SELECTOR_HELP}")
+            selected |= set.intersection(*(self._term(term) for term in terms))
+        return sorted(selected)
+
+    def select(self, selectors):
+        """
+        Returns:
+            list: Matching slides in slide-number order
+        """
+        return [self.by_number[number] for number in self.select_numbers(selectors)]
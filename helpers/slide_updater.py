@@ -2,210 +2,539 @@
 Handles all slide creation and update operations
 """
 
-import time
-import config
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helpers.request_planner import RequestPlanner
+from helpers.image_pipeline import ImageJob, pipeline_for
+from helpers.rate_limiter import get_rate_limiter
+from helpers.presentation_index import PresentationIndex
+from helpers.template_variables import TemplateVariables
+from helpers.text_diff import text_edit_requests
+from helpers.instrumentation import in_context
 
 class PresentationUpdater:
-    def __init__(self, slides_service, image_handler):
+    def __init__(self, slides_service, image_handler, image_workers=None, rate_limiter=None, manifest=None,
+                 journal=None):
         self.service = slides_service
         self.image_handler = image_handler
-        self.requests_per_minute = config.REQUESTS_PER_MINUTE
-        self.request_interval = 60.0 / self.requests_per_minute  # Time between requests
-        self.last_request_time = 0
-
-    def _wait_for_rate_limit(self):
-        """Ensure we don't exceed rate limits."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.request_interval:
-            time.sleep(self.request_interval - time_since_last)
-        self.last_request_time = time.time()
+        # An AsyncImageHandler gets the event-loop pipeline; the sync API works with both
+        self.image_pipeline = pipeline_for(image_handler, max_workers=image_workers)
+        # Shared with the image handler so every client draws from the same quotas
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        # With a manifest only elements whose content changed since the last run are pushed
+        self.manifest = manifest
+        # With a journal, work done by an interrupted run with the same ID is not repeated
+        self.journal = journal
+        # (presentation_id, manifest key) of a new slide -> its images not attached yet
+        self._unattached_images = {}
+        self._lock = threading.Lock()
+        
+    def _is_unchanged(self, presentation_id, object_id, *content):
+        """Checks an element against the run manifest, if there is one."""
+        return self.manifest is not None and not self.manifest.stage_if_changed(
+            presentation_id, object_id, *content
+        )
         
-    def create_new_slides(self, presentation_id, slides_data):
-        """Creates and populates new slides."""
+    def execute_plan(self, presentation_id, planner):
+        """Sends every request queued on the planner, honouring the Slides rate limit."""
+        results = planner.execute(self.service, presentation_id, rate_limiter=self.rate_limiter,
+                                  journal=self.journal)
+        if self.manifest is not None:
+            self.manifest.commit(presentation_id, results['applied'] + self._attached_slides(
+                presentation_id, results['applied']))
+        return results
+
+    def _attached_slides(self, presentation_id, applied):
+        """Manifest keys of the new slides whose last missing image was just attached."""
+        attached = []
+        with self._lock:
+            for (slide_presentation, key), image_ids in list(self._unattached_images.items()):
+                if slide_presentation == presentation_id:
+                    image_ids.difference_update(applied)
+                    if not image_ids:
+                        del self._unattached_images[(slide_presentation, key)]
+                        attached.append(key)
+        return attached
+
+    def preflight(self, presentation_id, slides_data):
+        """
+        Reads the presentation once and checks the input's updates against it
+
+        Returns:
+            PresentationIndex: Passed to the update phases, which then drop updates
+                               of missing or mismatched objectIds before any writes
+        """
+        index = PresentationIndex.fetch(self.service, presentation_id, rate_limiter=self.rate_limiter)
+        problems = index.validate(slides_data)
+        print(f"Preflight: {len(index.page_ids)} slides, {len(index.elements)} elements, "
+              f"{len(problems)} input updates do not match the presentation")
+        return index
+
+    @staticmethod
+    def _new_slide_image_ids(slide):
+        """objectIds of the images create_new_slides attaches to a new slide."""
+        return [f'slide_{slide["slideNumber"]}_image_{image_index}'
+                for image_index, image_elem in enumerate(slide.get('elements', {}).get('IMAGE', []))
+                if image_elem.get('image_prompt')]
+
+    def _new_slide_key(self, slide):
+        """
+        Run manifest key of a new slide
+
+        A slide with images is only complete once every one of them is attached,
+        so its content is recorded under a key of its own once the last one is
+        (see _attached_slides), and an image that failed makes the next run retry.
+        """
+        if self._new_slide_image_ids(slide):
+            return f'slide_{slide["slideNumber"]}_images'
+        return f'slide_{slide["slideNumber"]}'
+
+    def create_new_slides(self, presentation_id, slides_data, planner=None, index=None, variables=None):
+        """
+        Creates new slides and fills in their text.
+
+        Slides are created in slide-number order with IDs chosen up front
+        (slide_<n>, <n>_title, <n>_body), so one ordered batch creates them all.
+        Their images are generated and attached afterwards by update_slide_images
+        with new_slide_ids, in a final batch.
+
+        When a planner is given the requests are only queued on it and the caller
+        executes the plan; otherwise the slides are created, their images attached,
+        and only the slides that were created are returned. With an index slides
+        whose ID is already taken in the presentation are not created again; if
+        an earlier run created one but did not attach all of its images, only
+        the missing images are queued. Template tokens in their text are filled in from
+        variables (TemplateVariables).
+
+        Returns:
+            dict: slideNumber -> slide ID of every new slide, including the ones only getting their images
+        """
+        own_plan = planner is None
+        if own_plan:
+            planner = RequestPlanner()
+        variables = variables or TemplateVariables()
         new_slide_ids = {}
+        # Slides created by an earlier run whose images still have to be attached
+        images_only = []
         
-        for slide in slides_data:
-            if not slide.get('exists'):
-                try:
-                    # Create the slide with placeholder mappings
-                    create_request = {
-                        'createSlide': {
-                            'insertionIndex': slide['slideNumber'] - 1,
-                            'slideLayoutReference': {
-                                'predefinedLayout': slide.get('layout', 'BLANK')
-                            },
-                            'placeholderIdMappings': [
-                                {
-                                    'layoutPlaceholder': {'type': 'TITLE'},
-                                    'objectId': f'{slide["slideNumber"]}_title'
-                                },
-                                {
-                                    'layoutPlaceholder': {'type': 'BODY'},
-                                    'objectId': f'{slide["slideNumber"]}_body'
-                                }
-                            ]
+        # Slides already created with the same content by an earlier run are left alone
+        new_slides = sorted((
+            slide for slide in slides_data
+            if not slide.get('exists') and not self._is_unchanged(
+                presentation_id, self._new_slide_key(slide),
+                slide.get('layout', 'BLANK'), slide.get('elements', {}),
+                *self._slide_variables(variables, slide['slideNumber'])
+            )
+        ), key=lambda slide: slide['slideNumber'])
+        
+        slide_count = len(index.page_ids) if index is not None else None
+        for slide in new_slides:
+            new_slide_id = f'slide_{slide["slideNumber"]}'
+            # A run being resumed may have created the slide but not yet attached its images
+            resumed = self.journal is not None and self.journal.is_applied(presentation_id, new_slide_id)
+            image_ids = self._new_slide_image_ids(slide)
+            if index is not None and new_slide_id in index and not resumed:
+                image_ids = [image_id for image_id in image_ids if image_id not in index]
+                if image_ids:
+                    print(f"New slide {slide['slideNumber']} already exists; attaching {len(image_ids)} "
+                          f"missing images")
+                    new_slide_ids[slide['slideNumber']] = new_slide_id
+                    images_only.append(new_slide_id)
+                    self._track_images(presentation_id, slide, image_ids)
+                else:
+                    print(f"Skipping new slide {slide['slideNumber']}: {new_slide_id} already exists")
+                    if self.manifest is not None:
+                        self.manifest.commit(presentation_id, [self._new_slide_key(slide)])
+                continue
+            self._track_images(presentation_id, slide, image_ids)
+            
+            # Inserting in slide-number order keeps every insertionIndex valid,
+            # as long as it never points past the end of the deck
+            insertion_index = slide['slideNumber'] - 1
+            if slide_count is not None and not resumed:
+                insertion_index = min(insertion_index, slide_count)
+                slide_count += 1
+            create_request = {
+                'createSlide': {
+                    'objectId': new_slide_id,
+                    'insertionIndex': insertion_index,
+                    'slideLayoutReference': {
+                        'predefinedLayout': slide.get('layout', 'BLANK')
+                    },
+                    'placeholderIdMappings': [
+                        {
+                            'layoutPlaceholder': {'type': 'TITLE'},
+                            'objectId': f'{slide["slideNumber"]}_title'
+                        },
+                        {
+                            'layoutPlaceholder': {'type': 'BODY'},
+                            'objectId': f'{slide["slideNumber"]}_body'
                         }
-                    }
-                    
-                    response = self.service.presentations().batchUpdate(
-                        presentationId=presentation_id,
-                        body={'requests': [create_request]}
-                    ).execute()
-                    
-                    new_slide_id = response.get('replies', [{}])[0].get('createSlide', {}).get('objectId')
-                    if new_slide_id:
-                        new_slide_ids[slide['slideNumber']] = new_slide_id
-                        # Add content to new slide
-                        self._populate_new_slide(presentation_id, new_slide_id, slide)
-                    else:
-                        print(f"Failed to get new slide ID for slide {slide['slideNumber']}")
-                        
-                except Exception as e:
-                    print(f"Error creating slide {slide['slideNumber']}: {str(e)}")
+                    ]
+                }
+            }
+            
+            # Slide creation and its text form one unit, so a failure
+            # never leaves a half-populated slide behind
+            planner.add(
+                [create_request] + self._new_slide_text_requests(new_slide_id, slide, variables),
+                key=new_slide_id,
+                description=f"new slide {slide['slideNumber']}"
+            )
+            new_slide_ids[slide['slideNumber']] = new_slide_id
         
+        if own_plan:
+            # Create the slides while their images generate
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                slides_created = executor.submit(in_context(self._create_slides), presentation_id, planner,
+                                                 images_only)
+                self.update_slide_images(presentation_id, slides_data, index=index, new_slide_ids=new_slide_ids,
+                                         slides_created=slides_created, existing=False)
+            applied = set(slides_created.result()['applied'])
+            new_slide_ids = {
+                number: slide_id for number, slide_id in new_slide_ids.items()
+                if slide_id in applied
+            }
         return new_slide_ids
     
-    def _populate_new_slide(self, presentation_id, slide_id, slide_data):
-        """Populates a newly created slide with content."""
+    def _track_images(self, presentation_id, slide, image_ids):
+        """Holds back a new slide's manifest entry until all the given images are attached."""
+        if self.manifest is not None and image_ids:
+            with self._lock:
+                self._unattached_images[(presentation_id, self._new_slide_key(slide))] = set(image_ids)
+    
+    def _create_slides(self, presentation_id, planner, images_only):
+        """Executes the plan creating new slides; the ones in images_only already exist and count as created."""
+        results = self.execute_plan(presentation_id, planner)
+        results['applied'] = images_only + results['applied']
+        return results
+    
+    @staticmethod
+    def _slide_variables(variables, slide_number):
+        """The (token, text) pairs that apply to a new slide, so changing one re-creates it."""
+        return [[variable.token, variable.text] for variable in variables.variables
+                if variable.applies_to(slide_number)]
+    
+    def _new_slide_text_requests(self, slide_id, slide_data, variables):
+        """Builds the requests that fill a newly created slide with its text."""
         requests = []
         
-        try:
-            # Handle text elements
-            for text_elem in slide_data.get('elements', {}).get('TEXT', []):
-                if text_elem.get('placeholder'):
-                    # Use the mapped placeholder IDs we created
-                    object_id = f'{slide_data["slideNumber"]}_{text_elem["placeholder"].lower()}'
-                    requests.append({
-                        'insertText': {
-                            'objectId': object_id,
-                            'insertionIndex': 0,
-                            'text': text_elem['text']
-                        }
-                    })
-                else:
-                    # Create new text box
-                    text_box_id = f'{slide_id}_text_{len(requests)}'
-                    requests.append({
-                        'createShape': {
-                            'objectId': text_box_id,
-                            'shapeType': 'TEXT_BOX',
-                            'elementProperties': {
-                                'pageObjectId': slide_id,
-                                'size': {'width': {'magnitude': 300, 'unit': 'PT'},
-                                       'height': {'magnitude': 100, 'unit': 'PT'}},
-                                'transform': {
-                                    'scaleX': 1,
-                                    'scaleY': 1,
-                                    'translateX': 100,
-                                    'translateY': 100,
-                                    'unit': 'PT'
-                                }
+        for text_index, text_elem in enumerate(slide_data.get('elements', {}).get('TEXT', [])):
+            text = variables.substitute(text_elem['text'], slide_data['slideNumber'], slide_id)
+            if text_elem.get('placeholder'):
+                # Use the mapped placeholder IDs we created
+                object_id = f'{slide_data["slideNumber"]}_{text_elem["placeholder"].lower()}'
+                requests.append({
+                    'insertText': {
+                        'objectId': object_id,
+                        'insertionIndex': 0,
+                        'text': text
+                    }
+                })
+            else:
+                # Create new text box
+                text_box_id = f'{slide_id}_text_{text_index}'
+                requests.append({
+                    'createShape': {
+                        'objectId': text_box_id,
+                        'shapeType': 'TEXT_BOX',
+                        'elementProperties': {
+                            'pageObjectId': slide_id,
+                            'size': {'width': {'magnitude': 300, 'unit': 'PT'},
+                                   'height': {'magnitude': 100, 'unit': 'PT'}},
+                            'transform': {
+                                'scaleX': 1,
+                                'scaleY': 1,
+                                'translateX': 100,
+                                'translateY': 100,
+                                'unit': 'PT'
                             }
                         }
-                    })
-                    requests.append({
-                        'insertText': {
-                            'objectId': text_box_id,
-                            'insertionIndex': 0,
-                            'text': text_elem['text']
-                        }
-                    })
-            
-            # Handle image elements for new slides
-            for image_elem in slide_data.get('elements', {}).get('IMAGE', []):
-                if image_elem.get('image_prompt'):
-                    image_url = self.image_handler.generate_and_store_image(
-                        image_elem['image_prompt'],
-                        aspect_ratio=image_elem.get('aspect_ratio', '1:1')
-                    )
-                    
-                    if image_url:
-                        image_id = f'{slide_id}_image_{len(requests)}'
-                        requests.append({
-                            'createImage': {
-                                'objectId': image_id,
-                                'url': image_url,
-                                'elementProperties': {
-                                    'pageObjectId': slide_id,
-                                    'size': {
-                                        'width': {'magnitude': 350, 'unit': 'PT'},
-                                        'height': {'magnitude': 350, 'unit': 'PT'}
-                                    },
-                                    'transform': {
-                                        'scaleX': 1,
-                                        'scaleY': 1,
-                                        'translateX': 100,
-                                        'translateY': 100,
-                                        'unit': 'PT'
-                                    }
-                                }
+                    }
+                })
+                requests.append({
+                    'insertText': {
+                        'objectId': text_box_id,
+                        'insertionIndex': 0,
+                        'text': text
+                    }
+                })
+        
+        return requests
+    
+    def _new_slide_image_jobs(self, slides_data, new_slide_ids, index=None):
+        """
+        Image jobs of the new slides, keyed by (slideNumber, image index)
+
+        With an index, images an earlier run already attached are left out.
+        """
+        return [
+            ImageJob.from_element((slide['slideNumber'], image_index), image_elem)
+            for slide in slides_data
+            if slide['slideNumber'] in new_slide_ids
+            for image_index, image_elem in enumerate(slide.get('elements', {}).get('IMAGE', []))
+            if image_elem.get('image_prompt')
+            and (index is None or f'{new_slide_ids[slide["slideNumber"]]}_image_{image_index}' not in index)
+        ]
+    
+    def _queue_new_slide_images(self, planner, new_slide_ids, new_jobs, image_urls, slides_created=None):
+        """
+        Queues a createImage unit per generated image of the new slides
+
+        Each image is a unit of its own, keyed by its objectId, so an image that
+        failed to generate or apply is retried by the next run without the others.
+
+        With slides_created (a Future of the batch creating the slides) the images
+        of slides it did not create are dropped.
+        
+        Returns:
+            tuple: (queued count, skipped count)
+        """
+        applied = set(slides_created.result()['applied']) if slides_created is not None else None
+        queued_count = 0
+        skipped_count = 0
+        by_slide = {}
+        for job in new_jobs:
+            by_slide.setdefault(job.key[0], []).append(job)
+        
+        for slide_number, jobs in by_slide.items():
+            slide_id = new_slide_ids[slide_number]
+            if applied is not None and slide_id not in applied:
+                print(f"Skipping {len(jobs)} images of new slide {slide_number}: the slide was not created")
+                skipped_count += len(jobs)
+                continue
+            for job in jobs:
+                image_url = image_urls.get(job.key)
+                if not image_url:
+                    print(f"Failed to generate image {job.key[1]} for new slide {slide_number}")
+                    skipped_count += 1
+                    continue
+                image_id = f'{slide_id}_image_{job.key[1]}'
+                create_request = {
+                    'createImage': {
+                        'objectId': image_id,
+                        'url': image_url,
+                        'elementProperties': {
+                            'pageObjectId': slide_id,
+                            'size': {
+                                'width': {'magnitude': 350, 'unit': 'PT'},
+                                'height': {'magnitude': 350, 'unit': 'PT'}
+                            },
+                            'transform': {
+                                'scaleX': 1,
+                                'scaleY': 1,
+                                'translateX': 100,
+                                'translateY': 100,
+                                'unit': 'PT'
                             }
-                        })
-            
-            if requests:
-                self.service.presentations().batchUpdate(
-                    presentationId=presentation_id,
-                    body={'requests': requests}
-                ).execute()
-                
-        except Exception as e:
-            print(f"Error populating slide {slide_id}: {str(e)}")
+                        }
+                    }
+                }
+                planner.add(
+                    [create_request],
+                    key=image_id,
+                    description=f"image {job.key[1]} of new slide {slide_number}"
+                )
+                queued_count += 1
+        return queued_count, skipped_count
     
-    def update_existing_slides(self, presentation_id, slides_data):
-        """Updates content in existing slides."""
-        updated_count = 0
+    def _finish_plan(self, presentation_id, planner, queued_count, skipped_count, label):
+        """Executes a plan owned by a single phase and returns its (updated, skipped) counts."""
+        results = self.execute_plan(presentation_id, planner)
+        updated_count = len(results['applied'])
+        skipped_count += queued_count - updated_count
+        print(f"{label} update summary: {updated_count} updated, {skipped_count} skipped")
+        return updated_count, skipped_count
+    
+    def replace_variables(self, presentation_id, slides_data, variables, planner, index=None):
+        """
+        Queues one replaceAllText per template token for the whole presentation
+
+        Tokens limited to some slides are scoped with pageObjectIds, found through
+        the index. They are queued ahead of the text rewrites of the same batch.
+
+        Returns:
+            int: Number of queued replacements
+        """
+        slide_pages = index.slide_pages(slides_data) if index is not None else {}
+        queued_count = 0
+        unchanged_count = 0
+        for token, request in variables.requests(slide_pages):
+            key = f'variable:{token}'
+            # Once replaced the token is gone, so the same replacement has nothing left to do
+            if self._is_unchanged(presentation_id, key, request):
+                unchanged_count += 1
+                continue
+            planner.add([request], key=key, description=f"variable {token}")
+            queued_count += 1
+        if unchanged_count:
+            print(f"Skipping {unchanged_count} template variables replaced by the last run")
+        if queued_count:
+            print(f"Replacing {queued_count} template variables across the presentation")
+        return queued_count
+    
+    def update_existing_slides(self, presentation_id, slides_data, planner=None, index=None, variables=None):
+        """
+        Updates content in existing slides.
+
+        When a planner is given the requests are only queued on it and the
+        returned count is the number of queued updates. With an index, elements
+        that are missing or cannot hold text are skipped.
+
+        With variables (TemplateVariables) every token is replaced deck-wide by
+        one replaceAllText, and the text of each element is filled in before it
+        is compared and written.
+
+        With an index, the current text is edited in place: an element whose text
+        reads as intended once the tokens are replaced is not rewritten at all,
+        and otherwise only the changed runs are deleted and inserted with
+        FIXED_RANGE indexes. Without one the whole text is replaced. The indexes
+        count in the text as the replacements leave it, so an edit is queued after
+        the replacements of the tokens its element holds, and fails if one fails.
+        """
+        own_plan = planner is None
+        if own_plan:
+            planner = RequestPlanner()
+        variables = variables or TemplateVariables()
+        queued_count = 0
         skipped_count = 0
         
+        unchanged_count = 0
+        # Elements already reading as intended; nothing is sent, but the manifest records them
+        replaced_ids = []
+        
+        if len(variables) and index is None:
+            # The pages of tokens scoped to slide numbers are looked up in the presentation
+            index = PresentationIndex.fetch(self.service, presentation_id, rate_limiter=self.rate_limiter)
+        variable_count = self.replace_variables(presentation_id, slides_data, variables, planner, index)
+        
         for slide in slides_data:
             if slide.get('exists'):
                 for text_elem in slide.get('elements', {}).get('TEXT', []):
                     if text_elem.get('objectId'):
-                        try:
-                            # Wait for rate limit before making request
-                            self._wait_for_rate_limit()
-                            
-                            # Delete existing text
-                            delete_request = {
-                                'deleteText': {
-                                    'objectId': text_elem['objectId'],
-                                    'textRange': {
-                                        'type': 'ALL'
-                                    }
-                                }
-                            }
-                            
-                            # Insert new text
-                            insert_request = {
-                                'insertText': {
-                                    'objectId': text_elem['objectId'],
-                                    'insertionIndex': 0,
-                                    'text': text_elem['text']
-                                }
-                            }
-                            
-                            # Execute both requests together
-                            self.service.presentations().batchUpdate(
-                                presentationId=presentation_id,
-                                body={'requests': [delete_request, insert_request]}
-                            ).execute()
-                            
-                            updated_count += 1
-                            print(f"Successfully updated text element {text_elem['objectId']} on slide {slide['slideNumber']}")
-                            
-                        except Exception as e:
-                            print(f"Failed to update text element {text_elem['objectId']} on slide {slide['slideNumber']}: {str(e)}")
+                        reason = index.check_text(text_elem['objectId']) if index is not None else None
+                        if reason:
+                            print(f"Skipping text {text_elem['objectId']} on slide {slide['slideNumber']}: {reason}")
                             skipped_count += 1
                             continue
+                        
+                        page_id = index.elements[text_elem['objectId']].page_id if index is not None else None
+                        text = variables.substitute(text_elem['text'], slide['slideNumber'], page_id)
+                        if self._is_unchanged(presentation_id, text_elem['objectId'], text):
+                            unchanged_count += 1
+                            continue
+                        
+                        # Edit the text as the replaceAllText calls leave it; they may leave it as intended
+                        current = index.text_of(text_elem['objectId']) if index is not None else None
+                        tokens = []
+                        if current is not None:
+                            tokens = variables.tokens_in(current, slide['slideNumber'], page_id)
+                            current = variables.substitute(current, slide['slideNumber'], page_id)
+                        requests = text_edit_requests(text_elem['objectId'], current, text)
+                        if not requests:
+                            replaced_ids.append(text_elem['objectId'])
+                            continue
+                        
+                        planner.add(
+                            requests,
+                            key=text_elem['objectId'],
+                            description=f"text element {text_elem['objectId']} on slide {slide['slideNumber']}",
+                            after=[f'variable:{token}' for token in tokens]
+                        )
+                        queued_count += 1
     
-        print(f"Text update summary: {updated_count} updated, {skipped_count} skipped")
-        return updated_count, skipped_count
+        if unchanged_count:
+            print(f"Skipping {unchanged_count} text elements unchanged since the last run")
+        if replaced_ids:
+            print(f"Skipping {len(replaced_ids)} text elements that already read as intended"
+                  + (" once the variables are replaced" if variable_count else ""))
+            if self.manifest is not None:
+                # A replacement that fails is retried by the next run, which leaves them as intended
+                self.manifest.commit(presentation_id, replaced_ids)
+        queued_count += variable_count
+        if own_plan:
+            return self._finish_plan(presentation_id, planner, queued_count, skipped_count, "Text")
+        return queued_count, skipped_count
+        
+    def update_slide_images(self, presentation_id, slides_data, planner=None, index=None, new_slide_ids=None,
+                            slides_created=None, existing=True):
+        """
+        Updates images in existing slides using their objectIds, and attaches the images of new slides.
+
+        When a planner is given the replaceImage and createImage requests are only
+        queued on it and the returned count is the number of queued updates. Each
+        update is queued as soon as its image is generated, so a PipelineScheduler
+        given as the planner applies it while the other images still generate. With
+        an index, elements that are missing or not images are skipped, and images
+        are sized for the placeholder's real size.
+
+        Args:
+            new_slide_ids (dict): slideNumber -> slide ID from create_new_slides;
+                                  their images are generated along with the others
+            slides_created (Future): Pending execute_plan results of the batch creating
+                                     the new slides; their images are queued once it is done and
+                                     images of slides it did not create are dropped
+            existing (bool): Also update the images of existing slides
+        """
+        own_plan = planner is None
+        if own_plan:
+            planner = RequestPlanner()
+        jobs, slide_numbers, skipped_count = (
+            self._collect_image_jobs(presentation_id, slides_data, index) if existing else ([], {}, 0))
+        new_jobs = self._new_slide_image_jobs(slides_data, new_slide_ids or {}, index)
+        counts = {'queued': 0, 'skipped': skipped_count}
+        deferred = new_jobs if slides_created is not None else []
+        
+        # Generate new images from their descriptions concurrently
+        image_urls = self.image_pipeline.generate(
+            jobs + new_jobs, journal=self.journal, presentation_id=presentation_id,
+            on_ready=self._image_queue(planner, jobs, slide_numbers, new_slide_ids,
+                                       [] if deferred else new_jobs, counts)
+        )
+        
+        return self._finish_image_updates(presentation_id, planner, own_plan, counts, image_urls,
+                                          new_slide_ids, deferred, slides_created)
+    
+    async def update_slide_images_async(self, presentation_id, slides_data, planner=None, index=None,
+                                        new_slide_ids=None, slides_created=None, existing=True):
+        """
+        Same as update_slide_images, but generates the images on the running event loop.
+
+        Needs an AsyncImageHandler. The Slides writes stay synchronous and are
+        batched as before.
+        """
+        own_plan = planner is None
+        if own_plan:
+            planner = RequestPlanner()
+        jobs, slide_numbers, skipped_count = (
+            self._collect_image_jobs(presentation_id, slides_data, index) if existing else ([], {}, 0))
+        new_jobs = self._new_slide_image_jobs(slides_data, new_slide_ids or {}, index)
+        counts = {'queued': 0, 'skipped': skipped_count}
+        deferred = new_jobs if slides_created is not None else []
+        image_urls = await self.image_pipeline.generate_async(
+            jobs + new_jobs, journal=self.journal, presentation_id=presentation_id,
+            on_ready=self._image_queue(planner, jobs, slide_numbers, new_slide_ids,
+                                       [] if deferred else new_jobs, counts)
+        )
+        if slides_created is not None:
+            # Wait for the slides without blocking the loop
+            await asyncio.wrap_future(slides_created)
+        return self._finish_image_updates(presentation_id, planner, own_plan, counts, image_urls,
+                                          new_slide_ids, deferred, slides_created)
+    
+    def _collect_image_jobs(self, presentation_id, slides_data, index):
+        """
+        Finds the images of existing slides that need a new image
         
-    def update_slide_images(self, presentation_id, slides_data):
-        """Updates images in existing slides using their objectIds."""
-        updated_count = 0
+        Returns:
+            tuple: (ImageJob list, objectId -> slideNumber, skipped count)
+        """
         skipped_count = 0
         
+        unchanged_count = 0
+        jobs = []
+        slide_numbers = {}
         for slide in slides_data:
             if not slide.get('exists'):
                 continue
@@ -220,42 +549,113 @@ class PresentationUpdater:
                     print(f"Skipping image {image_elem['objectId']} on slide {slide['slideNumber']}: No image description")
                     skipped_count += 1
                     continue
-                    
-                try:
-                    # Wait for rate limit
-                    self._wait_for_rate_limit()
-                    
-                    # Generate new image from description
-                    image_url = self.image_handler.generate_and_store_image(
-                        image_elem['image_prompt'],
-                        aspect_ratio=image_elem.get('aspect_ratio', '1:1')
-                    )
-                    
-                    if image_url:
-                        # Replace existing image
-                        replace_request = {
-                            'replaceImage': {
-                                'imageObjectId': image_elem['objectId'],
-                                'imageReplaceMethod': 'CENTER_CROP',
-                                'url': image_url
-                            }
-                        }
-                        
-                        self.service.presentations().batchUpdate(
-                            presentationId=presentation_id,
-                            body={'requests': [replace_request]}
-                        ).execute()
-                        
-                        updated_count += 1
-                        print(f"Successfully updated image {image_elem['objectId']} on slide {slide['slideNumber']}")
-                    else:
-                        print(f"Failed to generate image for {image_elem['objectId']} on slide {slide['slideNumber']}")
-                        skipped_count += 1
-                        
-                except Exception as e:
-                    print(f"Failed to update image {image_elem['objectId']} on slide {slide['slideNumber']}: {str(e)}")
+                
+                reason = index.check_image(image_elem['objectId']) if index is not None else None
+                if reason:
+                    print(f"Skipping image {image_elem['objectId']} on slide {slide['slideNumber']}: {reason}")
                     skipped_count += 1
                     continue
+                    
+                aspect_ratio = image_elem.get('aspect_ratio', '1:1')
+                # A pinned variant is part of the content, so switching it re-pushes the image
+                variant = [image_elem['variant']] if image_elem.get('variant') is not None else []
+                if self._is_unchanged(presentation_id, image_elem['objectId'],
+                                      image_elem['image_prompt'], aspect_ratio, *variant):
+                    unchanged_count += 1
+                    continue
+                    
+                size = index.size_of(image_elem['objectId']) if index is not None else None
+                jobs.append(ImageJob.from_element(image_elem['objectId'], image_elem, size=size))
+                slide_numbers[image_elem['objectId']] = slide['slideNumber']
+        
+        if unchanged_count:
+            print(f"Skipping {unchanged_count} images unchanged since the last run")
+        return jobs, slide_numbers, skipped_count
+    
+    def _image_queue(self, planner, jobs, slide_numbers, new_slide_ids, new_jobs, counts):
+        """
+        Builds the on_ready callback that queues image updates as their images are generated
+
+        A replaceImage is queued with its own image, and the createImage units of a
+        new slide once all of the slide's images are done. counts collects the
+        queued and skipped updates.
+        """
+        existing_jobs = {job.key: job for job in jobs}
+        remaining = {}
+        for job in new_jobs:
+            remaining.setdefault(job.key[0], set()).add(job.key)
+        image_urls = {}
+        
+        def on_ready(ready_urls):
+            image_urls.update(ready_urls)
+            finished_slides = set()
+            for key in ready_urls:
+                if key not in existing_jobs and key[0] in remaining:
+                    remaining[key[0]].discard(key)
+                    if not remaining[key[0]]:
+                        finished_slides.add(key[0])
+                        del remaining[key[0]]
+            queued_count, skipped_count = self._queue_image_updates(
+                planner,
+                [existing_jobs[key] for key in ready_urls if key in existing_jobs],
+                image_urls,
+                slide_numbers,
+                new_slide_ids,
+                [job for job in new_jobs if job.key[0] in finished_slides]
+            )
+            counts['queued'] += queued_count
+            counts['skipped'] += skipped_count
+        
+        return on_ready
+    
+    def _finish_image_updates(self, presentation_id, planner, own_plan, counts, image_urls, new_slide_ids,
+                              deferred, slides_created):
+        """Queues the images of new slides left for after their creation, and executes the plan if owned."""
+        if deferred:
+            queued_count, skipped_count = self._queue_new_slide_images(planner, new_slide_ids, deferred,
+                                                                       image_urls, slides_created)
+            counts['queued'] += queued_count
+            counts['skipped'] += skipped_count
+        if own_plan:
+            return self._finish_plan(presentation_id, planner, counts['queued'], counts['skipped'], "Image")
+        return counts['queued'], counts['skipped']
+    
+    def _queue_image_updates(self, planner, jobs, image_urls, slide_numbers, new_slide_ids=None, new_jobs=()):
+        """
+        Queues a replaceImage per generated image and the createImage units of new slides
+
+        Returns:
+            tuple: (queued count, skipped count)
+        """
+        queued_count = 0
+        skipped_count = 0
+        
+        for job in jobs:
+            object_id = job.key
+            image_url = image_urls.get(object_id)
+            if image_url:
+                # Replace existing image
+                replace_request = {
+                    'replaceImage': {
+                        'imageObjectId': object_id,
+                        'imageReplaceMethod': 'CENTER_CROP',
+                        'url': image_url
+                    }
+                }
+                
+                planner.add(
+                    [replace_request],
+                    key=object_id,
+                    description=f"image {object_id} on slide {slide_numbers[object_id]}"
+                )
+                queued_count += 1
+            else:
+                print(f"Failed to generate image for {object_id} on slide {slide_numbers[object_id]}")
+                skipped_count += 1
+        
+        if new_jobs:
+            new_queued, new_skipped = self._queue_new_slide_images(planner, new_slide_ids, new_jobs, image_urls)
+            queued_count += new_queued
+            skipped_count += new_skipped
         
-        print(f"Image update summary: {updated_count} updated, {skipped_count} skipped")
-        return updated_count, skipped_count
\ No newline at end of file
+        return queued_count, skipped_count
@@ -0,0 +1,111 @@
+"""
+Fills template tokens such as [campaign name] deck-wide with one replaceAllText each, instead of rewriting every element holding them
+"""
+
+import re
+
+
+class TemplateVariable:
+    """One token and the text that replaces it, on every slide or only on some."""
+
+    __slots__ = ('token', 'text', 'slides', 'page_ids', 'match_case', '_pattern')
+
+    def __init__(self, token, text, slides=None, page_ids=None, match_case=False):
+        self.token = token
+        self.text = text
+        self.slides = set(slides) if slides else None
+        self.page_ids = set(page_ids) if page_ids else None
+        # replaceAllText ignores case unless told otherwise, and so does substitute()
+        self.match_case = bool(match_case)
+        self._pattern = re.compile(re.escape(token), 0 if self.match_case else re.IGNORECASE)
+
+    @property
+    def scoped(self):
+        return self.slides is not None or self.page_ids is not None
+
+    def applies_to(self, slide_number=None, page_id=None):
+        """True if the token is replaced on this slide."""
+        if not self.scoped:
+            return True
+        return ((self.slides is not None and slide_number in self.slides)
+                or (self.page_ids is not None and page_id in self.page_ids))
+
+    def substitute(self, text):
+        return self._pattern.sub(lambda _: self.text, text)
+
+
+class TemplateVariables:
+    def __init__(self, variables=None):
+        """
+        Parse the input's variables
+
+        Args:
+            variables (Mapping): Token -> replacement text, or -> {'text', 'slides' (slide numbers),
+                                 'pageObjectIds', 'matchCase'} to limit where it is replaced
+        """
+        self.variables = []
+        for token, value in (variables or {}).items():
+            if isinstance(value, str):
+                self.variables.append(TemplateVariable(token, value))
+            else:
+                self.variables.append(TemplateVariable(
+                    token, value['text'], value.get('slides'), value.get('pageObjectIds'), value.get('matchCase')
+                ))
+
+    def __len__(self):
+        return len(self.variables)
+
+    def substitute(self, text, slide_number=None, page_id=None):
+        """
+        The text as it reads once every token that applies to the slide is replaced
+
+        Returns:
+            str: text with its tokens replaced, in input order
+        """
+        for variable in self.variables:
+            if variable.applies_to(slide_number, page_id):
+                text = variable.substitute(text)
+        return text
+
+    def tokens_in(self, text, slide_number=None, page_id=None):
+        """
+        The tokens whose replacement changes the text on this slide
+
+        Returns:
+            list: tokens that substitute() replaces in text, in input order
+        """
+        tokens = []
+        for variable in self.variables:
+            if variable.applies_to(slide_number, page_id) and variable._pattern.search(text):
+                tokens.append(variable.token)
+                text = variable.substitute(text)
+        return tokens
+
+    def requests(self, slide_pages=None):
+        """
+        Builds one replaceAllText per token
+
+        Args:
+            slide_pages (dict): slideNumber -> page objectId, to scope tokens limited to slide numbers
+
+        Returns:
+            list: (token, request) pairs; a scoped token none of whose pages is known is left out
+        """
+        requests = []
+        for variable in self.variables:
+            request = {
+                'replaceAllText': {
+                    'containsText': {'text': variable.token, 'matchCase': variable.match_case},
+                    'replaceText': variable.text,
+                }
+            }
+            if variable.scoped:
+                page_ids = set(variable.page_ids or ())
+                page_ids.update(page_id for number, page_id in (slide_pages or {}).items()
+                                if variable.slides is not None and number in variable.slides)
+                if not page_ids:
+                    print(f"Skipping variable {variable.token}: none of its slides is in the presentation")
+                    continue
+                request['replaceAllText']['pageObjectIds'] = sorted(page_ids)
+            requests.append((variable.token, request))
+        return requests
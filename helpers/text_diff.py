@@ -0,0 +1,120 @@
+"""
+Turns a text change into the smallest deleteText/insertText edits, so only the changed runs are rewritten
+"""
+
+import difflib
+import re
+
+# Words, runs of whitespace and single punctuation marks; edits never split a word
+TOKEN_PATTERN = re.compile(r'\w+|\s+|[^\w\s]', re.UNICODE)
+# Rewritten characters one more edit has to save to be worth its deleteText/insertText pair
+EDIT_COST = 16
+
+
+def utf16_length(text):
+    """Slides counts text indexes in UTF-16 code units, so characters outside the BMP count twice."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _common_affixes(current, text):
+    prefix = 0
+    limit = min(len(current), len(text))
+    while prefix < limit and current[prefix] == text[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and current[-1 - suffix] == text[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def _edit(object_id, current, start, end, replacement):
+    """Requests replacing current[start:end] with replacement."""
+    requests = []
+    offset = utf16_length(current[:start])
+    if end > start:
+        requests.append({
+            'deleteText': {
+                'objectId': object_id,
+                'textRange': {
+                    'type': 'FIXED_RANGE',
+                    'startIndex': offset,
+                    'endIndex': offset + utf16_length(current[start:end])
+                }
+            }
+        })
+    if replacement:
+        requests.append({
+            'insertText': {
+                'objectId': object_id,
+                'insertionIndex': offset,
+                'text': replacement
+            }
+        })
+    return requests
+
+
+def _token_edits(current, text, start, current_end, text_end):
+    """
+    Edits between the common prefix and suffix, found by diffing words
+
+    Returns:
+        list: (start, end, replacement) in current's character offsets, last edit first
+    """
+    current_tokens = TOKEN_PATTERN.findall(current[start:current_end])
+    text_tokens = TOKEN_PATTERN.findall(text[start:text_end])
+    matcher = difflib.SequenceMatcher(None, current_tokens, text_tokens, autojunk=False)
+    current_offsets = [start]
+    for token in current_tokens:
+        current_offsets.append(current_offsets[-1] + len(token))
+    edits = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            edits.append((current_offsets[i1], current_offsets[i2], ''.join(text_tokens[j1:j2])))
+    return list(reversed(edits))
+
+
+def _cost(edits):
+    return sum(end - start + len(replacement) + EDIT_COST for start, end, replacement in edits)
+
+
+def text_edit_requests(object_id, current, text):
+    """
+    Builds the requests that turn a shape's text into text
+
+    Unchanged leading and trailing text is kept. Within the rest, words that
+    did not change are kept too, unless one edit of the whole middle rewrites
+    about as little: every character kept keeps its styling and layout.
+    Edits are applied from the end of the text backwards, so every FIXED_RANGE
+    index refers to the text as it was read.
+
+    Args:
+        object_id (str): The shape holding the text
+        current (str): Its current text without the final newline (see PresentationIndex.text_of),
+                       or None if unknown
+        text (str): The text it should hold
+
+    Returns:
+        list: Slides API requests; empty if the text is already the same
+    """
+    if current is None:
+        return [
+            {'deleteText': {'objectId': object_id, 'textRange': {'type': 'ALL'}}},
+            {'insertText': {'objectId': object_id, 'insertionIndex': 0, 'text': text}},
+        ]
+    if current == text:
+        return []
+
+    prefix, suffix = _common_affixes(current, text)
+    current_end = len(current) - suffix
+    text_end = len(text) - suffix
+    edits = [(prefix, current_end, text[prefix:text_end])]
+    if prefix < current_end and prefix < text_end:
+        token_edits = _token_edits(current, text, prefix, current_end, text_end)
+        if _cost(token_edits) < _cost(edits):
+            edits = token_edits
+    return [
+        request
+        for start, end, replacement in edits
+        for request in _edit(object_id, current, start, end, replacement)
+    ]
@@ -2,61 +2,175 @@
 Main automation script that orchestrates the slide updates
 """
 
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import argparse
+import time
+from helpers.clients import get_clients
 from helpers.slide_updater import PresentationUpdater
-from helpers.image_handler import ImageHandler
+from helpers.image_cache import ImageCache
+from helpers.run_manifest import RunManifest
+from helpers.pipeline_scheduler import PipelineScheduler
+from helpers.presentation_copier import copy_presentation
+from helpers.rate_limiter import get_rate_limiter
+from helpers.instrumentation import Tracer, get_tracer, set_tracer
+from helpers.run_journal import RunJournal
+from helpers.deck_loader import load_deck
+from helpers.template_variables import TemplateVariables
 import config
 
+def run_presentation(updater, presentation_id, presentation_data):
+    """
+    Runs every update phase against one presentation
+    
+    Args:
+        updater (PresentationUpdater): Updater bound to the shared clients
+        presentation_id (str): The ID of the presentation
+        presentation_data (dict): Input JSON with a 'slides' list
+    
+    Returns:
+        dict: Counts of planned, applied and failed updates and the elapsed time
+    """
+    start = time.time()
+    tracer = get_tracer()
+    saved_before = updater.image_pipeline.generations_saved
+    variables = TemplateVariables(presentation_data.get('variables'))
+    
+    # Read the presentation once so updates that cannot apply are dropped before any writes
+    with tracer.span('phase.preflight', presentation=presentation_id):
+        index = updater.preflight(presentation_id, presentation_data['slides'])
+    
+    # Every phase queues its requests on the scheduler, which applies each one as soon
+    # as what it depends on exists: slides and text at once, an image once it is
+    # generated and its slide created, batching whatever is ready at the same time.
+    scheduler = PipelineScheduler(updater.execute_plan, presentation_id)
+    
+    # Phase 1: Create new slides, in order and with their text
+    with tracer.span('phase.new_slides', presentation=presentation_id):
+        new_slide_ids = updater.create_new_slides(
+            presentation_id,
+            presentation_data['slides'],
+            planner=scheduler,
+            index=index,
+            variables=variables
+        )
+    print(f"Planned {len(new_slide_ids)} new slides")
+    
+    # Phase 2: Update existing slides text, replacing template variables deck-wide
+    with tracer.span('phase.text', presentation=presentation_id):
+        queued_text_count, skipped_text_count = updater.update_existing_slides(
+            presentation_id,
+            presentation_data['slides'],
+            planner=scheduler,
+            index=index,
+            variables=variables
+        )
+    print(f"Planned {queued_text_count} existing text element updates")
+    
+    # Phase 3: Generate the images of existing and new slides while the slides and text are written
+    scheduler.start()
+    try:
+        with tracer.span('phase.images', presentation=presentation_id):
+            queued_image_count, skipped_image_count = updater.update_slide_images(
+                presentation_id,
+                presentation_data['slides'],
+                planner=scheduler,
+                index=index,
+                new_slide_ids=new_slide_ids
+            )
+    finally:
+        # Wait for the writes still queued or in flight
+        with tracer.span('phase.drain', presentation=presentation_id):
+            results = scheduler.close()
+    print(f"Planned {queued_image_count} image updates ({skipped_image_count} skipped)")
+    print(f"Applied {len(results['applied'])} updates in {results['calls']} API calls, "
+          f"{len(results['failed'])} failed")
+    if updater.image_pipeline.generations_saved > saved_before:
+        print(f"Saved {updater.image_pipeline.generations_saved - saved_before} image generations "
+              f"by reusing duplicate prompts")
+    
+    return {
+        'new_slides': len(new_slide_ids),
+        'text_queued': queued_text_count,
+        'images_queued': queued_image_count,
+        'skipped': skipped_text_count + skipped_image_count,
+        'generations_saved': updater.image_pipeline.generations_saved - saved_before,
+        'applied': len(results['applied']),
+        'failed': len(results['failed']),
+        'api_calls': results['calls'],
+        'seconds': round(time.time() - start, 2),
+    }
+
 def main():
-    # Read the JSON exported from Google Apps Script
-    with open(config.INPUT_FILE, "r") as f:
-        presentation_data = json.load(f)
+    parser = argparse.ArgumentParser(description='Update the presentation from the input JSON')
+    parser.add_argument('--workers', type=int,
+                      help='Number of images generated concurrently (default: config.IMAGE_WORKERS or 4)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always generate new images instead of reusing cached ones')
+    parser.add_argument('--variants', type=int,
+                      help='Images requested per Imagen call (1-4); placeholders sharing a prompt get '
+                           'distinct variants and unused ones are cached as spares')
+    parser.add_argument('--async-images', action='store_true',
+                      help='Generate images on one event loop; --workers then caps the generations in flight')
+    parser.add_argument('--full', action='store_true',
+                      help='Push every element, even if unchanged since the last run')
+    parser.add_argument('--copy', action='store_true',
+                      help='Copy the template and update the copy, leaving the template untouched')
+    parser.add_argument('--copy-name', help='Title of the copy (default: template ID and timestamp)')
+    parser.add_argument('--trace', help='Append a JSON-lines timing trace to this file')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                      help='Continue an interrupted run, skipping the work it completed')
+    parser.add_argument('--stream', action='store_true',
+                      help='Parse the input slide by slide (needs ijson) to keep memory flat on huge inputs')
+    args = parser.parse_args()
+    
+    # Read and validate the JSON exported from Google Apps Script before any API call
+    presentation_data = load_deck(config.INPUT_FILE, stream=args.stream)
+    
+    tracer = set_tracer(Tracer(args.trace))
+    journal = RunJournal(args.resume)
     
     # Initialize services
-    credentials = service_account.Credentials.from_service_account_file(
-        config.CREDENTIALS_FILE,
-        scopes=['https://www.googleapis.com/auth/presentations']
+    clients = get_clients()
+    image_handler = clients.image_handler(
+        cache=None if args.no_cache else ImageCache(),
+        seed=getattr(config, 'IMAGE_SEED', None),
+        asynchronous=args.async_images,
+        variants_per_call=args.variants
     )
-    slides_service = build('slides', 'v1', credentials=credentials)
     
-    # Initialize image handler
-    image_handler = ImageHandler(
-        genai_api_key=config.GENAI_API_KEY,
-        bucket_name=config.GCS_BUCKET_NAME,
-        project_id=config.PROJECT_ID
-    )
+    # Either update the template in place or a fresh copy of it
+    presentation_id = config.TEMPLATE_PRESENTATION_ID
+    if args.copy:
+        presentation_id = copy_presentation(
+            clients.drive_service,
+            presentation_id,
+            name=args.copy_name,
+            rate_limiter=get_rate_limiter(),
+            journal=journal
+        )
+    
+    # Only elements that changed since the last successful run are pushed
+    manifest = RunManifest()
+    if args.full:
+        manifest.reset(presentation_id)
     
     # Initialize updater
-    updater = PresentationUpdater(slides_service, image_handler)
+    updater = PresentationUpdater(clients.slides_service, image_handler, image_workers=args.workers,
+                                  manifest=manifest, journal=journal)
     
-    # Process the presentation in phases
     try:
-        # Phase 1: Create and populate new slides
-        new_slide_ids = updater.create_new_slides(
-            config.TEMPLATE_PRESENTATION_ID,
-            presentation_data['slides']
-        )
-        print(f"Created {len(new_slide_ids)} new slides")
-        
-        # Phase 2: Update existing slides text
-        updated_text_count = updater.update_existing_slides(
-            config.TEMPLATE_PRESENTATION_ID,
-            presentation_data['slides']
-        )
-        print(f"Updated {updated_text_count} existing text elements")
-        
-        # Phase 3: Update images
-        updated_image_count = updater.update_slide_images(
-            config.TEMPLATE_PRESENTATION_ID,
-            presentation_data['slides']
-        )
-        print(f"Updated {updated_image_count} images")
+        run_presentation(updater, presentation_id, presentation_data)
         
+        # Keep the image cache (and the bucket behind it) bounded
+        image_handler.prune_cache()
+    
     except Exception as e:
         print(f"Error updating presentation: {str(e)}")
         raise
+    
+    finally:
+        tracer.print_summary()
+        tracer.close()
+        journal.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Script to update many presentations in one run, sharing clients, image cache and rate limits
+example usage:
+python run_batch.py decks.json --decks 4 --report report.json
+
+The manifest is a JSON list of decks:
+[
+  {"input": "inputs/input1.json", "presentation_id": "1AbC..."},
+  {"input": "inputs/input2.json", "template_id": "1XyZ...", "name": "Campaign B"}
+]
+Decks with a template_id (or every deck, with --copy) are run against a fresh
+Drive copy of that presentation, so many decks can share one template.
+
+With --multi-deck the file is instead a JSON list of decks, each an input JSON
+with its presentation_id:
+[
+  {"presentation_id": "1AbC...", "slides": [...]},
+  {"presentation_id": "1XyZ...", "slides": [...], "variables": {...}}
+]
+Every deck is validated before any is run, then they are parsed one at a time
+(with --stream, slide by slide too), so memory stays flat however many there are.
+"""
+
+import json
+import argparse
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from helpers.clients import get_clients
+from helpers.slide_updater import PresentationUpdater
+from helpers.image_cache import ImageCache
+from helpers.run_manifest import RunManifest
+from helpers.rate_limiter import get_rate_limiter
+from helpers.presentation_copier import copy_presentation
+from helpers.instrumentation import Tracer, set_tracer
+from helpers.run_journal import RunJournal
+from helpers.deck_loader import DeckValidationError, check_decks, iter_decks, load_deck
+from main import run_presentation
+import config
+
+def load_batch_manifest(path):
+    """
+    Reads and checks the list of decks to process
+
+    Returns:
+        list: Dicts with 'input' and either 'presentation_id' or 'template_id'
+
+    Raises:
+        ValueError: If an entry is missing a field
+    """
+    with open(path, "r") as f:
+        decks = json.load(f)
+    for index, deck in enumerate(decks):
+        if 'input' not in deck or not ('presentation_id' in deck or 'template_id' in deck):
+            raise ValueError(f"Deck {index} in {path} needs 'input' and 'presentation_id' or 'template_id'")
+    return decks
+
+def check_deck_inputs(decks, stream=False):
+    """
+    Validates every deck's input JSON before any deck starts
+
+    Raises:
+        DeckValidationError: Listing the problems of every bad input
+    """
+    problems = []
+    for deck in decks:
+        try:
+            load_deck(deck['input'], stream=stream)
+        except DeckValidationError as e:
+            problems.extend(f"{deck['input']} {problem}" for problem in e.problems)
+        except OSError as e:
+            problems.append(f"{deck['input']}: {str(e)}")
+    if problems:
+        raise DeckValidationError('batch', problems)
+
+def check_multi_deck(path, stream=False):
+    """
+    Validates every deck of a multi-deck file before any deck starts
+
+    Returns:
+        list: presentation_id of every deck, in file order
+
+    Raises:
+        DeckValidationError: Listing the problems of every bad deck
+    """
+    presentation_ids = check_decks(path, stream=stream)
+    missing = [f"[{index}]: missing 'presentation_id'"
+               for index, presentation_id in enumerate(presentation_ids) if not presentation_id]
+    if missing:
+        raise DeckValidationError(path, missing)
+    return presentation_ids
+
+def multi_deck_entries(path, stream=False):
+    """
+    Yields a batch entry per deck of a multi-deck file, parsing each deck only when it is reached
+
+    Run check_multi_deck first: iter_decks stops at the first bad deck.
+    """
+    for index, deck in enumerate(iter_decks(path, stream=stream)):
+        yield {'input': f"{path}[{index}]", 'presentation_id': deck['presentation_id'], 'deck': deck}
+
+def run_deck(deck, slides_service, image_handler, manifest, image_workers, drive_service=None, copy=False,
+             journal=None, stream=False):
+    """
+    Runs one deck in isolation; failures are captured in the report instead of raised
+
+    Returns:
+        dict: Report row for the deck
+    """
+    template_id = deck.get('template_id') or (deck['presentation_id'] if copy else None)
+    report = {'input': deck['input'], 'presentation_id': deck.get('presentation_id')}
+    start = time.time()
+    try:
+        presentation_data = deck['deck'] if 'deck' in deck else load_deck(deck['input'], stream=stream)
+        
+        if template_id:
+            report['template_id'] = template_id
+            report['presentation_id'] = copy_presentation(
+                drive_service,
+                template_id,
+                name=deck.get('name'),
+                rate_limiter=get_rate_limiter(),
+                journal=journal,
+                copy_key=f"copy/{deck['input']}/{deck.get('name', '')}"
+            )
+
+        # Each deck gets its own updater; clients, cache and rate limiter are shared
+        updater = PresentationUpdater(
+            slides_service,
+            image_handler,
+            image_workers=image_workers,
+            rate_limiter=get_rate_limiter(),
+            manifest=manifest,
+            journal=journal
+        )
+        report.update(run_presentation(updater, report['presentation_id'], presentation_data))
+        report['status'] = 'ok' if not report['failed'] else 'partial'
+    except Exception as e:
+        print(f"Error updating {deck['input']}: {str(e)}")
+        traceback.print_exc()
+        report['status'] = 'failed'
+        report['error'] = str(e)
+    report['seconds'] = round(time.time() - start, 2)
+    return report
+
+def run_batch(decks, slides_service, image_handler, manifest, deck_workers=2, image_workers=None,
+              drive_service=None, copy=False, journal=None, stream=False):
+    """
+    Processes every deck across a thread pool
+
+    Args:
+        decks (iterable): Entries of the batch manifest, or multi_deck_entries
+        slides_service: Google Slides service instance shared by all decks
+        image_handler: ImageHandler shared by all decks
+        manifest (RunManifest): Run manifest shared by all decks (or None)
+        deck_workers (int): Decks processed at the same time
+        image_workers (int): Images generated concurrently per deck
+        drive_service: Google Drive service instance, needed to copy templates
+        copy (bool): Copy every deck's presentation before updating it
+        journal (RunJournal): Journal shared by all decks, for resuming the batch
+        stream (bool): Parse each deck's input slide by slide with ijson
+
+    Returns:
+        list: Report rows in manifest order
+    """
+    reports = {}
+    with ThreadPoolExecutor(max_workers=deck_workers) as executor:
+        futures = {}
+        for index, deck in enumerate(decks):
+            # Take the next deck only once a worker is free, so streamed decks are not all held at once
+            if len(futures) >= deck_workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    reports[futures.pop(future)] = future.result()
+            futures[executor.submit(run_deck, deck, slides_service, image_handler, manifest, image_workers,
+                                    drive_service, copy, journal, stream)] = index
+        for future in as_completed(futures):
+            reports[futures[future]] = future.result()
+    return [reports[index] for index in sorted(reports)]
+
+def print_batch_report(reports):
+    print("\nBatch Summary:")
+    print(f"{'status':<9}{'applied':>8}{'failed':>8}{'calls':>7}{'saved':>7}{'seconds':>9}  input -> presentation")
+    for report in reports:
+        print(f"{report['status']:<9}{report.get('applied', 0):>8}{report.get('failed', 0):>8}"
+              f"{report.get('api_calls', 0):>7}{report.get('generations_saved', 0):>7}{report['seconds']:>9}"
+              f"  {report['input']} -> {report['presentation_id']}")
+        if report.get('error'):
+            print(f"         error: {report['error']}")
+    failed = sum(1 for report in reports if report['status'] == 'failed')
+    print(f"{len(reports) - failed} of {len(reports)} decks completed")
+
+def main():
+    parser = argparse.ArgumentParser(description='Update many presentations from a batch manifest')
+    parser.add_argument('manifest', help='JSON list of {"input": ..., "presentation_id": ...}, '
+                                         'or of whole decks with --multi-deck')
+    parser.add_argument('--multi-deck', action='store_true',
+                      help='The manifest is a JSON list of input decks, each with its presentation_id')
+    parser.add_argument('--decks', type=int, default=2,
+                      help='Number of decks processed concurrently (default: 2)')
+    parser.add_argument('--workers', type=int,
+                      help='Number of images generated concurrently per deck (default: config.IMAGE_WORKERS or 4)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always generate new images instead of reusing cached ones')
+    parser.add_argument('--variants', type=int,
+                      help='Images requested per Imagen call (1-4); placeholders sharing a prompt get '
+                           'distinct variants and unused ones are cached as spares')
+    parser.add_argument('--async-images', action='store_true',
+                      help='Generate images on one event loop; --workers then caps the generations in flight')
+    parser.add_argument('--full', action='store_true',
+                      help='Push every element, even if unchanged since the last run')
+    parser.add_argument('--copy', action='store_true',
+                      help='Update a fresh copy of every presentation instead of the presentation itself')
+    parser.add_argument('--report', help='Write the per-deck report to this JSON file')
+    parser.add_argument('--trace', help='Append a JSON-lines timing trace to this file')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                      help='Continue an interrupted batch, skipping the work it completed')
+    parser.add_argument('--stream', action='store_true',
+                      help='Parse inputs slide by slide (needs ijson) to keep memory flat on huge decks')
+    args = parser.parse_args()
+
+    # A bad input anywhere fails the batch before any deck is touched
+    if args.multi_deck:
+        presentation_ids = check_multi_deck(args.manifest, stream=args.stream)
+        decks = multi_deck_entries(args.manifest, stream=args.stream)
+    else:
+        decks = load_batch_manifest(args.manifest)
+        check_deck_inputs(decks, stream=args.stream)
+        presentation_ids = [deck.get('presentation_id') for deck in decks]
+
+    tracer = set_tracer(Tracer(args.trace))
+    journal = RunJournal(args.resume)
+
+    # Authenticate once for the whole batch
+    clients = get_clients()
+    image_handler = clients.image_handler(
+        cache=None if args.no_cache else ImageCache(),
+        seed=getattr(config, 'IMAGE_SEED', None),
+        asynchronous=args.async_images,
+        variants_per_call=args.variants
+    )
+
+    manifest = RunManifest()
+    if args.full:
+        for presentation_id in presentation_ids:
+            if presentation_id:
+                manifest.reset(presentation_id)
+
+    reports = run_batch(decks, clients.slides_service, image_handler, manifest,
+                        deck_workers=args.decks, image_workers=args.workers,
+                        drive_service=clients.drive_service if args.copy else None, copy=args.copy, journal=journal,
+                        stream=args.stream)
+    journal.close()
+    image_handler.prune_cache()
+
+    print_batch_report(reports)
+    if image_handler.generations_shared:
+        print(f"{image_handler.generations_shared} image generations shared between decks")
+    tracer.print_summary()
+    tracer.close()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
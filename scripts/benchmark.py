@@ -0,0 +1,206 @@
+"""
+Benchmarks the full update pipeline against the offline fakes in helpers/fakes.py
+example usage:
+python scripts/benchmark.py --slides 100 500 1000
+"""
+
+import argparse
+import glob
+import json
+import random
+import time
+from helpers.fakes import FakeGenaiClient, FakeSlidesService, FakeStorageClient
+from helpers.image_handler import ImageHandler
+from helpers.async_image_handler import AsyncImageHandler
+from helpers.rate_limiter import RateLimiter
+from helpers.instrumentation import Tracer, set_tracer
+from helpers.slide_updater import PresentationUpdater
+from main import run_presentation
+
+# Real-world latencies (seconds) and quotas (requests per minute) of each backend
+SLIDES_LATENCY = 0.5
+IMAGEN_LATENCY = 8.0
+GCS_LATENCY = 0.3
+SLIDES_QUOTA = 60
+IMAGEN_QUOTA = 20
+GCS_QUOTA = 1000
+DRIVE_QUOTA = 60
+
+ASPECT_RATIOS = ['1:1', '4:3', '16:9', '3:4']
+
+
+def make_synthetic_deck(slide_count, seed=0):
+    """
+    Builds an input JSON shaped like inputs/*.json with slide_count slides
+
+    Every fourth slide is new; the rest exist in the template with two text
+    elements and two image placeholders. Some prompts repeat, as in real decks.
+
+    Returns:
+        dict: Presentation data with a 'slides' list
+    """
+    rng = random.Random(seed)
+    slides = []
+    for number in range(1, slide_count + 1):
+        if number % 4 == 0:
+            slides.append({
+                'slideNumber': number,
+                'exists': False,
+                'notes': f"Synthetic new slide {number}",
+                'layout': 'TITLE_AND_BODY',
+                'elements': {
+                    'TEXT': [
+                        {'placeholder': 'TITLE', 'text': f"Generated slide {number}"},
+                        {'placeholder': 'BODY', 'text': "• Point one\n• Point two\n• Point three"},
+                    ],
+                    'IMAGE': [],
+                },
+            })
+            continue
+        slides.append({
+            'slideNumber': number,
+            'exists': True,
+            'notes': f"Synthetic slide {number}",
+            'elements': {
+                'TEXT': [
+                    {'objectId': f"s{number}_t{index}", 'text': f"Slide {number} text {index}"}
+                    for index in range(2)
+                ],
+                'IMAGE': [
+                    {
+                        'objectId': f"s{number}_i{index}",
+                        'image_prompt': f"Storyboard frame {rng.randint(0, slide_count)} in warm light",
+                        'aspect_ratio': rng.choice(ASPECT_RATIOS),
+                        'isBackground': False,
+                    }
+                    for index in range(2)
+                ],
+            },
+        })
+    return {'slides': slides}
+
+
+def fill_missing_prompts(presentation_data):
+    """Gives every image without a prompt one, so sample decks exercise image generation."""
+    for slide in presentation_data['slides']:
+        for image_elem in slide.get('elements', {}).get('IMAGE', []):
+            if not image_elem.get('image_prompt'):
+                image_elem['image_prompt'] = f"Background art for slide {slide['slideNumber']}"
+    return presentation_data
+
+
+def run_benchmark(name, presentation_data, time_scale, workers, error_rate, asynchronous=False,
+                  variants_per_call=1):
+    """
+    Runs every update phase of main.py against fresh fakes
+
+    Args:
+        name (str): Label for the report
+        presentation_data (dict): Input JSON
+        time_scale (float): Multiplier applied to latencies (quotas scale inversely)
+        workers (int): Concurrent image generations
+        error_rate (float): Probability of a transient 503 on every fake call
+        asynchronous (bool): Generate images with AsyncImageHandler on one event loop
+        variants_per_call (int): Images requested per Imagen call
+
+    Returns:
+        dict: Wall time, API call counts and image throughput
+    """
+    slides_service = FakeSlidesService(latency=SLIDES_LATENCY * time_scale, error_rate=error_rate,
+                                       quota_per_minute=SLIDES_QUOTA / time_scale, seed=1)
+    genai_client = FakeGenaiClient(latency=IMAGEN_LATENCY * time_scale, error_rate=error_rate,
+                                   quota_per_minute=IMAGEN_QUOTA / time_scale, seed=2)
+    storage_client = FakeStorageClient(latency=GCS_LATENCY * time_scale, error_rate=error_rate,
+                                       quota_per_minute=GCS_QUOTA / time_scale, seed=3)
+    presentation_id = slides_service.add_presentation(f"bench-{name}", presentation_data['slides'])
+
+    # The fakes' Retry-After is already in scaled time; the limiter's own backoff is scaled here
+    rate_limiter = RateLimiter({
+        'slides': (SLIDES_QUOTA / time_scale, None),
+        'imagen': (IMAGEN_QUOTA / time_scale, None),
+        'gcs': (GCS_QUOTA / time_scale, None),
+        'drive': (DRIVE_QUOTA / time_scale, None),
+    }, backoff_scale=time_scale)
+    image_handler = (AsyncImageHandler if asynchronous else ImageHandler)(
+        genai_api_key=None,
+        bucket_name='benchmark-bucket',
+        project_id=None,
+        rate_limiter=rate_limiter,
+        client=genai_client,
+        storage_client=storage_client,
+        variants_per_call=variants_per_call
+    )
+    updater = PresentationUpdater(slides_service, image_handler, image_workers=workers,
+                                  rate_limiter=rate_limiter)
+
+    tracer = set_tracer(Tracer())
+    start = time.perf_counter()
+    results = run_presentation(updater, presentation_id, presentation_data)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'deck': name,
+        'slides': len(presentation_data['slides']),
+        'wall_time': elapsed,
+        'slides_calls': slides_service.call_count,
+        'imagen_calls': genai_client.call_count,
+        'gcs_calls': storage_client.call_count,
+        'images': genai_client.images_generated,
+        'images_per_sec': genai_client.images_generated / elapsed if elapsed else 0.0,
+        'applied': results['applied'],
+        'failed': results['failed'],
+        'generations_saved': results['generations_saved'],
+        'throttled': tracer.throttled_seconds(),
+        'timings': tracer.summary(),
+    }
+
+
+def print_report(rows, time_scale):
+    print(f"\nBenchmark results (latencies and quotas scaled by {time_scale}; "
+          f"divide wall time by {time_scale} for a real-world estimate)")
+    header = f"{'deck':<22}{'slides':>7}{'wall s':>9}{'slides':>8}{'imagen':>8}{'gcs':>7}{'images':>8}{'img/s':>8}{'throttle s':>11}{'failed':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['deck']:<22}{row['slides']:>7}{row['wall_time']:>9.2f}{row['slides_calls']:>8}"
+              f"{row['imagen_calls']:>8}{row['gcs_calls']:>7}{row['images']:>8}"
+              f"{row['images_per_sec']:>8.1f}{row['throttled']:>11.2f}{row['failed']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the update pipeline against offline fakes')
+    parser.add_argument('--inputs', nargs='*', default=sorted(glob.glob('inputs/*.json')),
+                      help='Sample input JSON files to benchmark (default: inputs/*.json)')
+    parser.add_argument('--slides', nargs='*', type=int, default=[100, 500, 1000],
+                      help='Sizes of synthetic decks to benchmark (default: 100 500 1000)')
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                      help='Multiplier for simulated latencies (default: 0.01)')
+    parser.add_argument('--workers', type=int, default=8,
+                      help='Number of images generated concurrently (default: 8)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                      help='Probability of a transient error on every fake call (default: 0)')
+    parser.add_argument('--variants', type=int, default=1,
+                      help='Images requested per Imagen call; duplicate prompts get distinct variants (default: 1)')
+    parser.add_argument('--async-images', action='store_true',
+                      help='Generate images on one event loop; --workers caps the generations in flight')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    decks = []
+    for path in args.inputs:
+        with open(path, "r") as f:
+            decks.append((path, fill_missing_prompts(json.load(f))))
+    for slide_count in args.slides:
+        decks.append((f"synthetic-{slide_count}", make_synthetic_deck(slide_count)))
+
+    rows = [run_benchmark(name, data, args.time_scale, args.workers, args.error_rate, args.async_images,
+                          args.variants)
+            for name, data in decks]
+    print_report(rows, args.time_scale)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
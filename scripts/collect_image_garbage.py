@@ -0,0 +1,56 @@
+"""
+Script to delete generated images that nothing references any more from the GCS bucket
+example usage:
+python scripts/collect_image_garbage.py --dry-run
+python scripts/collect_image_garbage.py --presentations 1AbC... 1XyZ... --grace-days 7
+
+Images still shown by a presentation, still reusable from the image cache or
+uploaded by a run that --resume may still apply (one left with pending or failed
+updates, or journaled within the grace period) are kept. Presentations
+scanned are the template, every presentation in the run manifest and any given
+with --presentations.
+"""
+
+import argparse
+from helpers.clients import get_clients
+from helpers.image_cache import ImageCache
+from helpers.image_gc import ImageGarbageCollector
+from helpers.rate_limiter import get_status_code
+from helpers.run_manifest import RunManifest
+import config
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete unreferenced generated images from GCS')
+    parser.add_argument('--presentations', nargs='*', default=[],
+                      help='More presentation IDs whose images must be kept')
+    parser.add_argument('--grace-days', type=float,
+                      help='Never delete images younger than this (default: config.IMAGE_GC_GRACE_DAYS or 2)')
+    parser.add_argument('--dry-run', action='store_true',
+                      help='Only list what would be deleted')
+    args = parser.parse_args()
+
+    clients = get_clients()
+    collector = ImageGarbageCollector(clients.storage_client, grace_days=args.grace_days)
+
+    presentation_ids = {config.TEMPLATE_PRESENTATION_ID, *RunManifest().presentations, *args.presentations}
+    for presentation_id in sorted(presentation_ids):
+        try:
+            count = collector.keep_presentation(clients.slides_service, presentation_id)
+            print(f"{presentation_id}: {count} images in use")
+        except Exception as e:
+            # A deleted presentation references nothing; any other failure leaves nothing safe to delete
+            if get_status_code(e) != 404:
+                raise
+            print(f"{presentation_id}: not found, skipped")
+    print(f"Image cache: {collector.keep_cache(ImageCache())} images kept")
+    print(f"Run journals: {collector.keep_journals()} images kept")
+
+    results = collector.collect(dry_run=args.dry_run)
+    verb = 'Would delete' if args.dry_run else 'Deleted'
+    for name in results['deleted']:
+        print(f"  {verb.lower()} {name}")
+    print(f"{verb} {len(results['deleted'])} images ({results['bytes'] / 1e6:.1f} MB), "
+          f"{len(results['failed'])} failed")
+
+if __name__ == "__main__":
+    main()
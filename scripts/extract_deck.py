@@ -0,0 +1,70 @@
+"""
+Script to export presentations to the input JSON, replacing the Apps Script export
+example usage:
+python scripts/extract_deck.py                                  # template -> config.INPUT_FILE
+python scripts/extract_deck.py 1AbC... --output inputs/deck.json --start 3 --end 20
+python scripts/extract_deck.py 1AbC... 1XyZ... --output-dir inputs --batch-manifest decks.json
+
+Each presentation is read with one presentations.get call. Image prompts are
+left empty for the prompt templates in docs/ to fill in.
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from helpers.clients import get_clients
+from helpers.deck_extractor import extract_deck
+from helpers.rate_limiter import get_rate_limiter
+import config
+
+def main():
+    parser = argparse.ArgumentParser(description='Export presentations to the input JSON format')
+    parser.add_argument('presentations', nargs='*', default=[config.TEMPLATE_PRESENTATION_ID],
+                      help='Presentation IDs (default: config.TEMPLATE_PRESENTATION_ID)')
+    parser.add_argument('--output', help='Output file for a single presentation (default: config.INPUT_FILE)')
+    parser.add_argument('--output-dir', help='Write <presentation ID>.json per presentation into this directory')
+    parser.add_argument('--batch-manifest', help='Also write a run_batch.py manifest of the exported decks')
+    parser.add_argument('--start', type=int, help='First slide number to export (default: 1)')
+    parser.add_argument('--end', type=int, help='Last slide number to export (default: the last slide)')
+    parser.add_argument('--include-size', action='store_true', help="Add each image's size in points")
+    parser.add_argument('--include-position', action='store_true',
+                      help="Add each image's position and order images by row, then column")
+    parser.add_argument('--workers', type=int, default=4,
+                      help='Presentations exported concurrently (default: 4)')
+    args = parser.parse_args()
+    if len(args.presentations) > 1 and not args.output_dir:
+        parser.error('--output-dir is needed to export several presentations')
+
+    slides_service = get_clients().slides_service
+    options = {
+        'start_slide': args.start,
+        'end_slide': args.end,
+        'include_size': args.include_size,
+        'include_position': args.include_position,
+    }
+
+    def export(presentation_id):
+        data = extract_deck(slides_service, presentation_id, rate_limiter=get_rate_limiter(), **options)
+        if args.output_dir:
+            path = os.path.join(args.output_dir, f"{presentation_id}.json")
+        else:
+            path = args.output or config.INPUT_FILE
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        images = sum(len(slide['elements']['IMAGE']) for slide in data['slides'])
+        print(f"{presentation_id}: {len(data['slides'])} slides, {images} images -> {path}")
+        return {'input': path, 'presentation_id': presentation_id}
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        decks = list(executor.map(export, args.presentations))
+
+    if args.batch_manifest:
+        with open(args.batch_manifest, "w") as f:
+            json.dump(decks, f, indent=2)
+        print(f"Batch manifest written to {args.batch_manifest}")
+
+if __name__ == "__main__":
+    main()
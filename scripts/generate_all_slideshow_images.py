@@ -2,16 +2,22 @@
 Script to only update images in an existing presentation
 """
 
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from helpers.image_handler import ImageHandler
+import argparse
+from helpers.clients import get_clients
+from helpers.image_cache import ImageCache
+from helpers.image_pipeline import ImageJob, pipeline_for
+from helpers.request_planner import RequestPlanner
+from helpers.rate_limiter import get_rate_limiter
+from helpers.run_journal import RunJournal
+from helpers.deck_loader import load_deck
 import config
 
-def update_presentation_images(presentation_id, slides_data, slides_service, image_handler):
-    """Updates only the images in the presentation."""
+def update_presentation_images(presentation_id, slides_data, slides_service, image_handler, image_workers=None,
+                               journal=None):
+    """Updates only the images in the presentation; with a journal, a resumed run skips completed work."""
     updated_count = 0
     skipped_count = 0
+    jobs = []
     
     print("\nStarting image updates...")
     for slide in slides_data:
@@ -28,39 +34,31 @@ def update_presentation_images(presentation_id, slides_data, slides_service, ima
                 skipped_count += 1
                 continue
                 
-            try:
-                # Generate new image from description
-                print(f"  Generating image for: {image_elem['image_prompt'][:50]}...")
-                image_url = image_handler.generate_and_store_image(
-                    image_elem['image_prompt'],
-                    aspect_ratio=image_elem.get('aspect_ratio', '1:1')
-                )
-                
-                if image_url:
-                    # Replace existing image
-                    replace_request = {
-                        'replaceImage': {
-                            'imageObjectId': image_elem['objectId'],
-                            'imageReplaceMethod': 'CENTER_CROP',
-                            'url': image_url
-                        }
-                    }
-                    
-                    slides_service.presentations().batchUpdate(
-                        presentationId=presentation_id,
-                        body={'requests': [replace_request]}
-                    ).execute()
-                    
-                    updated_count += 1
-                    print(f"  ✓ Successfully updated image {image_elem['objectId']}")
-                else:
-                    print(f"  ✗ Failed to generate image for {image_elem['objectId']}")
-                    skipped_count += 1
-                    
-            except Exception as e:
-                print(f"  ✗ Error updating image {image_elem['objectId']}: {str(e)}")
-                skipped_count += 1
-                continue
+            print(f"  Queued image for: {image_elem['image_prompt'][:50]}...")
+            jobs.append(ImageJob.from_element(image_elem['objectId'], image_elem))
+    
+    # Generate every image concurrently, then replace them all in one plan
+    image_urls = pipeline_for(image_handler, max_workers=image_workers).generate(
+        jobs, journal=journal, presentation_id=presentation_id)
+    planner = RequestPlanner()
+    for job in jobs:
+        if image_urls.get(job.key):
+            # Replace existing image
+            replace_request = {
+                'replaceImage': {
+                    'imageObjectId': job.key,
+                    'imageReplaceMethod': 'CENTER_CROP',
+                    'url': image_urls[job.key]
+                }
+            }
+            planner.add([replace_request], key=job.key, description=f"image {job.key}")
+        else:
+            print(f"  ✗ Failed to generate image for {job.key}")
+            skipped_count += 1
+    
+    results = planner.execute(slides_service, presentation_id, rate_limiter=get_rate_limiter(), journal=journal)
+    updated_count = len(results['applied'])
+    skipped_count += len(results['failed'])
     
     print(f"\nImage update summary:")
     print(f"  Updated: {updated_count}")
@@ -70,35 +68,46 @@ def update_presentation_images(presentation_id, slides_data, slides_service, ima
     return updated_count, skipped_count
 
 def main():
-    # Read the JSON exported from Google Apps Script
-    with open(config.INPUT_FILE, "r") as f:
-        presentation_data = json.load(f)
+    parser = argparse.ArgumentParser(description='Regenerate every image in the presentation')
+    parser.add_argument('--workers', type=int,
+                      help='Number of images generated concurrently (default: config.IMAGE_WORKERS or 4)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always generate new images instead of reusing cached ones')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                      help='Continue an interrupted run, skipping the work it completed')
+    args = parser.parse_args()
     
-    # Initialize services
-    credentials = service_account.Credentials.from_service_account_file(
-        config.CREDENTIALS_FILE,
-        scopes=['https://www.googleapis.com/auth/presentations']
-    )
-    slides_service = build('slides', 'v1', credentials=credentials)
+    # Read and validate the JSON exported from Google Apps Script
+    presentation_data = load_deck(config.INPUT_FILE)
     
-    # Initialize image handler
-    image_handler = ImageHandler(
-        genai_api_key=config.GENAI_API_KEY,
-        bucket_name=config.GCS_BUCKET_NAME,
-        project_id=config.PROJECT_ID
+    # Initialize services
+    clients = get_clients()
+    slides_service = clients.slides_service
+    image_handler = clients.image_handler(
+        cache=None if args.no_cache else ImageCache(),
+        seed=getattr(config, 'IMAGE_SEED', None)
     )
     
+    journal = RunJournal(args.resume)
     try:
         updated_count, skipped_count = update_presentation_images(
             config.TEMPLATE_PRESENTATION_ID,
             presentation_data['slides'],
             slides_service,
-            image_handler
+            image_handler,
+            image_workers=args.workers,
+            journal=journal
         )
         
+        # Keep the image cache (and the bucket behind it) bounded
+        image_handler.prune_cache()
+        
     except Exception as e:
         print(f"\nError updating presentation: {str(e)}")
         raise
+    
+    finally:
+        journal.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
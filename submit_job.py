@@ -0,0 +1,113 @@
+"""
+Submits an update job to the daemon (daemon.py) and streams its progress
+example usage:
+python submit_job.py inputs/input1.json                  # update the whole deck
+python submit_job.py inputs/input1.json --slides 7 12-14 # update only these slides
+python submit_job.py inputs/input1.json --presentation 1AbC... --images-only --detach
+python submit_job.py --status
+python submit_job.py --follow 20250101-120000-abc123
+"""
+
+import argparse
+import json
+import socket
+import sys
+from helpers.job_queue import socket_path
+
+
+def request(path, message):
+    """
+    Sends one request to the daemon
+
+    Yields:
+        dict: The daemon's replies, until it closes the connection
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall((json.dumps(message) + "\n").encode('utf-8'))
+        with connection.makefile('r', encoding='utf-8') as replies:
+            for line in replies:
+                yield json.loads(line)
+
+
+def print_status(jobs):
+    for job in jobs:
+        spec = job['spec']
+        selection = f" {' '.join(str(selector) for selector in spec['slides'])}" if spec.get('slides') else ''
+        print(f"{job['id']}  {job['state']:<7}  {spec['kind']}{selection}  {spec['input']} -> {spec['presentation_id']}"
+              + (f"  ({job['error']})" if job['error'] else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Submit an update job to the daemon and stream its progress')
+    parser.add_argument('input', nargs='?', help='Input JSON to apply')
+    parser.add_argument('--presentation', help='Presentation to update (default: config.TEMPLATE_PRESENTATION_ID)')
+    parser.add_argument('--slides', nargs='+', metavar='SELECTOR',
+                      help='Update only these slides, e.g. 7 12-14 layout=TITLE')
+    parser.add_argument('--images-only', action='store_true',
+                      help='Only regenerate the images of existing slides')
+    parser.add_argument('--full', action='store_true',
+                      help='Push every element, even if unchanged since the last run')
+    parser.add_argument('--detach', action='store_true',
+                      help='Return once the job is queued instead of streaming its progress')
+    parser.add_argument('--status', action='store_true', help='List the daemon\'s jobs')
+    parser.add_argument('--follow', metavar='JOB_ID', help='Stream the progress of a submitted job')
+    parser.add_argument('--socket', help='Daemon socket (default: .daemon/daemon.sock)')
+    args = parser.parse_args()
+
+    if args.status:
+        message = {'action': 'status'}
+    elif args.follow:
+        message = {'action': 'follow', 'job_id': args.follow}
+    elif args.input:
+        if args.images_only and args.slides:
+            parser.error("--images-only updates every slide; leave out --slides")
+        job = {'input': args.input, 'presentation_id': args.presentation, 'full': args.full}
+        if args.images_only:
+            job['kind'] = 'images'
+        elif args.slides:
+            job['kind'] = 'slides'
+            job['slides'] = [int(selector) if selector.isdigit() else selector for selector in args.slides]
+        message = {'action': 'submit', 'job': job, 'follow': not args.detach}
+    else:
+        parser.error("give an input JSON, --status or --follow")
+
+    path = args.socket or socket_path()
+    # Detached submissions end once queued; everything else ends with a finished, status or error reply
+    answered = False
+    try:
+        for reply in request(path, message):
+            event = reply.get('event')
+            if event == 'queued':
+                ahead = f", {reply['ahead']} ahead of it" if reply.get('ahead') else ''
+                print(f"Queued job {reply['job']['id']}{ahead}")
+                answered = not message.get('follow')
+            elif event == 'log':
+                sys.stdout.write(reply['text'])
+                sys.stdout.flush()
+            elif event == 'finished':
+                job = reply['job']
+                if job['state'] == 'failed':
+                    print(f"Job {job['id']} failed: {job['error']}")
+                    sys.exit(1)
+                if job['state'] != 'done':
+                    print(f"Job {job['id']} is still {job['state']}; the daemon stopped")
+                    sys.exit(1)
+                print(f"Job {job['id']} done")
+                answered = True
+            elif event == 'status':
+                print_status(reply['jobs'])
+                answered = True
+            elif event == 'error':
+                for problem in reply.get('problems') or [reply['message']]:
+                    print(problem, file=sys.stderr)
+                sys.exit(2)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No daemon is listening on {path}; start one with python daemon.py", file=sys.stderr)
+        sys.exit(2)
+    if not answered:
+        print(f"The daemon on {path} closed the connection before replying; see its output", file=sys.stderr)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Shared setup for the offline tests, which run against helpers/fakes.py instead of Google's APIs
+"""
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import config
+except ImportError:
+    # config.py holds each user's credentials and is not checked in; the fakes need none of them
+    config = types.ModuleType('config')
+    config.TEMPLATE_PRESENTATION_ID = 'template'
+    config.INPUT_FILE = 'inputs/input1.json'
+    config.GCS_BUCKET_NAME = 'test-bucket'
+    config.PROJECT_ID = 'test-project'
+    sys.modules['config'] = config
+
+import pytest
+
+from helpers import rate_limiter
+from helpers.fakes import FakeGenaiClient, FakeStorageClient
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter(monkeypatch):
+    """Gives each test a full shared rate limiter, so quota used by earlier tests does not slow it down."""
+    monkeypatch.setattr(rate_limiter, '_shared_limiter', rate_limiter.RateLimiter())
+
+
+class NoImages:
+    """Image handler whose every generation fails, for tests about the Slides writes."""
+
+    def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        return None
+
+
+def fake_image_handler(asynchronous=False, genai=None, storage=None, **kwargs):
+    """An ImageHandler (or AsyncImageHandler) on the fake genai and GCS clients."""
+    if asynchronous:
+        from helpers.async_image_handler import AsyncImageHandler as handler_class
+    else:
+        from helpers.image_handler import ImageHandler as handler_class
+    return handler_class(None, 'bucket', None, client=genai or FakeGenaiClient(),
+                         storage_client=storage or FakeStorageClient(), **kwargs)
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+
+pytest.importorskip('google.genai')
+pytest.importorskip('google.cloud.storage')
+
+from helpers.async_image_handler import AsyncImageHandler
+from helpers.fakes import FakeGenaiClient, FakeStorageClient
+from helpers.image_cache import ImageCache
+from helpers.image_pipeline import AsyncImagePipeline, ImageJob
+
+
+def test_identical_concurrent_requests_share_one_url(tmp_path):
+    genai = FakeGenaiClient(latency=0.05)
+    handler = AsyncImageHandler(None, 'bucket', None, cache=ImageCache(str(tmp_path / 'cache.json')),
+                                client=genai, storage_client=FakeStorageClient())
+
+    async def generate_twice():
+        return await asyncio.gather(
+            handler.generate_and_store_image('a red fox', '16:9'),
+            handler.generate_and_store_image('a red fox', '16:9'),
+        )
+
+    first, second = asyncio.run(generate_twice())
+    assert isinstance(first, str) and first.startswith('https://')
+    assert second == first
+    assert genai.images_generated == 1
+    assert handler.generations_shared == 1
+
+
+def test_duplicate_prompts_get_distinct_variants_from_one_call(tmp_path):
+    genai = FakeGenaiClient()
+    handler = AsyncImageHandler(None, 'bucket', None, cache=ImageCache(str(tmp_path / 'cache.json')),
+                                client=genai, storage_client=FakeStorageClient(), variants_per_call=2)
+    pipeline = AsyncImagePipeline(handler)
+
+    urls = pipeline.generate([ImageJob('left', 'a red fox'), ImageJob('right', 'a red fox')])
+
+    assert all(isinstance(url, str) and url.startswith('https://') for url in urls.values())
+    assert urls['left'] != urls['right']
+    assert genai.calls == {'generate_images': 1}
@@ -0,0 +1,11 @@
+from helpers.rate_limiter import BASE_BACKOFF_SECONDS, MAX_RETRIES
+from scripts.benchmark import make_synthetic_deck, run_benchmark
+
+
+def test_backoff_is_scaled_with_the_simulated_latencies():
+    time_scale = 0.001
+    row = run_benchmark('errors', make_synthetic_deck(12), time_scale=time_scale, workers=4, error_rate=0.3)
+
+    backoff = row['timings']['ratelimit.backoff']
+    assert backoff['count'] > 0
+    assert backoff['max'] <= BASE_BACKOFF_SECONDS * 2 ** MAX_RETRIES * time_scale
@@ -0,0 +1,43 @@
+import json
+import pytest
+
+import config
+from helpers.clients import DRIVE_SCOPES, GoogleClients
+
+
+def test_genai_client_needs_no_service_account(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'GENAI_API_KEY', 'test-key', raising=False)
+    clients = GoogleClients(credentials_file=str(tmp_path / 'missing.json'))
+
+    assert clients.genai_client is clients.genai_client
+    assert 'credentials' not in clients._clients
+
+    # The service account is only read once a Google Cloud client needs it
+    with pytest.raises(FileNotFoundError):
+        clients.storage_client
+
+
+def service_account_file(tmp_path):
+    rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+    serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = tmp_path / 'service_account.json'
+    path.write_text(json.dumps({
+        'type': 'service_account',
+        'client_email': 'slides@test-project.iam.gserviceaccount.com',
+        'private_key': key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                         serialization.NoEncryption()).decode('ascii'),
+        'private_key_id': 'key',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+    }))
+    return str(path)
+
+
+def test_only_the_drive_client_asks_for_drive_access(tmp_path):
+    clients = GoogleClients(credentials_file=service_account_file(tmp_path))
+
+    assert not set(DRIVE_SCOPES) & set(clients.credentials.scopes)
+    assert not set(DRIVE_SCOPES) & set(clients.session.credentials.scopes)
+    drive_credentials = clients.drive_service._http.session.credentials
+    assert set(DRIVE_SCOPES) <= set(drive_credentials.scopes)
+    assert clients.session is not clients.drive_service._http.session
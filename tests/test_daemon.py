@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import types
+import pytest
+
+pytest.importorskip('googleapiclient')
+pytest.importorskip('google.genai')
+pytest.importorskip('google.cloud.storage')
+
+import config
+import daemon
+import submit_job
+from conftest import fake_image_handler
+from helpers.fakes import FakeSlidesService
+from helpers.instrumentation import Tracer, set_tracer
+from helpers.job_queue import JobQueue
+from helpers.run_manifest import RunManifest
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'input1.json')
+
+
+@pytest.fixture
+def running_daemon(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'JOURNAL_DIR', str(tmp_path / 'journal'), raising=False)
+    with open(INPUT, "r") as f:
+        slides = json.load(f)['slides']
+    service = FakeSlidesService()
+    service.add_presentation('deck', slides)
+    image_handler = fake_image_handler()
+    update_daemon = daemon.UpdateDaemon(
+        JobQueue(str(tmp_path / 'jobs')),
+        types.SimpleNamespace(slides_service=service),
+        image_handler,
+        RunManifest(str(tmp_path / 'manifest.json')),
+        job_workers=1
+    )
+    # Unix socket paths are limited to about 100 characters
+    socket_dir = tempfile.mkdtemp()
+    path = os.path.join(socket_dir, 'daemon.sock')
+    server = daemon.JobServer(path, update_daemon)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path, update_daemon, str(tmp_path / 'spool')
+    update_daemon.shutdown()
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(socket_dir)
+
+
+def test_job_streams_its_output_and_finishes(running_daemon):
+    path, update_daemon, spool = running_daemon
+    # Started in the test: pytest replaces sys.stdout between setup and the test itself
+    update_daemon.start(spool)
+    replies = list(submit_job.request(path, {
+        'action': 'submit', 'job': {'input': INPUT, 'presentation_id': 'deck', 'slides': [2]}, 'follow': True
+    }))
+    assert replies[0]['event'] == 'queued'
+    assert any(reply['event'] == 'log' for reply in replies)
+    assert replies[-1]['event'] == 'finished'
+    assert replies[-1]['job']['state'] == 'done'
+
+
+def test_job_log_and_trace_include_its_helper_threads(running_daemon):
+    path, update_daemon, spool = running_daemon
+    daemon_tracer = set_tracer(Tracer())
+    update_daemon.start(spool)
+    replies = list(submit_job.request(path, {
+        'action': 'submit', 'job': {'input': INPUT, 'presentation_id': 'deck'}, 'follow': True
+    }))
+    log = ''.join(reply['text'] for reply in replies if reply['event'] == 'log')
+    assert replies[-1]['job']['state'] == 'done'
+    # Printed and traced by the Slides writer thread, which the job started
+    assert 'planned updates in' in log
+    assert 'slides.batchUpdate' in log
+    assert not daemon_tracer.events
+
+
+def test_selection_matching_nothing_is_rejected(running_daemon):
+    path, update_daemon, _ = running_daemon
+    replies = list(submit_job.request(path, {
+        'action': 'submit', 'job': {'input': INPUT, 'presentation_id': 'deck', 'slides': [999]}
+    }))
+    assert replies == [{'event': 'error', 'message': 'No slides match 999'}]
+    assert not update_daemon.queue.jobs
+
+
+def test_unexpected_errors_are_answered(running_daemon, monkeypatch):
+    path, update_daemon, _ = running_daemon
+
+    def broken(spec):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(update_daemon, 'submit', broken)
+    replies = list(submit_job.request(path, {'action': 'submit', 'job': {'input': INPUT}}))
+    assert replies[-1]['event'] == 'error'
+    assert 'boom' in replies[-1]['message']
+
+
+ASYNC_SLIDES = [
+    {'slideNumber': 1, 'exists': True, 'elements': {'IMAGE': [{'objectId': 'photo', 'image_prompt': 'a red fox'}]}},
+    {'slideNumber': 2, 'exists': True, 'elements': {
+        'TEXT': [{'objectId': 'title', 'text': 'Pool party'}],
+        'IMAGE': [{'objectId': 'banner', 'image_prompt': 'a pool', 'aspect_ratio': '16:9'}],
+    }},
+]
+
+
+@pytest.mark.parametrize('spec', [
+    {'slides': ['1-2']},
+    {'kind': 'images'},
+    {'kind': 'deck'},
+])
+def test_jobs_generate_on_an_async_image_handler(running_daemon, tmp_path, spec):
+    _, update_daemon, _ = running_daemon
+    path = tmp_path / 'async.json'
+    path.write_text(json.dumps({'slides': ASYNC_SLIDES}))
+    service = update_daemon.clients.slides_service
+    service.add_presentation('async', ASYNC_SLIDES)
+    update_daemon.image_handler = fake_image_handler(asynchronous=True)
+    job = update_daemon.submit(dict(spec, input=str(path), presentation_id='async'))
+
+    update_daemon.run_job(job)
+
+    objects = service.decks['async']['objects']
+    assert objects['photo']['url'].startswith('https://')
+    assert objects['banner']['url'].startswith('https://')
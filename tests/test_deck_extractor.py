@@ -0,0 +1,41 @@
+import pytest
+
+from helpers.deck_extractor import extract_deck
+from helpers.fakes import FakeSlidesService
+
+
+@pytest.fixture
+def slides():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', [
+        {'slideNumber': number, 'exists': True, 'elements': {'TEXT': [{'objectId': f't{number}', 'text': str(number)}]}}
+        for number in (1, 2, 3)
+    ])
+    return slides
+
+
+@pytest.mark.parametrize('start, end, numbers', [
+    (None, None, [1, 2, 3]),
+    (2, None, [2, 3]),
+    (None, 2, [1, 2]),
+    (3, 1, [1, 2, 3]),
+    (0, 2, [1, 2]),
+    (-4, 1, [1]),
+    (2, 10, [2, 3]),
+    # Swapped to 3-10, then clamped to the deck
+    (10, None, [3]),
+    (10, 12, []),
+    (12, 10, []),
+])
+def test_slide_range_is_swapped_then_clamped(slides, start, end, numbers):
+    data = extract_deck(slides, 'deck', start_slide=start, end_slide=end)
+
+    assert [slide['slideNumber'] for slide in data['slides']] == numbers
+    assert [slide['elements']['TEXT'][0]['text'] for slide in data['slides']] == [str(number) for number in numbers]
+
+
+def test_empty_deck_exports_no_slides():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck')
+
+    assert extract_deck(slides, 'deck', start_slide=2, end_slide=5) == {'slides': []}
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import NoImages
+from helpers.fakes import FakeHttpError, FakeSlidesService
+from helpers.presentation_index import PresentationIndex
+from helpers.slide_updater import PresentationUpdater
+
+SLIDES = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+    {'objectId': 'title', 'text': '🎉 Pool party at noon 🎉'},
+]}}]
+
+
+def edit(slides, *requests):
+    slides.batchUpdate(presentationId='deck', body={'requests': list(requests)}).execute()
+    return slides.decks['deck']['objects']['title']['text']
+
+
+def test_text_indexes_count_utf16_code_units():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', SLIDES)
+
+    # The emoji takes up indexes 0 and 1, so "Pool" starts at 3
+    text = edit(slides, {'deleteText': {'objectId': 'title',
+                                        'textRange': {'type': 'FIXED_RANGE', 'startIndex': 3, 'endIndex': 7}}},
+                {'insertText': {'objectId': 'title', 'insertionIndex': 3, 'text': 'Beach'}})
+    assert text == '🎉 Beach party at noon 🎉'
+
+    text = edit(slides, {'deleteText': {'objectId': 'title', 'textRange': {'type': 'FROM_START_INDEX',
+                                                                          'startIndex': 23}}})
+    assert text == '🎉 Beach party at noon '
+
+    rendered = slides.get(presentationId='deck').execute()
+    title = next(element for element in rendered['slides'][0]['pageElements'] if element['objectId'] == 'title')
+    assert title['shape']['text']['textElements'][0]['endIndex'] == 24
+
+
+@pytest.mark.parametrize('request_body', [
+    {'insertText': {'objectId': 'title', 'insertionIndex': 1, 'text': 'x'}},
+    {'deleteText': {'objectId': 'title', 'textRange': {'type': 'FIXED_RANGE', 'startIndex': 0, 'endIndex': 1}}},
+    {'insertText': {'objectId': 'title', 'insertionIndex': 26, 'text': 'x'}},
+])
+def test_indexes_inside_a_character_or_past_the_end_are_rejected(request_body):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', SLIDES)
+
+    with pytest.raises(FakeHttpError) as error:
+        edit(slides, request_body)
+    assert error.value.code == 400
+    assert slides.decks['deck']['objects']['title']['text'] == SLIDES[0]['elements']['TEXT'][0]['text']
+
+
+def test_minimal_text_edits_around_emoji_apply_end_to_end():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', SLIDES)
+    updater = PresentationUpdater(slides, NoImages())
+    wanted = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'title', 'text': '🎉 Pool party at 🌞 one 🎉'},
+    ]}}]
+
+    index = PresentationIndex.fetch(slides, 'deck')
+    updated, skipped = updater.update_existing_slides('deck', wanted, index=index)
+
+    assert (updated, skipped) == (1, 0)
+    assert slides.decks['deck']['objects']['title']['text'] == '🎉 Pool party at 🌞 one 🎉'
@@ -0,0 +1,72 @@
+import types
+
+from conftest import fake_image_handler
+from helpers import image_cache
+from helpers.fakes import FakeGenaiClient, FakeStorageClient
+from helpers.image_cache import ImageCache
+
+DAY = 86400
+
+
+def clock(monkeypatch, start=1_000_000.0):
+    """Replaces the cache's clock; returns a list whose first item is the current time."""
+    now = [start]
+    monkeypatch.setattr(image_cache, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def put(cache, key):
+    cache.put(key, f'https://example.com/{key}.png', f'slides/{key}.png')
+
+
+def test_the_least_recently_used_entries_are_evicted_above_max_entries(tmp_path, monkeypatch):
+    now = clock(monkeypatch)
+    cache = ImageCache(str(tmp_path / 'index.json'), max_entries=2)
+    for key in ('old', 'used', 'new'):
+        put(cache, key)
+        now[0] += 1
+    assert cache.get('used')
+
+    evicted = cache.evict()
+    assert [entry['object_name'] for entry in evicted] == ['slides/old.png']
+    assert cache.object_names() == {'slides/used.png', 'slides/new.png'}
+
+
+def test_entries_older_than_max_age_are_missed_and_evicted(tmp_path, monkeypatch):
+    now = clock(monkeypatch)
+    cache = ImageCache(str(tmp_path / 'index.json'), max_age_days=30)
+    put(cache, 'stale')
+    now[0] += 20 * DAY
+    put(cache, 'fresh')
+    now[0] += 11 * DAY
+
+    assert cache.get('stale') is None and cache.get('fresh')
+    assert [entry['object_name'] for entry in cache.evict()] == ['slides/stale.png']
+    assert cache.object_names() == {'slides/fresh.png'}
+
+
+def test_the_index_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'index.json')
+    cache = ImageCache(path)
+    put(cache, 'fox')
+    assert ImageCache(path).get('fox') == 'https://example.com/fox.png'
+
+    (tmp_path / 'broken.json').write_text('{"fox": ')
+    assert ImageCache(str(tmp_path / 'broken.json')).entries == {}
+    assert not (tmp_path / 'index.json.tmp').exists()
+
+
+def test_a_restarted_handler_reuses_the_cached_image_and_prunes_it_from_gcs(tmp_path, monkeypatch):
+    now = clock(monkeypatch)
+    path = str(tmp_path / 'index.json')
+    genai, storage = FakeGenaiClient(), FakeStorageClient()
+    handler = fake_image_handler(genai=genai, storage=storage, cache=ImageCache(path, max_age_days=30))
+    url = handler.generate_and_store_image('a red fox')
+
+    restarted = fake_image_handler(genai=genai, storage=storage, cache=ImageCache(path, max_age_days=30))
+    assert restarted.generate_and_store_image('a red fox') == url
+    assert genai.calls['generate_images'] == 1
+
+    now[0] += 31 * DAY
+    assert restarted.prune_cache() == 1
+    assert handler.bucket.objects == {}
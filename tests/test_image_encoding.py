@@ -0,0 +1,43 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from conftest import fake_image_handler
+from helpers.fakes import FakeGenaiClient, FakeStorageClient, make_png
+
+
+def dimensions(image_bytes):
+    with Image.open(BytesIO(image_bytes)) as image:
+        return image.format, image.size
+
+
+def test_images_are_downscaled_to_cover_their_placeholder_but_never_upscaled():
+    handler = fake_image_handler()
+    png = make_png(400, 200)
+
+    assert dimensions(handler._encode_image(png, (100, 100))[0]) == ('PNG', (200, 100))
+    assert dimensions(handler._encode_image(png, (150, 25))[0]) == ('PNG', (150, 75))
+    assert dimensions(handler._encode_image(png, (800, 800))[0]) == ('PNG', (400, 200))
+    assert handler._encode_image(png) == (png, 'image/png')
+
+
+def test_jpeg_images_are_re_encoded_and_uploaded_as_jpeg():
+    storage = FakeStorageClient()
+    handler = fake_image_handler(genai=FakeGenaiClient(image_scale=0.25), storage=storage,
+                                 image_format='JPEG', quality=70)
+    url = handler.generate_and_store_image('a red fox', target_size=(100, 100))
+
+    assert url.endswith('.jpeg')
+    stored = storage.buckets['bucket'].objects[url.split('/bucket/')[1]]
+    assert stored['content_type'] == 'image/jpeg'
+    assert dimensions(stored['data']) == ('JPEG', (100, 100))
+
+    png = fake_image_handler(genai=FakeGenaiClient(image_scale=0.25), storage=storage)
+    png_url = png.generate_and_store_image('a red fox', target_size=(100, 100))
+    assert len(stored['data']) < len(storage.buckets['bucket'].objects[png_url.split('/bucket/')[1]]['data'])
+
+
+def test_formats_slides_cannot_display_are_rejected():
+    with pytest.raises(ValueError):
+        fake_image_handler(image_format='webp')
@@ -0,0 +1,112 @@
+import time
+
+from helpers.fakes import FakeSlidesService, FakeStorageClient
+from helpers.image_cache import ImageCache
+from helpers.image_gc import ImageGarbageCollector, install_lifecycle_rule
+from helpers.rate_limiter import RateLimiter
+from helpers.run_journal import RunJournal
+
+BUCKET = 'bucket'
+URL = f"https://storage.googleapis.com/{BUCKET}/"
+LATER = time.time() + 30 * 86400
+
+
+def stored(storage, *names):
+    bucket = storage.bucket(BUCKET)
+    for name in names:
+        bucket.blob(name).upload_from_string(b'png')
+    return bucket
+
+
+def collector(storage):
+    return ImageGarbageCollector(storage, BUCKET, prefix='slides/', grace_days=2,
+                                 rate_limiter=RateLimiter(limits={'slides': (6000, None), 'gcs': (6000, None)}))
+
+
+def test_only_unreferenced_images_are_deleted(tmp_path):
+    storage = FakeStorageClient()
+    bucket = stored(storage, 'slides/', 'slides/shown.png', 'slides/cached.png', 'slides/journaled.png',
+                    'slides/orphan.png', 'other/kept.png')
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', [{'slideNumber': 1, 'exists': True,
+                                      'elements': {'IMAGE': [{'objectId': 'photo'}]}}])
+    slides.batchUpdate(presentationId='deck', body={'requests': [
+        {'replaceImage': {'imageObjectId': 'photo', 'url': URL + 'slides/shown.png?v=1'}}
+    ]}).execute()
+    cache = ImageCache(str(tmp_path / 'cache.json'))
+    cache.put('key', URL + 'slides/cached.png', 'slides/cached.png')
+    journal = RunJournal(directory=str(tmp_path / 'journal'))
+    journal.record('deck', 'photo', 'uploaded', url=URL + 'slides/journaled.png')
+    journal.close()
+
+    gc = collector(storage)
+    assert gc.keep_presentation(slides, 'deck') == 1
+    assert gc.keep_cache(cache) == 1
+    assert gc.keep_journals(str(tmp_path / 'journal')) == 1
+    assert gc.keep_urls(['https://example.com/slides/orphan.png']) == 0
+    results = gc.collect(now=LATER)
+
+    assert results['deleted'] == ['slides/orphan.png']
+    assert results['bytes'] == 3
+    assert sorted(bucket.objects) == ['other/kept.png', 'slides/', 'slides/cached.png', 'slides/journaled.png',
+                                      'slides/shown.png']
+
+
+def test_images_of_finished_runs_are_collected_once_replaced(tmp_path):
+    storage = FakeStorageClient()
+    bucket = stored(storage, 'slides/first.png', 'slides/second.png', 'slides/interrupted.png')
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', [{'slideNumber': 1, 'exists': True,
+                                      'elements': {'IMAGE': [{'objectId': 'photo'}]}}])
+    directory = str(tmp_path / 'journal')
+    for name, states in (('first', ['pending', 'applied']), ('second', ['pending', 'applied']),
+                         ('interrupted', ['pending'])):
+        journal = RunJournal(directory=directory)
+        journal.record_image('deck', 'photo', URL + f'slides/{name}.png')
+        for state in states:
+            journal.record('deck', 'photo', state)
+        journal.close()
+    slides.batchUpdate(presentationId='deck', body={'requests': [
+        {'replaceImage': {'imageObjectId': 'photo', 'url': URL + 'slides/second.png'}}
+    ]}).execute()
+
+    gc = collector(storage)
+    gc.keep_presentation(slides, 'deck')
+    # Only the interrupted run can still be resumed once the grace period is over
+    assert gc.keep_journals(directory, now=LATER) == 1
+    results = gc.collect(now=LATER)
+
+    assert results['deleted'] == ['slides/first.png']
+    assert sorted(bucket.objects) == ['slides/interrupted.png', 'slides/second.png']
+
+
+def test_images_within_the_grace_period_are_kept():
+    storage = FakeStorageClient()
+    bucket = stored(storage, 'slides/old.png', 'slides/new.png')
+    bucket.objects['slides/old.png']['time_created'] = time.time() - 3 * 86400
+
+    results = collector(storage).collect()
+
+    assert results['deleted'] == ['slides/old.png']
+    assert list(bucket.objects) == ['slides/new.png']
+
+
+def test_dry_run_deletes_nothing():
+    storage = FakeStorageClient()
+    bucket = stored(storage, 'slides/orphan.png')
+
+    results = collector(storage).collect(dry_run=True, now=LATER)
+
+    assert results['deleted'] == ['slides/orphan.png']
+    assert list(bucket.objects) == ['slides/orphan.png']
+
+
+def test_lifecycle_rule_replaces_the_previous_one():
+    storage = FakeStorageClient()
+    bucket = storage.bucket(BUCKET)
+    install_lifecycle_rule(bucket, age_days=30, prefix='slides/')
+    install_lifecycle_rule(bucket, age_days=91, prefix='slides/')
+
+    assert bucket.lifecycle_rules == [
+        {'action': {'type': 'Delete'}, 'condition': {'age': 91, 'matchesPrefix': ['slides/']}}
+    ]
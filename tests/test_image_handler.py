@@ -0,0 +1,62 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import fake_image_handler
+from helpers.fakes import FakeGenaiClient, FakeHttpError
+
+
+class GatedGenaiClient(FakeGenaiClient):
+    """Holds every generation until the test opens the gate; fails them all if told to."""
+
+    def __init__(self, fail=False):
+        super().__init__()
+        self.gate = threading.Event()
+        self.fail = fail
+
+    def generate_images(self, model, prompt, config=None):
+        self.gate.wait(5)
+        if self.fail:
+            self._call('generate_images')
+            raise FakeHttpError(400, "Prompt rejected")
+        return super().generate_images(model, prompt, config)
+
+
+def generate_concurrently(handler, genai, requests, waiting):
+    """Runs the requests on their own threads and opens the gate once waiting of them share a generation."""
+    with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        futures = [executor.submit(handler.generate_and_store_image, *request) for request in requests]
+        deadline = time.monotonic() + 5
+        while handler.generations_shared < waiting and time.monotonic() < deadline:
+            time.sleep(0.01)
+        genai.gate.set()
+        return [future.result() for future in futures]
+
+
+def test_concurrent_identical_requests_share_one_generation():
+    genai = GatedGenaiClient()
+    handler = fake_image_handler(genai=genai)
+
+    urls = generate_concurrently(handler, genai, [('a red fox', '16:9', (400, 300))] * 4 + [('a red fox', '16:9')],
+                                 waiting=3)
+
+    assert len(set(urls[:4])) == 1 and urls[4] != urls[0] and all(urls)
+    assert handler.generations_shared == 3
+    assert genai.calls['generate_images'] == 2
+    assert handler._in_flight == {}
+
+    # Without a cache, a request after the shared one finished generates again
+    assert handler.generate_and_store_image('a red fox', '16:9', (400, 300)) not in urls
+    assert handler.generations_shared == 3
+
+
+def test_requests_sharing_a_failed_generation_all_fail_and_the_next_one_retries():
+    genai = GatedGenaiClient(fail=True)
+    handler = fake_image_handler(genai=genai)
+
+    assert generate_concurrently(handler, genai, [('a red fox',)] * 3, waiting=2) == [None] * 3
+    assert handler.generations_shared == 2 and genai.calls['generate_images'] == 1
+    assert handler._in_flight == {}
+
+    genai.fail = False
+    assert handler.generate_and_store_image('a red fox')
@@ -0,0 +1,78 @@
+import threading
+
+from conftest import fake_image_handler
+from helpers.fakes import FakeGenaiClient
+from helpers.image_pipeline import AsyncImagePipeline, ImageJob, ImagePipeline, pipeline_for
+
+
+class RecordingImages:
+    """Image handler recording each generation; prompts in failing raise."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        with self._lock:
+            self.calls.append((prompt, aspect_ratio, target_size))
+        if prompt in self.failing:
+            raise RuntimeError(f"cannot draw {prompt}")
+        return f"https://example.com/{prompt.replace(' ', '_')}_{aspect_ratio}.png"
+
+
+class AsyncRecordingImages(RecordingImages):
+    async def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        return RecordingImages.generate_and_store_image(self, prompt, aspect_ratio, target_size, variant)
+
+
+def test_placeholders_with_the_same_prompt_share_one_generation_sized_for_the_largest():
+    images = RecordingImages()
+    pipeline = ImagePipeline(images, max_workers=2)
+    urls = pipeline.generate([
+        ImageJob('a', 'a red fox', target_size=(400, 300)),
+        ImageJob('b', 'a red fox', target_size=(200, 600)),
+        ImageJob('c', 'a red fox', aspect_ratio='16:9', target_size=(800, 450)),
+        ImageJob('d', 'a pool'),
+    ])
+
+    assert sorted(images.calls, key=str) == sorted([
+        ('a red fox', '1:1', (400, 600)),
+        ('a red fox', '16:9', (800, 450)),
+        ('a pool', '1:1', None),
+    ], key=str)
+    assert urls['a'] == urls['b'] != urls['c']
+    assert pipeline.generations_saved == 1
+
+
+def test_a_failing_prompt_only_fails_its_own_placeholders():
+    images = RecordingImages(failing={'a pool'})
+    ready = []
+    urls = ImagePipeline(images).generate([
+        ImageJob('fox', 'a red fox'),
+        ImageJob('pool', 'a pool'),
+        ImageJob('pool_again', 'a pool'),
+    ], on_ready=ready.append)
+
+    assert urls['fox'] and urls['pool'] is None and urls['pool_again'] is None
+    assert sorted(ready, key=len) == [{'fox': urls['fox']}, {'pool': None, 'pool_again': None}]
+
+
+def test_the_async_pipeline_groups_and_isolates_failures_the_same_way():
+    images = AsyncRecordingImages(failing={'a pool'})
+    pipeline = pipeline_for(images)
+    assert isinstance(pipeline, AsyncImagePipeline)
+
+    urls = pipeline.generate([ImageJob('a', 'a red fox'), ImageJob('b', 'a red fox'), ImageJob('c', 'a pool')])
+    assert urls['a'] == urls['b'] and urls['c'] is None
+    assert len(images.calls) == 2 and pipeline.generations_saved == 1
+
+
+def test_distinct_variants_of_a_prompt_come_from_one_call():
+    genai = FakeGenaiClient()
+    pipeline = ImagePipeline(fake_image_handler(genai=genai, variants_per_call=4))
+    urls = pipeline.generate([ImageJob(key, 'a red fox') for key in 'abc'])
+
+    assert len(set(urls.values())) == 3 and all(urls.values())
+    assert genai.calls['generate_images'] == 1
+    assert pipeline.generations_saved == 0
@@ -0,0 +1,50 @@
+import json
+import threading
+
+import pytest
+
+from helpers.instrumentation import Tracer, get_tracer, in_context, percentile, reset_tracer, use_tracer
+
+
+def test_percentiles_use_the_nearest_rank():
+    durations = [float(n) for n in range(1, 21)]
+    assert percentile(durations, 0.50) == 10.0
+    assert percentile(durations, 0.95) == 19.0
+    assert percentile([3.0], 0.95) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_the_summary_aggregates_each_event_name(tmp_path):
+    tracer = Tracer(trace_file=str(tmp_path / 'trace.jsonl'))
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracer.record('gcs.upload', seconds, bytes=1000)
+    with pytest.raises(RuntimeError):
+        with tracer.span('slides.batchUpdate'):
+            raise RuntimeError("quota")
+    tracer.record('ratelimit.wait', 1.5, backend='slides')
+    tracer.record('ratelimit.backoff', 0.5, backend='slides')
+    tracer.close()
+
+    summary = tracer.summary()
+    assert summary['gcs.upload'] == {'count': 4, 'errors': 0, 'total': pytest.approx(1.0),
+                                     'p50': 0.2, 'p95': 0.4, 'max': 0.4, 'bytes': 4000}
+    assert summary['slides.batchUpdate']['errors'] == 1
+    assert tracer.throttled_seconds() == 2.0
+
+    lines = [json.loads(line) for line in (tmp_path / 'trace.jsonl').read_text().splitlines()]
+    assert [line['name'] for line in lines] == [event['name'] for event in tracer.events]
+    assert lines[4]['error'] == 'quota'
+
+
+def test_threads_started_in_context_record_into_the_job_tracer():
+    job = Tracer()
+    token = use_tracer(job)
+    try:
+        thread = threading.Thread(target=in_context(lambda: get_tracer().record('image.encode', 0.1)))
+        thread.start()
+        thread.join()
+    finally:
+        reset_tracer(token)
+
+    assert [event['name'] for event in job.events] == ['image.encode']
+    assert get_tracer() is not job
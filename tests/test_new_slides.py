@@ -0,0 +1,82 @@
+import pytest
+
+from conftest import NoImages, fake_image_handler
+from helpers.fakes import FakeSlidesService
+from helpers.presentation_index import PresentationIndex
+from helpers.run_manifest import RunManifest
+from helpers.slide_updater import PresentationUpdater
+from main import run_presentation
+
+DECK = {'slides': [
+    {'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [{'objectId': 'title', 'text': 'Hello'}]}},
+    {'slideNumber': 2, 'exists': False, 'layout': 'TITLE_AND_BODY', 'elements': {
+        'TEXT': [{'placeholder': 'TITLE', 'text': 'New slide'}],
+        'IMAGE': [{'image_prompt': 'a red fox'}, {'image_prompt': 'a pool', 'aspect_ratio': '16:9'}],
+    }},
+]}
+
+
+class FailingPool:
+    """Generates every image but the pool."""
+
+    def __init__(self):
+        self.handler = fake_image_handler()
+
+    def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        if prompt == 'a pool':
+            return None
+        return self.handler.generate_and_store_image(prompt, aspect_ratio, target_size, variant)
+
+
+def run_pipeline(slides, handler, manifest):
+    return run_presentation(PresentationUpdater(slides, handler, manifest=manifest), 'deck', DECK)
+
+
+def run_own_plan(slides, handler, manifest):
+    updater = PresentationUpdater(slides, handler, manifest=manifest)
+    index = PresentationIndex.fetch(slides, 'deck')
+    return updater.create_new_slides('deck', DECK['slides'], index=index)
+
+
+@pytest.mark.parametrize('run', [run_pipeline, run_own_plan])
+@pytest.mark.parametrize('with_manifest', [True, False])
+def test_images_that_failed_are_attached_by_the_next_run(tmp_path, run, with_manifest):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', DECK['slides'])
+    manifest = (lambda: RunManifest(str(tmp_path / 'manifest.json'))) if with_manifest else (lambda: None)
+
+    run(slides, NoImages(), manifest())
+    objects = slides.decks['deck']['objects']
+    assert '2_title' in objects and 'slide_2_image_0' not in objects
+
+    run(slides, fake_image_handler(), manifest())
+    assert [slide['objectId'] for slide in slides.decks['deck']['slides']].count('slide_2') == 1
+    objects = slides.decks['deck']['objects']
+    assert objects['slide_2_image_0']['url'] and objects['slide_2_image_1']['url']
+
+    calls = slides.calls['batchUpdate']
+    run(slides, fake_image_handler(), manifest())
+    # Nothing is left to do, and the images are not attached twice
+    assert slides.calls['batchUpdate'] == calls
+
+
+@pytest.mark.parametrize('run', [run_pipeline, run_own_plan])
+@pytest.mark.parametrize('with_manifest', [True, False])
+def test_an_image_that_failed_is_attached_by_the_next_run(tmp_path, run, with_manifest):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', DECK['slides'])
+    manifest = (lambda: RunManifest(str(tmp_path / 'manifest.json'))) if with_manifest else (lambda: None)
+
+    run(slides, FailingPool(), manifest())
+    objects = slides.decks['deck']['objects']
+    assert objects['slide_2_image_0']['url'] and 'slide_2_image_1' not in objects
+    first_url = objects['slide_2_image_0']['url']
+
+    run(slides, fake_image_handler(), manifest())
+    objects = slides.decks['deck']['objects']
+    assert objects['slide_2_image_0']['url'] == first_url
+    assert objects['slide_2_image_1']['url']
+
+    calls = slides.calls['batchUpdate']
+    run(slides, fake_image_handler(), manifest())
+    assert slides.calls['batchUpdate'] == calls
@@ -0,0 +1,101 @@
+import time
+import pytest
+
+from helpers.pipeline_scheduler import PipelineScheduler
+
+
+class RecordingPlans:
+    """Stands in for PresentationUpdater.execute_plan; units whose key is in failing fail."""
+
+    def __init__(self, failing=(), error=None):
+        self.failing = set(failing)
+        self.error = error
+        self.plans = []
+
+    def __call__(self, presentation_id, planner):
+        if self.error is not None:
+            raise self.error
+        keys = [unit.key for unit in planner.batches()[0]] if len(planner) else []
+        self.plans.append(keys)
+        return {'applied': [key for key in keys if key not in self.failing],
+                'failed': {key: "Invalid requests" for key in keys if key in self.failing},
+                'calls': 1}
+
+
+def create_slide(page_id):
+    return [{'createSlide': {'objectId': page_id}}]
+
+
+def create_image(object_id, page_id):
+    return [{'createImage': {'objectId': object_id, 'url': 'https://example.com/a.png',
+                             'elementProperties': {'pageObjectId': page_id}}}]
+
+
+def test_units_wait_for_the_page_they_are_placed_on():
+    plans = RecordingPlans()
+    scheduler = PipelineScheduler(plans, 'deck', linger=0)
+    scheduler.add(create_image('slide_2_image_0', 'slide_2'), key='slide_2_image_0')
+    scheduler.add(create_image('photo', 'p1'), key='photo')
+    scheduler.add(create_slide('slide_2'), key='slide_2')
+
+    results = scheduler.close()
+
+    # The image goes out in the plan after the one that created its slide
+    assert plans.plans == [['slide_2', 'photo'], ['slide_2_image_0']]
+    assert sorted(results['applied']) == ['photo', 'slide_2', 'slide_2_image_0']
+    assert results['calls'] == 2
+
+
+def test_units_on_a_slide_that_failed_fail_without_being_sent():
+    plans = RecordingPlans(failing={'slide_2'})
+    scheduler = PipelineScheduler(plans, 'deck', linger=0)
+    scheduler.add(create_slide('slide_2'), key='slide_2')
+    scheduler.add(create_image('slide_2_image_0', 'slide_2'), key='slide_2_image_0')
+
+    results = scheduler.close()
+
+    assert plans.plans == [['slide_2']]
+    assert results['applied'] == []
+    assert results['failed']['slide_2_image_0'] == "depends on slide_2, which failed"
+
+
+def test_close_sends_what_is_queued_while_the_writer_lingers():
+    plans = RecordingPlans()
+    scheduler = PipelineScheduler(plans, 'deck', linger=60).start()
+    scheduler.add(create_image('a', 'p1'), key='a')
+    # The first plan goes out at once
+    deadline = time.monotonic() + 5
+    while not plans.plans and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert plans.plans == [['a']]
+
+    scheduler.add(create_image('b', 'p1'), key='b')
+    scheduler.add(create_image('c', 'p1'), key='c')
+    started = time.monotonic()
+    results = scheduler.close()
+
+    # Closing does not wait out the linger, and what lingered shares one plan
+    assert time.monotonic() - started < 5
+    assert plans.plans == [['a'], ['b', 'c']]
+    assert sorted(results['applied']) == ['a', 'b', 'c']
+
+
+def test_ready_units_linger_to_share_a_plan():
+    plans = RecordingPlans()
+    scheduler = PipelineScheduler(plans, 'deck', linger=0.3).start()
+    scheduler.add(create_image('a', 'p1'), key='a')
+    for key in ('b', 'c'):
+        time.sleep(0.05)
+        scheduler.add(create_image(key, 'p1'), key=key)
+    time.sleep(0.6)
+    assert plans.plans == [['a'], ['b', 'c']]
+    scheduler.close()
+
+
+def test_close_raises_what_stopped_the_writer():
+    scheduler = PipelineScheduler(RecordingPlans(error=PermissionError("The caller does not have permission")),
+                                  'deck', linger=0)
+    scheduler.add(create_slide('slide_2'), key='slide_2')
+
+    with pytest.raises(PermissionError):
+        scheduler.close()
@@ -0,0 +1,32 @@
+from helpers.fakes import FakeDriveService, FakeSlidesService
+from helpers.presentation_copier import copy_presentation
+from helpers.run_journal import RunJournal
+
+
+def test_resumed_run_reuses_its_copy(tmp_path):
+    slides = FakeSlidesService()
+    slides.add_presentation('template')
+    drive = FakeDriveService(slides)
+
+    journal = RunJournal(directory=str(tmp_path))
+    copy_id = copy_presentation(drive, 'template', journal=journal)
+    journal.close()
+    assert copy_id in slides.decks
+
+    resumed = RunJournal(journal.run_id, directory=str(tmp_path))
+    assert copy_presentation(drive, 'template', journal=resumed) == copy_id
+    resumed.close()
+    assert drive.calls == {'copy': 1}
+
+
+def test_copy_keys_tell_copies_apart(tmp_path):
+    slides = FakeSlidesService()
+    slides.add_presentation('template')
+    drive = FakeDriveService(slides)
+    journal = RunJournal(directory=str(tmp_path))
+
+    first = copy_presentation(drive, 'template', journal=journal, copy_key='copy/a')
+    second = copy_presentation(drive, 'template', journal=journal, copy_key='copy/b')
+    journal.close()
+    assert first != second
+    assert drive.calls == {'copy': 2}
@@ -0,0 +1,65 @@
+from conftest import fake_image_handler
+from helpers.fakes import FakeSlidesService
+from helpers.presentation_index import PresentationIndex
+from helpers.slide_updater import PresentationUpdater
+from main import run_presentation
+
+TEMPLATE = [
+    {'slideNumber': 1, 'exists': True, 'elements': {
+        'TEXT': [{'objectId': 'title', 'text': 'Hello'}],
+        'IMAGE': [{'objectId': 'photo', 'aspect_ratio': '16:9'}],
+    }},
+    {'slideNumber': 2, 'exists': True, 'elements': {'TEXT': [{'objectId': 'body', 'text': 'Old'}]}},
+]
+
+# Writes text to an image, an image to a shape and text to an element deleted from the template
+MISMATCHED = {'slides': [
+    {'slideNumber': 1, 'exists': True, 'elements': {
+        'TEXT': [{'objectId': 'title', 'text': 'Welcome'}, {'objectId': 'photo', 'text': 'Caption'}],
+        'IMAGE': [{'objectId': 'title', 'image_prompt': 'a red fox'},
+                  {'objectId': 'photo', 'image_prompt': 'a pool'},
+                  {'objectId': 'logo'}],
+    }},
+    {'slideNumber': 2, 'exists': True, 'elements': {'TEXT': [{'objectId': 'gone', 'text': 'New'}]}},
+    {'slideNumber': 3, 'exists': False, 'layout': 'BLANK', 'elements': {'TEXT': [{'text': 'Fresh'}]}},
+]}
+
+
+def fetch():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+    return slides, PresentationIndex.fetch(slides, 'deck')
+
+
+def test_updates_of_missing_or_mismatched_objects_fail_validation():
+    slides, index = fetch()
+
+    assert index.validate(MISMATCHED['slides']) == [
+        (1, 'photo', "is a image, not a text shape"),
+        (1, 'title', "is a shape, not an image"),
+        (2, 'gone', "not found in the presentation"),
+    ]
+    assert slides.calls == {'get': 1}
+
+
+def test_the_index_holds_each_element_page_size_and_text():
+    _, index = fetch()
+
+    assert index.size_of('photo') == {'width': 300, 'height': 169}
+    assert index.text_of('body') == 'Old' and index.text_of('photo') is None
+    assert index.slide_pages(TEMPLATE) == {1: index.elements['title'].page_id, 2: index.slide_ids[1]}
+    assert 'title' in index and index.slide_ids[0] in index and 'gone' not in index
+
+
+def test_mismatched_updates_are_dropped_before_any_writes():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+
+    report = run_presentation(PresentationUpdater(slides, fake_image_handler()), 'deck', MISMATCHED)
+
+    # The three mismatches and the image without a prompt
+    assert report['skipped'] == 4 and report['failed'] == 0
+    objects = slides.decks['deck']['objects']
+    assert objects['title']['text'] == 'Welcome' and objects['photo']['url']
+    assert objects['body']['text'] == 'Old'
+    assert slides.calls['get'] == 1
@@ -0,0 +1,109 @@
+import time
+import pytest
+
+from helpers import rate_limiter
+from helpers.rate_limiter import RateLimiter, get_retry_after
+
+
+class ApiError(Exception):
+    """Carries resp.status and response headers like googleapiclient's HttpError."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.resp = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.resp = type('Response', (dict,), {'status': status})(self.resp)
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limiter.time, 'sleep', slept.append)
+    return slept
+
+
+def test_retry_after_is_honoured_and_pauses_the_backend(sleeps):
+    limiter = RateLimiter(limits={'slides': (6000, None)})
+    func = Flaky(ApiError(429, retry_after=7))
+
+    assert limiter.call('slides', func) == 'ok'
+
+    assert func.calls == 2
+    assert sleeps[0] == 7.0
+    # Every caller of the backend is held back, not only the one that was throttled
+    assert limiter.buckets['slides'].blocked_until > time.monotonic() + 6
+
+
+def test_retry_after_is_read_from_headers():
+    assert get_retry_after(ApiError(503, retry_after='2.5')) == 2.5
+    assert get_retry_after(ApiError(503)) is None
+
+
+def test_errors_without_retry_after_back_off_exponentially(sleeps):
+    limiter = RateLimiter(limits={'gcs': (6000, None)})
+    func = Flaky(ApiError(503), ApiError(503), ApiError(503))
+
+    assert limiter.call('gcs', func) == 'ok'
+
+    assert func.calls == 4
+    assert [delay <= rate_limiter.BASE_BACKOFF_SECONDS * 2 ** attempt for attempt, delay in enumerate(sleeps)] == [True] * 3
+    assert limiter.buckets['gcs'].blocked_until == 0.0
+
+
+def test_invalid_requests_are_not_retried(sleeps):
+    limiter = RateLimiter(limits={'slides': (6000, None)})
+    func = Flaky(ApiError(400))
+
+    with pytest.raises(ApiError):
+        limiter.call('slides', func)
+    assert func.calls == 1
+    assert not sleeps
+
+
+def test_retries_give_up_after_max_retries(sleeps):
+    limiter = RateLimiter(limits={'slides': (6000, None)}, max_retries=2)
+    func = Flaky(*(ApiError(500) for _ in range(5)))
+
+    with pytest.raises(ApiError):
+        limiter.call('slides', func)
+    assert func.calls == 3
+
+
+def test_dropped_connections_of_the_pooled_session_are_retried(sleeps):
+    requests = pytest.importorskip('requests')
+    limiter = RateLimiter(limits={'slides': (6000, None)})
+    func = Flaky(requests.exceptions.ConnectionError("Connection aborted"),
+                 requests.exceptions.ReadTimeout("Read timed out"), ConnectionResetError())
+
+    assert limiter.call('slides', func) == 'ok'
+    assert func.calls == 4
+
+
+def test_writes_are_only_retried_when_the_server_cannot_have_applied_them(sleeps):
+    requests = pytest.importorskip('requests')
+    urllib3 = pytest.importorskip('urllib3')
+    limiter = RateLimiter(limits={'slides': (6000, None)})
+    refused = requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(
+        None, '/', urllib3.exceptions.NewConnectionError(None, "Connection refused")))
+    func = Flaky(ApiError(429), refused, requests.exceptions.ConnectTimeout("Connect timed out"))
+
+    assert limiter.call_once('slides', func) == 'ok'
+    assert func.calls == 4
+
+    for error in (ApiError(503), requests.exceptions.ReadTimeout("Read timed out"),
+                  requests.exceptions.ConnectionError("Connection aborted")):
+        func = Flaky(error)
+        with pytest.raises(type(error)):
+            limiter.call_once('slides', func)
+        assert func.calls == 1
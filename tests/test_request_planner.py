@@ -0,0 +1,95 @@
+from helpers import rate_limiter
+from helpers.fakes import FakeHttpError
+from helpers.rate_limiter import RateLimiter
+from helpers.request_planner import RequestPlanner
+
+
+class RejectingSlides:
+    """Slides stand-in whose batchUpdate rejects any batch touching an objectId in bad."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.batches = []
+
+    def presentations(self):
+        return self
+
+    def batchUpdate(self, presentationId, body):
+        requests = body['requests']
+        bad = self.bad
+
+        class Request:
+            def execute(self):
+                if any(params.get('objectId') in bad for request in requests for params in request.values()):
+                    raise ValueError("Invalid requests")
+                return {}
+
+        self.batches.append(requests)
+        return Request()
+
+
+def insert(object_id):
+    return {'insertText': {'objectId': object_id, 'insertionIndex': 0, 'text': object_id}}
+
+
+def test_rejected_batch_is_split_until_the_failing_unit_is_isolated():
+    planner = RequestPlanner()
+    for object_id in ('a', 'b', 'bad', 'c'):
+        planner.add([insert(object_id)], key=object_id)
+
+    results = planner.execute(RejectingSlides(bad={'bad'}), 'deck')
+
+    assert sorted(results['applied']) == ['a', 'b', 'c']
+    assert list(results['failed']) == ['bad']
+    # [a b bad c] -> [a b] + [bad c] -> [bad] + [c]
+    assert results['calls'] == 5
+    assert len(planner) == 0
+
+
+def test_units_are_sent_in_request_order_and_packed_into_batches():
+    planner = RequestPlanner(max_requests=3)
+    planner.add([insert('title')], key='title')
+    planner.add([{'createSlide': {'objectId': 'slide_2'}}, insert('slide_2_title')], key='slide_2')
+    planner.add([insert('body')], key='body')
+    planner.add([insert('notes')], key='notes')
+
+    batches = planner.batches()
+
+    assert [[unit.key for unit in batch] for batch in batches] == [['slide_2', 'title'], ['body', 'notes']]
+    slides = RejectingSlides()
+    results = planner.execute(slides, 'deck')
+    assert results['calls'] == 2
+    assert next(iter(slides.batches[0][0])) == 'createSlide'
+
+
+class ServerErrorSlides:
+    """Slides stand-in that applies every batch, then answers 503."""
+
+    def __init__(self):
+        self.batches = []
+
+    def presentations(self):
+        return self
+
+    def batchUpdate(self, presentationId, body):
+        slides = self
+
+        class Request:
+            def execute(self):
+                slides.batches.append(body['requests'])
+                raise FakeHttpError(503, "The service is currently unavailable")
+
+        return Request()
+
+
+def test_batches_answered_with_a_server_error_are_not_sent_again(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, 'sleep', lambda seconds: None)
+    planner = RequestPlanner()
+    for object_id in ('a', 'b'):
+        planner.add([insert(object_id)], key=object_id)
+    slides = ServerErrorSlides()
+
+    results = planner.execute(slides, 'deck', rate_limiter=RateLimiter(limits={'slides': (6000, None)}))
+
+    assert len(slides.batches) == 1
+    assert sorted(results['failed']) == ['a', 'b']
@@ -0,0 +1,56 @@
+import json
+import pytest
+
+from conftest import fake_image_handler
+from helpers.deck_loader import DeckValidationError
+from helpers.fakes import FakeSlidesService
+from run_batch import check_multi_deck, multi_deck_entries, run_batch
+
+
+def deck(presentation_id, title):
+    return {'presentation_id': presentation_id, 'slides': [
+        {'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [{'objectId': f'{presentation_id}_title',
+                                                                  'text': title}]}},
+    ]}
+
+
+def write(tmp_path, decks):
+    path = tmp_path / 'decks.json'
+    path.write_text(json.dumps(decks))
+    return str(path)
+
+
+def test_multi_deck_file_runs_every_deck(tmp_path):
+    decks = [deck(f'deck{number}', f'Deck {number}') for number in range(5)]
+    path = write(tmp_path, decks)
+    slides = FakeSlidesService()
+    for data in decks:
+        slides.add_presentation(data['presentation_id'], data['slides'])
+    handler = fake_image_handler()
+
+    assert check_multi_deck(path) == [f'deck{number}' for number in range(5)]
+    reports = run_batch(multi_deck_entries(path), slides, handler, None, deck_workers=2)
+
+    assert [report['presentation_id'] for report in reports] == [f'deck{number}' for number in range(5)]
+    assert [report['status'] for report in reports] == ['ok'] * 5
+    assert slides.decks['deck3']['objects']['deck3_title']['text'] == 'Deck 3'
+
+
+def test_a_bad_deck_late_in_the_file_fails_the_check(tmp_path):
+    bad = deck('deck2', 'Deck 2')
+    bad['slides'][0]['slideNumber'] = 'one'
+    path = write(tmp_path, [deck('deck0', 'Deck 0'), deck('deck1', 'Deck 1'), bad])
+
+    with pytest.raises(DeckValidationError) as error:
+        check_multi_deck(path)
+    assert error.value.problems == ["[2].slides[0]: 'slideNumber' should be an integer, not str"]
+
+
+def test_every_deck_needs_a_presentation_id(tmp_path):
+    missing = deck('deck1', 'Deck 1')
+    del missing['presentation_id']
+    path = write(tmp_path, [deck('deck0', 'Deck 0'), missing])
+
+    with pytest.raises(DeckValidationError) as error:
+        check_multi_deck(path)
+    assert error.value.problems == ["[1]: missing 'presentation_id'"]
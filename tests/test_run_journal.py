@@ -0,0 +1,54 @@
+from conftest import fake_image_handler
+from helpers.fakes import FakeGenaiClient, FakeHttpError, FakeSlidesService
+from helpers.run_journal import RunJournal
+from helpers.slide_updater import PresentationUpdater
+from main import run_presentation
+
+DECK = {'slides': [
+    {'slideNumber': 1, 'exists': True, 'elements': {'IMAGE': [{'objectId': 'photo', 'image_prompt': 'a red fox'}]}},
+    {'slideNumber': 2, 'exists': False, 'layout': 'BLANK', 'elements': {'IMAGE': [{'image_prompt': 'a pool'}]}},
+]}
+
+
+class Forbidden:
+    def execute(self):
+        raise FakeHttpError(403, "The caller does not have permission")
+
+
+def test_uploads_survive_the_updates_that_use_them(tmp_path):
+    journal = RunJournal(directory=str(tmp_path))
+    journal.record_image('deck', 'photo', 'https://example.com/photo.png')
+    journal.record_image('deck', (2, 0), None)
+    journal.record('deck', 'photo', 'pending')
+    journal.record('deck', 'photo', 'applied')
+    journal.close()
+
+    resumed = RunJournal(journal.run_id, directory=str(tmp_path))
+    assert resumed.image_url('deck', 'photo') == 'https://example.com/photo.png'
+    assert resumed.image_url('deck', (2, 0)) is None
+    assert resumed.is_applied('deck', 'photo')
+    resumed.close()
+
+
+def test_resumed_run_applies_the_images_it_uploaded_without_generating_them_again(tmp_path, monkeypatch):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', DECK['slides'])
+    genai = FakeGenaiClient()
+    handler = fake_image_handler(genai=genai)
+
+    journal = RunJournal(directory=str(tmp_path))
+    monkeypatch.setattr(slides, 'batchUpdate', lambda presentationId, body: Forbidden())
+    run_presentation(PresentationUpdater(slides, handler, journal=journal), 'deck', DECK)
+    journal.close()
+    monkeypatch.undo()
+    assert genai.images_generated == 2
+
+    resumed = RunJournal(journal.run_id, directory=str(tmp_path))
+    report = run_presentation(PresentationUpdater(slides, handler, journal=resumed), 'deck', DECK)
+    resumed.close()
+
+    assert genai.images_generated == 2
+    assert report['failed'] == 0
+    objects = slides.decks['deck']['objects']
+    assert objects['photo']['url'] == resumed.image_url('deck', 'photo')
+    assert objects['slide_2_image_0']['url'] == resumed.image_url('deck', (2, 0))
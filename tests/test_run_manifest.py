@@ -0,0 +1,72 @@
+from conftest import NoImages
+from helpers.request_planner import RequestPlanner
+from helpers.run_manifest import RunManifest
+from helpers.slide_updater import PresentationUpdater
+
+
+class RecordingSlides:
+    """Slides stand-in recording every batchUpdate; objectIds in bad reject their batch."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.requests = []
+
+    def presentations(self):
+        return self
+
+    def batchUpdate(self, presentationId, body):
+        slides = self
+
+        class Request:
+            def execute(self):
+                if any(params.get('objectId') in slides.bad for request in body['requests']
+                       for params in request.values()):
+                    raise ValueError("Invalid requests")
+                slides.requests.extend(body['requests'])
+                return {}
+
+        return Request()
+
+
+SLIDES = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+    {'objectId': 'title', 'text': 'Summer Splash'},
+    {'objectId': 'body', 'text': 'Pools open at nine'},
+]}}]
+
+
+def push_text(slides, manifest, slides_data=SLIDES):
+    updater = PresentationUpdater(slides, NoImages(), manifest=manifest)
+    planner = RequestPlanner()
+    updater.update_existing_slides('deck', slides_data, planner=planner)
+    return updater.execute_plan('deck', planner)['applied']
+
+
+def test_unchanged_elements_are_skipped_on_the_next_run(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    slides = RecordingSlides()
+    assert sorted(push_text(slides, RunManifest(path))) == ['body', 'title']
+
+    assert push_text(slides, RunManifest(path)) == []
+
+    changed = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'title', 'text': 'Summer Splash'},
+        {'objectId': 'body', 'text': 'Pools open at ten'},
+    ]}}]
+    assert push_text(slides, RunManifest(path), changed) == ['body']
+
+
+def test_failed_updates_are_pushed_again(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    assert push_text(RecordingSlides(bad={'body'}), RunManifest(path)) == ['title']
+
+    assert push_text(RecordingSlides(), RunManifest(path)) == ['body']
+
+
+def test_reset_forces_a_full_update(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    slides = RecordingSlides()
+    push_text(slides, RunManifest(path))
+
+    manifest = RunManifest(path)
+    manifest.reset('deck')
+    assert sorted(push_text(slides, manifest)) == ['body', 'title']
@@ -0,0 +1,58 @@
+import pytest
+
+from helpers.slide_selector import SlideIndex
+
+SLIDES = [
+    {'slideNumber': 1, 'exists': True, 'layout': 'TITLE', 'notes': 'Opening hook',
+     'elements': {'TEXT': [{'objectId': 'g_title', 'text': 'Hello'}]}},
+    {'slideNumber': 2, 'exists': True, 'layout': 'TITLE_AND_BODY', 'notes': 'Pricing tiers explained',
+     'elements': {'TEXT': [{'objectId': 'g_body', 'text': 'Plans'}],
+                  'IMAGE': [{'objectId': 'g_chart', 'image_prompt': 'a chart'}]}},
+    {'slideNumber': 3, 'exists': True, 'layout': 'TITLE_AND_BODY',
+     'elements': {'IMAGE': [{'objectId': 'g_photo', 'image_prompt': 'a pool'}]}},
+    {'slideNumber': 5, 'exists': False, 'layout': 'TITLE_AND_BODY', 'notes': 'New pricing slide',
+     'elements': {'TEXT': [{'placeholder': 'TITLE', 'text': 'More'}]}},
+]
+
+
+@pytest.fixture
+def index():
+    return SlideIndex(SLIDES)
+
+
+@pytest.mark.parametrize('selectors, numbers', [
+    ([2], [2]),
+    (['2'], [2]),
+    ([4], []),
+    (['2-5'], [2, 3, 5]),
+    (['5-2'], [2, 3, 5]),
+    (['1 - 1000000'], [1, 2, 3, 5]),
+    (['layout=title_and_body'], [2, 3, 5]),
+    (['objectId=g_photo'], [3]),
+    (['objectId=missing'], []),
+    (['notes=pricing'], [2, 5]),
+    (['notes=Pricing tiers'], [2]),
+    (['has:image'], [2, 3]),
+    (['has:text'], [1, 2, 5]),
+    (['has:notes'], [1, 2, 5]),
+    (['new'], [5]),
+])
+def test_single_selectors(index, selectors, numbers):
+    assert index.select_numbers(selectors) == numbers
+
+
+def test_terms_joined_with_commas_must_all_match(index):
+    assert index.select_numbers(['layout=TITLE_AND_BODY,has:image']) == [2, 3]
+    assert index.select_numbers(['2-5, has:text, notes=pricing']) == [2, 5]
+    assert index.select_numbers(['new,has:image']) == []
+
+
+def test_separate_selectors_add_up(index):
+    assert index.select_numbers([1, 'new', 'objectId=g_photo']) == [1, 3, 5]
+    assert [slide['slideNumber'] for slide in index.select(['3', '1'])] == [1, 3]
+
+
+@pytest.mark.parametrize('selector', ['has:new', 'has:video', 'colour=red', 'notes=!!', 'two', ','])
+def test_invalid_selectors_raise(index, selector):
+    with pytest.raises(ValueError):
+        index.select_numbers([selector])
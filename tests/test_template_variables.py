@@ -0,0 +1,97 @@
+import pytest
+
+from conftest import NoImages
+from helpers.fakes import FakeSlidesService
+from helpers.presentation_index import PresentationIndex
+from helpers.request_planner import RequestPlanner
+from helpers.slide_updater import PresentationUpdater
+from helpers.template_variables import TemplateVariables
+from main import run_presentation
+
+VARIABLES = {
+    '[event]': 'Summer Splash',
+    '[city]': {'text': 'Paris', 'slides': [2, 4]},
+    '[venue]': {'text': 'Lido', 'pageObjectIds': ['p3_deck']},
+    '[RSVP]': {'text': 'Reply by Friday', 'matchCase': True},
+}
+TEMPLATE = [
+    {'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'cover', 'text': 'Welcome to [EVENT] in [city] [rsvp]'},
+    ]}},
+    {'slideNumber': 2, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'where', 'text': 'See you in [City] at [venue]!'},
+    ]}},
+    {'slideNumber': 3, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'venue', 'text': '[Event] at [venue] in [city]. [RSVP]'},
+    ]}},
+]
+
+
+def test_substitute_ignores_case_unless_told_otherwise():
+    variables = TemplateVariables(VARIABLES)
+
+    assert variables.substitute('[EVENT] and [event] [rsvp] [RSVP]') == \
+        'Summer Splash and Summer Splash [rsvp] Reply by Friday'
+
+
+def test_scoped_tokens_are_only_replaced_on_their_slides():
+    variables = TemplateVariables(VARIABLES)
+
+    assert variables.substitute('[city] [venue]', 1, 'p1_deck') == '[city] [venue]'
+    assert variables.substitute('[city] [venue]', 2, 'p2_deck') == 'Paris [venue]'
+    assert variables.substitute('[city] [venue]', 3, 'p3_deck') == '[city] Lido'
+    assert dict(variables.requests({2: 'p2_deck'}))['[city]']['replaceAllText']['pageObjectIds'] == ['p2_deck']
+
+
+def test_replacements_and_edits_land_as_substitute_predicts():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+    wanted = [
+        # Unchanged: only the replacements apply
+        TEMPLATE[0],
+        # Edited around a token that is replaced on this slide
+        {'slideNumber': 2, 'exists': True, 'elements': {'TEXT': [
+            {'objectId': 'where', 'text': 'See you soon in [City] at [venue]!'},
+        ]}},
+        TEMPLATE[2],
+        {'slideNumber': 4, 'exists': False, 'layout': 'TITLE', 'elements': {'TEXT': [
+            {'placeholder': 'TITLE', 'text': '[event] in [CITY] at [venue]'},
+        ]}},
+    ]
+
+    report = run_presentation(PresentationUpdater(slides, NoImages()), 'deck',
+                              {'slides': wanted, 'variables': VARIABLES})
+
+    assert report['failed'] == 0
+    objects = slides.decks['deck']['objects']
+    assert objects['cover']['text'] == 'Welcome to Summer Splash in [city] [rsvp]'
+    assert objects['where']['text'] == 'See you soon in Paris at [venue]!'
+    assert objects['venue']['text'] == 'Summer Splash at Lido in [city]. Reply by Friday'
+    new_page = slides.decks['deck']['slides'][3]['objectId']
+    assert 'Summer Splash in Paris at [venue]' in [obj['text'] for obj in objects.values() if obj['page'] == new_page]
+
+    # What substitute() predicts is what the replacements left, so the next run edits nothing
+    report = run_presentation(PresentationUpdater(slides, NoImages()), 'deck',
+                              {'slides': wanted[:3], 'variables': VARIABLES})
+    assert report['text_queued'] == len(VARIABLES)
+
+
+@pytest.mark.parametrize('max_requests', [500, 1])
+def test_scoped_edits_land_after_their_replacements_however_they_are_batched(max_requests):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+    wanted = [{'slideNumber': 2, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'where', 'text': 'See you in [city] and at [venue] soon!'},
+    ]}}]
+    updater = PresentationUpdater(slides, NoImages())
+    planner = RequestPlanner(max_requests=max_requests)
+
+    updater.update_existing_slides('deck', TEMPLATE[:1] + wanted, planner=planner,
+                                   index=PresentationIndex.fetch(slides, 'deck'),
+                                   variables=TemplateVariables(VARIABLES))
+    results = updater.execute_plan('deck', planner)
+
+    assert results['failed'] == {}
+    assert results['applied'][-1] == 'where'
+    assert slides.decks['deck']['objects']['where']['text'] == 'See you in Paris and at [venue] soon!'
+    assert slides.decks['deck']['objects']['cover']['text'] == 'Welcome to Summer Splash in [city] [rsvp]'
@@ -0,0 +1,71 @@
+import pytest
+
+from helpers.text_diff import text_edit_requests, utf16_length
+
+
+def apply(text, requests):
+    """Applies deleteText/insertText requests the way Slides does, indexing UTF-16 code units."""
+    units = text.encode('utf-16-le')
+    for request in requests:
+        kind, params = next(iter(request.items()))
+        if kind == 'deleteText':
+            text_range = params['textRange']
+            if text_range['type'] == 'ALL':
+                units = b''
+            else:
+                units = units[:2 * text_range['startIndex']] + units[2 * text_range['endIndex']:]
+        else:
+            index = 2 * params['insertionIndex']
+            units = units[:index] + params['text'].encode('utf-16-le') + units[index:]
+    return units.decode('utf-16-le')
+
+
+@pytest.mark.parametrize('current, text', [
+    ('Summer Splash 2024', 'Summer Splash 2025'),
+    ('Pools open at nine, slides at ten', 'Pools open at eight, slides at eleven'),
+    ('Hello', 'Hello world'),
+    ('Hello world', 'world'),
+    ('abc', ''),
+    ('', 'abc'),
+    ('🎉 Party at the pool 🎉', '🎉 Party at the beach 🎉'),
+    ('Café 𝒜 menu', 'Café 𝒜 new menu 🍹'),
+    ('line one\nline two\nline three', 'line one\nline 2\nline three'),
+])
+def test_edits_turn_the_current_text_into_the_new_text(current, text):
+    assert apply(current, text_edit_requests('shape', current, text)) == text
+
+
+def test_only_the_changed_word_is_rewritten():
+    requests = text_edit_requests('shape', 'Summer Splash 2024 kicks off', 'Summer Splash 2025 kicks off')
+
+    assert requests == [
+        {'deleteText': {'objectId': 'shape', 'textRange': {'type': 'FIXED_RANGE', 'startIndex': 17, 'endIndex': 18}}},
+        {'insertText': {'objectId': 'shape', 'insertionIndex': 17, 'text': '5'}},
+    ]
+
+
+def test_indexes_count_utf16_code_units():
+    requests = text_edit_requests('shape', '🎉 old', '🎉 new')
+
+    assert utf16_length('🎉') == 2
+    assert requests[0]['deleteText']['textRange'] == {'type': 'FIXED_RANGE', 'startIndex': 3, 'endIndex': 6}
+
+
+def test_edits_run_from_the_end_backwards():
+    requests = text_edit_requests('shape', 'one two three four five six seven eight',
+                                  'one 2 three four five six seven 8')
+
+    starts = [params.get('insertionIndex', params.get('textRange', {}).get('startIndex'))
+              for request in requests for params in request.values()]
+    assert starts == sorted(starts, reverse=True)
+
+
+def test_identical_text_needs_no_requests():
+    assert text_edit_requests('shape', 'same', 'same') == []
+
+
+def test_unknown_text_is_replaced_whole():
+    assert text_edit_requests('shape', None, 'new') == [
+        {'deleteText': {'objectId': 'shape', 'textRange': {'type': 'ALL'}}},
+        {'insertText': {'objectId': 'shape', 'insertionIndex': 0, 'text': 'new'}},
+    ]
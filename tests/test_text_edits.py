@@ -0,0 +1,95 @@
+import pytest
+
+from conftest import NoImages
+from helpers.fakes import FakeHttpError, FakeSlidesService
+from helpers.presentation_index import PresentationIndex
+from helpers.request_planner import RequestPlanner
+from helpers.run_manifest import RunManifest
+from helpers.slide_updater import PresentationUpdater
+from helpers.template_variables import TemplateVariables
+from main import run_presentation
+
+TEMPLATE = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+    {'objectId': 'title', 'text': 'Welcome to [event], friends'},
+]}}]
+WANTED = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+    {'objectId': 'title', 'text': 'Welcome to [event], dear friends'},
+]}}]
+VARIABLES = {'[event]': 'Summer Splash'}
+
+
+class Rejected:
+    def execute(self):
+        raise FakeHttpError(400, "Invalid requests[0].replaceAllText")
+
+
+class RejectingReplacements(FakeSlidesService):
+    """Fake Slides that rejects every batch holding a replaceAllText."""
+
+    def batchUpdate(self, presentationId, body):
+        if any('replaceAllText' in request for request in body['requests']):
+            return Rejected()
+        return super().batchUpdate(presentationId, body)
+
+
+def title(slides):
+    return slides.decks['deck']['objects']['title']['text']
+
+
+def update_text(slides, planner, manifest=None, slides_data=WANTED):
+    updater = PresentationUpdater(slides, NoImages(), manifest=manifest)
+    index = PresentationIndex.fetch(slides, 'deck')
+    updater.update_existing_slides('deck', slides_data, planner=planner, index=index,
+                                   variables=TemplateVariables(VARIABLES))
+    return updater.execute_plan('deck', planner)
+
+
+@pytest.mark.parametrize('max_requests', [500, 1])
+def test_edits_index_the_text_as_the_replacements_leave_it(max_requests):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+
+    results = update_text(slides, RequestPlanner(max_requests=max_requests))
+
+    assert results['applied'] == ['variable:[event]', 'title']
+    assert title(slides) == 'Welcome to Summer Splash, dear friends'
+
+
+def test_edits_are_not_sent_after_their_replacement_fails():
+    slides = RejectingReplacements()
+    slides.add_presentation('deck', TEMPLATE)
+
+    results = update_text(slides, RequestPlanner())
+
+    assert results['applied'] == []
+    assert results['failed']['title'] == "depends on variable:[event], which failed"
+    assert title(slides) == 'Welcome to [event], friends'
+
+
+def test_scheduled_edits_wait_for_their_replacement():
+    slides = RejectingReplacements()
+    slides.add_presentation('deck', TEMPLATE)
+
+    report = run_presentation(PresentationUpdater(slides, NoImages()), 'deck',
+                              {'slides': WANTED, 'variables': VARIABLES})
+
+    assert report['failed'] == 2
+    assert title(slides) == 'Welcome to [event], friends'
+
+
+def test_elements_reading_as_intended_are_recorded_in_the_manifest(tmp_path):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', TEMPLATE)
+    path = str(tmp_path / 'manifest.json')
+    filled = [{'slideNumber': 1, 'exists': True, 'elements': {'TEXT': [
+        {'objectId': 'title', 'text': 'Welcome to Summer Splash, friends'},
+    ]}}]
+
+    # Only the replacement is sent; the element already reads as intended once it applies
+    assert update_text(slides, RequestPlanner(), RunManifest(path), filled)['applied'] == ['variable:[event]']
+    assert title(slides) == 'Welcome to Summer Splash, friends'
+    assert 'title' in RunManifest(path).presentations['deck']
+
+    manifest = RunManifest(path)
+    update_text(slides, RequestPlanner(), manifest, filled)
+    assert manifest._staged == {}
@@ -0,0 +1,58 @@
+from helpers.fakes import FakeSlidesService
+from helpers.image_handler import placeholder_pixel_size
+from helpers.presentation_index import PresentationIndex
+from helpers.run_manifest import RunManifest
+from update_selected_slides import update_selected_slides
+
+
+def slides_data(variant=None):
+    image = {'objectId': 'photo', 'image_prompt': 'a red fox', 'size': {'width': 10, 'height': 10}}
+    if variant is not None:
+        image['variant'] = variant
+    return [{'slideNumber': 1, 'exists': True, 'elements': {'IMAGE': [image]}}]
+
+
+class RecordingImages:
+    """Returns a URL per variant and records the sizes asked for."""
+
+    variants_per_call = 1
+
+    def __init__(self):
+        self.target_sizes = []
+
+    def generate_and_store_image(self, prompt, aspect_ratio="1:1", target_size=None, variant=0):
+        self.target_sizes.append(target_size)
+        return f"https://example.com/{variant}.png"
+
+    def generate_variants(self, prompt, aspect_ratio="1:1", variants=(0,), target_size=None):
+        self.target_sizes.append(target_size)
+        return {variant: f"https://example.com/{variant}.png" for variant in variants}
+
+
+def test_pinning_another_variant_pushes_the_image_again(tmp_path):
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', slides_data())
+    path = str(tmp_path / 'manifest.json')
+
+    def update(variant):
+        results = update_selected_slides('deck', slides_data(variant), [1], slides, RecordingImages(),
+                                         manifest=RunManifest(path))
+        return results['images']
+
+    assert update(None)['updated'] == 1
+    assert update(None)['unchanged'] == 1
+    assert update(2)['updated'] == 1
+    assert slides.decks['deck']['objects']['photo']['url'] == 'https://example.com/2.png'
+    assert update(2)['unchanged'] == 1
+
+
+def test_images_are_sized_for_the_placeholder_in_the_presentation():
+    slides = FakeSlidesService()
+    slides.add_presentation('deck', slides_data())
+    images = RecordingImages()
+
+    update_selected_slides('deck', slides_data(), [1], slides, images)
+
+    size = PresentationIndex.fetch(slides, 'deck').size_of('photo')
+    assert size != slides_data()[0]['elements']['IMAGE'][0]['size']
+    assert images.target_sizes == [placeholder_pixel_size(size)]
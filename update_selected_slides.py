@@ -2,44 +2,68 @@
 Script to update images and text for specific slides in a presentation
 example usage:
 python update_selected_slides.py 1 3 5 7
+python update_selected_slides.py 3-9 layout=TITLE_AND_BODY,has:image objectId=g3298...
 """
 
-import json
 import argparse
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from helpers.image_handler import ImageHandler
+from helpers.clients import get_clients
+from helpers.image_cache import ImageCache
+from helpers.run_manifest import RunManifest
+from helpers.request_planner import RequestPlanner
+from helpers.rate_limiter import get_rate_limiter
+from helpers.image_pipeline import ImageJob, pipeline_for
+from helpers.run_journal import RunJournal
+from helpers.deck_loader import load_deck
+from helpers.slide_selector import SELECTOR_HELP, SlideIndex
+from helpers.template_variables import TemplateVariables
+from helpers.text_diff import text_edit_requests
+from helpers.presentation_index import PresentationIndex
 import config
 
-def update_selected_slides(presentation_id, slides_data, slide_numbers, slides_service, image_handler):
+def update_selected_slides(presentation_id, slides_data, selectors, slides_service, image_handler,
+                           image_workers=None, manifest=None, journal=None, index=None, variables=None):
     """
-    Updates images and text only for specified slide numbers.
+    Updates images and text only for the selected slides.
     
     Args:
         presentation_id (str): The ID of the presentation
         slides_data (list): Full slides data from JSON
-        slide_numbers (list): List of slide numbers to update
+        selectors (list): Slide numbers or selector strings such as '3-9' or 'has:image'
+                          (see helpers.slide_selector)
         slides_service: Google Slides service instance
         image_handler: ImageHandler instance
+        image_workers (int): Number of images generated concurrently
+        manifest (RunManifest): When given, elements unchanged since the last run are skipped
+        journal (RunJournal): When given, work an interrupted run with the same ID completed is skipped
+        index (SlideIndex): Prebuilt index of slides_data, reused across calls
+        variables (TemplateVariables): Template tokens filled into the selected slides' text
     
     Returns:
         dict: Summary of updates made
     """
     results = {
-        'text': {'updated': 0, 'skipped': 0},
-        'images': {'updated': 0, 'skipped': 0}
+        'text': {'updated': 0, 'skipped': 0, 'unchanged': 0},
+        'images': {'updated': 0, 'skipped': 0, 'unchanged': 0}
     }
     
-    # Convert slide numbers to set for faster lookup
-    slide_numbers = set(slide_numbers)
+    # Look the selection up in the index instead of scanning the deck
+    selected = (index or SlideIndex(slides_data)).select(selectors)
+    variables = variables or TemplateVariables()
+    # Read once, when the first update needs the current text to diff against or a placeholder's size
+    snapshot = None
     
-    print(f"\nUpdating slides: {sorted(slide_numbers)}")
+    def current_snapshot():
+        nonlocal snapshot
+        if snapshot is None:
+            snapshot = PresentationIndex.fetch(slides_service, presentation_id, rate_limiter=get_rate_limiter())
+        return snapshot
+    planner = RequestPlanner()
+    image_jobs = []
     
-    for slide in slides_data:
-        slide_num = slide.get('slideNumber')
-        if slide_num not in slide_numbers:
-            continue
-            
+    print(f"\nUpdating slides: {[slide['slideNumber'] for slide in selected]}")
+    
+    for slide in selected:
+        slide_num = slide['slideNumber']
         print(f"\nProcessing Slide {slide_num}...")
         
         if not slide.get('exists'):
@@ -49,36 +73,24 @@ def update_selected_slides(presentation_id, slides_data, slide_numbers, slides_s
         # Update text elements
         for text_elem in slide.get('elements', {}).get('TEXT', []):
             if text_elem.get('objectId'):
-                try:
-                    # Delete existing text
-                    delete_request = {
-                        'deleteText': {
-                            'objectId': text_elem['objectId'],
-                            'textRange': {'type': 'ALL'}
-                        }
-                    }
-                    
-                    # Insert new text
-                    insert_request = {
-                        'insertText': {
-                            'objectId': text_elem['objectId'],
-                            'insertionIndex': 0,
-                            'text': text_elem['text']
-                        }
-                    }
-                    
-                    # Execute both requests together
-                    slides_service.presentations().batchUpdate(
-                        presentationId=presentation_id,
-                        body={'requests': [delete_request, insert_request]}
-                    ).execute()
-                    
-                    results['text']['updated'] += 1
-                    print(f"  ✓ Updated text element {text_elem['objectId']}")
-                    
-                except Exception as e:
-                    results['text']['skipped'] += 1
-                    print(f"  ✗ Failed to update text {text_elem['objectId']}: {str(e)}")
+                # Only the selected slides are touched, so their tokens are filled in per element
+                text = variables.substitute(text_elem['text'], slide_num)
+                if manifest and not manifest.stage_if_changed(presentation_id, text_elem['objectId'], text):
+                    results['text']['unchanged'] += 1
+                    continue
+                
+                # Only the runs that changed since the snapshot are deleted and inserted
+                requests = text_edit_requests(text_elem['objectId'],
+                                              current_snapshot().text_of(text_elem['objectId']), text)
+                if not requests:
+                    results['text']['unchanged'] += 1
+                    continue
+                
+                planner.add(
+                    requests,
+                    key=('text', text_elem['objectId']),
+                    description=f"text element {text_elem['objectId']}"
+                )
         
         # Update image elements
         for image_elem in slide.get('elements', {}).get('IMAGE', []):
@@ -92,71 +104,101 @@ def update_selected_slides(presentation_id, slides_data, slide_numbers, slides_s
                 print(f"  Skipping image {image_elem['objectId']}: No image description")
                 continue
                 
-            try:
-                # Generate new image
-                print(f"  Generating image for: {image_elem['image_prompt'][:50]}...")
-                image_url = image_handler.generate_and_store_image(
-                    image_elem['image_prompt'],
-                    aspect_ratio=image_elem.get('aspect_ratio', '1:1')
-                )
+            aspect_ratio = image_elem.get('aspect_ratio', '1:1')
+            # A pinned variant is part of the content, so switching it re-pushes the image
+            variant = [image_elem['variant']] if image_elem.get('variant') is not None else []
+            if manifest and not manifest.stage_if_changed(presentation_id, image_elem['objectId'],
+                                                          image_elem['image_prompt'], aspect_ratio, *variant):
+                results['images']['unchanged'] += 1
+                continue
                 
-                if image_url:
-                    # Replace existing image
-                    replace_request = {
-                        'replaceImage': {
-                            'imageObjectId': image_elem['objectId'],
-                            'imageReplaceMethod': 'CENTER_CROP',
-                            'url': image_url
-                        }
-                    }
-                    
-                    slides_service.presentations().batchUpdate(
-                        presentationId=presentation_id,
-                        body={'requests': [replace_request]}
-                    ).execute()
-                    
-                    results['images']['updated'] += 1
-                    print(f"  ✓ Updated image {image_elem['objectId']}")
-                else:
-                    results['images']['skipped'] += 1
-                    print(f"  ✗ Failed to generate image for {image_elem['objectId']}")
-                    
-            except Exception as e:
-                results['images']['skipped'] += 1
-                print(f"  ✗ Error updating image {image_elem['objectId']}: {str(e)}")
+            print(f"  Queued image for: {image_elem['image_prompt'][:50]}...")
+            # Sized for the placeholder as it is now, as the full update does
+            size = current_snapshot().size_of(image_elem['objectId'])
+            image_jobs.append(ImageJob.from_element(image_elem['objectId'], image_elem, size=size))
+    
+    # Generate all new images concurrently
+    image_urls = pipeline_for(image_handler, max_workers=image_workers).generate(
+        image_jobs, journal=journal, presentation_id=presentation_id)
+    for job in image_jobs:
+        if image_urls.get(job.key):
+            # Replace existing image
+            replace_request = {
+                'replaceImage': {
+                    'imageObjectId': job.key,
+                    'imageReplaceMethod': 'CENTER_CROP',
+                    'url': image_urls[job.key]
+                }
+            }
+            
+            planner.add(
+                [replace_request],
+                key=('images', job.key),
+                description=f"image {job.key}"
+            )
+        else:
+            results['images']['skipped'] += 1
+            print(f"  ✗ Failed to generate image for {job.key}")
+    
+    # Send all queued edits in as few batchUpdate calls as possible
+    plan_results = planner.execute(slides_service, presentation_id, rate_limiter=get_rate_limiter(),
+                                   journal=journal)
+    for kind, object_id in plan_results['applied']:
+        results[kind]['updated'] += 1
+        print(f"  ✓ Updated {object_id}")
+    for kind, _ in plan_results['failed']:
+        results[kind]['skipped'] += 1
+    if manifest:
+        manifest.commit(presentation_id, [object_id for _, object_id in plan_results['applied']])
     
     # Print summary
     print("\nUpdate Summary:")
-    print(f"Text elements:  {results['text']['updated']} updated, {results['text']['skipped']} skipped")
-    print(f"Image elements: {results['images']['updated']} updated, {results['images']['skipped']} skipped")
+    print(f"Text elements:  {results['text']['updated']} updated, {results['text']['skipped']} skipped, "
+          f"{results['text']['unchanged']} unchanged")
+    print(f"Image elements: {results['images']['updated']} updated, {results['images']['skipped']} skipped, "
+          f"{results['images']['unchanged']} unchanged")
     
     return results
 
 def main():
     parser = argparse.ArgumentParser(description='Update specific slides in presentation')
-    parser.add_argument('slides', nargs='+', type=int, 
-                      help='Slide numbers to update (e.g., 5 6 7)')
+    parser.add_argument('slides', nargs='+',
+                      help=f'Slides to update (e.g., 5 6 7). {SELECTOR_HELP}')
     parser.add_argument('--json-file', default=config.INPUT_FILE,
                       help='Input JSON file (default: config.INPUT_FILE)')
+    parser.add_argument('--workers', type=int,
+                      help='Number of images generated concurrently (default: config.IMAGE_WORKERS or 4)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always generate new images instead of reusing cached ones')
+    parser.add_argument('--full', action='store_true',
+                      help='Push every selected element, even if unchanged since the last run')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                      help='Continue an interrupted run, skipping the work it completed')
     args = parser.parse_args()
     
-    # Read the JSON
-    with open(args.json_file, "r") as f:
-        presentation_data = json.load(f)
+    # Read and validate the JSON before any API call
+    presentation_data = load_deck(args.json_file)
+    
+    # Resolve the selection before touching any API
+    index = SlideIndex(presentation_data['slides'])
+    try:
+        if not index.select_numbers(args.slides):
+            parser.error(f"No slides match {' '.join(args.slides)}")
+    except ValueError as e:
+        parser.error(str(e))
     
     # Initialize services
-    credentials = service_account.Credentials.from_service_account_file(
-        config.CREDENTIALS_FILE,
-        scopes=['https://www.googleapis.com/auth/presentations']
+    clients = get_clients()
+    slides_service = clients.slides_service
+    image_handler = clients.image_handler(
+        cache=None if args.no_cache else ImageCache(),
+        seed=getattr(config, 'IMAGE_SEED', None)
     )
-    slides_service = build('slides', 'v1', credentials=credentials)
     
-    # Initialize image handler
-    image_handler = ImageHandler(
-        genai_api_key=config.GENAI_API_KEY,
-        bucket_name=config.GCS_BUCKET_NAME,
-        project_id=config.PROJECT_ID
-    )
+    manifest = RunManifest()
+    if args.full:
+        manifest.reset(config.TEMPLATE_PRESENTATION_ID)
+    journal = RunJournal(args.resume)
     
     try:
         update_selected_slides(
@@ -164,12 +206,23 @@ def main():
             presentation_data['slides'],
             args.slides,
             slides_service,
-            image_handler
+            image_handler,
+            image_workers=args.workers,
+            manifest=manifest,
+            journal=journal,
+            index=index,
+            variables=TemplateVariables(presentation_data.get('variables'))
         )
         
+        # Keep the image cache (and the bucket behind it) bounded
+        image_handler.prune_cache()
+        
     except Exception as e:
         print(f"\nError updating presentation: {str(e)}")
         raise
+    
+    finally:
+        journal.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file